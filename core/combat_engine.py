@@ -0,0 +1,124 @@
+# combat_engine.py
+
+from dataclasses import dataclass
+from typing import Dict, Iterator
+
+
+@dataclass(frozen=True)
+class CombatResult:
+    """一场战斗的结算结果（a 为挑战方即玩家，b 为怪物或对手）"""
+    a_first: bool       # a 是否先出手
+    rounds: int         # 实际进行的回合数（最后一回合可能只有先手出手）
+    a_start_hp: int
+    b_start_hp: int
+    a_hp: int           # 战斗结束时的剩余血量（可能为负）
+    b_hp: int
+    a_damage: int       # a 每次出手造成的伤害
+    b_damage: int
+    a_hits: int         # a 的出手次数
+    b_hits: int
+
+    @property
+    def a_won(self) -> bool:
+        return self.a_hp > 0
+
+    @property
+    def a_damage_dealt(self) -> int:
+        return self.a_hits * self.a_damage
+
+    @property
+    def b_damage_dealt(self) -> int:
+        return self.b_hits * self.b_damage
+
+
+def _ceil_div(a: int, b: int) -> int:
+    return -(-a // b)
+
+
+def resolve(a_hp: int, a_stats: Dict, b_hp: int, b_stats: Dict) -> CombatResult:
+    """O(1) 结算一场回合制战斗
+
+    规则与原先的逐回合循环一致：速度高者先手（相同时 a 先手），
+    每次出手造成 max(1, 攻击 - 对方防御) 点伤害，一方血量降到0及以下即结束。
+    先手方击败对方所需次数不超过后手方时先手获胜。
+    """
+    a_damage = max(1, a_stats["attack"] - b_stats["defense"])
+    b_damage = max(1, b_stats["attack"] - a_stats["defense"])
+    a_first = a_stats["speed"] >= b_stats["speed"]
+
+    # 开战时已有一方倒下，不进行任何回合
+    if a_hp <= 0 or b_hp <= 0:
+        return CombatResult(a_first, 0, a_hp, b_hp, a_hp, b_hp, a_damage, b_damage, 0, 0)
+
+    a_needed = _ceil_div(b_hp, a_damage)   # a 击败 b 需要的出手次数
+    b_needed = _ceil_div(a_hp, b_damage)
+
+    if a_first:
+        if a_needed <= b_needed:
+            rounds, a_hits, b_hits = a_needed, a_needed, a_needed - 1
+        else:
+            rounds, a_hits, b_hits = b_needed, b_needed, b_needed
+    else:
+        if b_needed <= a_needed:
+            rounds, a_hits, b_hits = b_needed, b_needed - 1, b_needed
+        else:
+            rounds, a_hits, b_hits = a_needed, a_needed, a_needed
+
+    return CombatResult(
+        a_first=a_first,
+        rounds=rounds,
+        a_start_hp=a_hp,
+        b_start_hp=b_hp,
+        a_hp=a_hp - b_hits * b_damage,
+        b_hp=b_hp - a_hits * a_damage,
+        a_damage=a_damage,
+        b_damage=b_damage,
+        a_hits=a_hits,
+        b_hits=b_hits
+    )
+
+
+def iter_rounds(result: CombatResult, b_name: str) -> Iterator[str]:
+    """按需生成逐回合战报文本（只在查看详细战报时使用）"""
+    a_hp, b_hp = result.a_start_hp, result.b_start_hp
+    for round_num in range(1, result.rounds + 1):
+        yield f"\n第{round_num}回合："
+        for a_acts in ((True, False) if result.a_first else (False, True)):
+            if a_acts:
+                b_hp -= result.a_damage
+                yield f"你对{b_name}造成了{result.a_damage}点伤害！"
+                if b_hp <= 0:
+                    yield f"{b_name}被击败了！"
+                    return
+            else:
+                a_hp -= result.b_damage
+                yield f"{b_name}对你造成了{result.b_damage}点伤害！"
+                if a_hp <= 0:
+                    yield "你被击败了！"
+                    return
+
+
+def iter_round_blocks(result: CombatResult, b_name: str) -> Iterator[str]:
+    """按回合分组的战报，每回合一段文本（用于逐条发送）"""
+    block = []
+    for line in iter_rounds(result, b_name):
+        if line.startswith("\n第") and block:
+            yield "\n".join(block).strip()
+            block = []
+        block.append(line)
+    if block:
+        yield "\n".join(block).strip()
+
+
+def summarize(result: CombatResult, b_name: str) -> str:
+    """战斗结果摘要"""
+    ending = f"{b_name}被击败了！" if result.a_won else "你被击败了！"
+    return (
+        f"\n激战{result.rounds}回合，你共造成{result.a_damage_dealt}点伤害，"
+        f"承受{result.b_damage_dealt}点伤害。{ending}"
+    )
+
+
+def combat_power(stats: Dict) -> int:
+    """战力：由战斗属性折算的综合评分，用于排行和匹配"""
+    return stats["hp"] // 5 + stats["attack"] * 2 + stats["defense"] * 2 + stats["speed"]
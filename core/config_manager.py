@@ -1,90 +1,476 @@
+import asyncio
+import functools
+import gc
+import hashlib
 import json
 import os
+import pickle
+import time
+from dataclasses import dataclass, field, fields, replace
 from pathlib import Path
-from typing import Dict, List, Any
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+from .config_models import (
+    BossConfig, ConfigError, ItemConfig, LevelConfig, MonsterConfig, load_list, load_mapping
+)
+from .monster_table import MonsterTable
+from .realm_table import RealmTable
+from .sampling import RandomTables
+
+if TYPE_CHECKING:
+    from ..data.catalog import ItemCatalog
+
+# 快照字段 -> 配置文件名
+CONFIG_FILES = {
+    "level_config": "level_config.json",
+    "items": "items.json",
+    "monsters": "monsters.json",
+    "sects": "sects.json",
+    "bosses": "bosses.json",
+    "random_tables": "random_tables.json"
+}
+
+# 配置文件状态：(mtime_ns, size)，文件不存在时为None
+FileState = Optional[Tuple[int, int]]
+
+# 编译缓存格式版本：ConfigSnapshot 或怪物表、随机表的结构变化时递增，旧缓存自动作废
+COMPILED_CACHE_VERSION = 4
+
+# 编译快照用到的模块（境界倍率、怪物属性比例、抽样表等常量都在其中）：
+# 源码或插件版本变化时编译缓存作废，不必记得手动递增 COMPILED_CACHE_VERSION
+_COMPILER_MODULES = (
+    "config_manager.py", "config_models.py", "realm_rules.py", "realm_table.py", "monster_table.py", "sampling.py"
+)
+
+# 快照中以只读映射保存的字段（序列化时转为普通字典）
+_MAPPING_FIELDS = (
+    "items", "monsters", "sects", "bosses", "item_configs", "monster_configs", "boss_configs", "file_states"
+)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """某一时刻全部配置及其派生索引的只读快照
+    
+    快照构建完成后不再修改，重新加载时整体替换。同一条命令内应只取一次
+    snapshot，之后的读取都基于它，这样不会读到新旧配置混合的状态。
+    
+    levels / *_configs 是校验后的类型化模型，命令处理中应优先使用；
+    level_config、items 等原始字典保留给物品同步和数据库迁移
+    （嵌套的 dict 仍是普通字典，调用方不要修改）。
+    
+    catalog 是由数据库构建的物品目录，与快照中的物品配置对应，随快照一起发布
+    （不写入编译缓存）；数据库初始化之前为None。
+    """
+    version: int
+    level_config: Tuple[Dict, ...]
+    items: Mapping[str, Dict]
+    monsters: Mapping[str, Dict]
+    sects: Mapping[str, Dict]
+    bosses: Mapping[str, Dict]
+    levels: Tuple[LevelConfig, ...]
+    item_configs: Mapping[str, ItemConfig]
+    monster_configs: Mapping[str, MonsterConfig]
+    boss_configs: Mapping[str, BossConfig]
+    monster_table: MonsterTable
+    random_tables: RandomTables
+    realm_table: RealmTable
+    file_states: Mapping[str, FileState] = field(default_factory=dict)
+    catalog: Optional["ItemCatalog"] = None
+    
+    def __reduce__(self):
+        # MappingProxyType 不能直接 pickle，按普通字典保存，加载时重新包装
+        state = {f.name: getattr(self, f.name) for f in fields(self)}
+        for name in _MAPPING_FIELDS:
+            state[name] = dict(state[name])
+        return _restore_snapshot, (state,)
+
+
+def _restore_snapshot(state: Dict) -> ConfigSnapshot:
+    for name in _MAPPING_FIELDS:
+        state[name] = MappingProxyType(state[name])
+    return ConfigSnapshot(**state)
+
+
+ConfigListener = Callable[[ConfigSnapshot, ConfigSnapshot], Awaitable[None]]
+# 发布前处理新快照：preparer(旧快照, 新快照) -> 要发布的快照（如附上新的物品目录）
+ConfigPreparer = Callable[[ConfigSnapshot, ConfigSnapshot], Awaitable[ConfigSnapshot]]
 
 
 class ConfigManager:
-    def __init__(self, plugin_dir: str):
+    def __init__(self, plugin_dir: str, use_cache: bool = True):
         self.plugin_dir = Path(plugin_dir)
         self.config_dir = self.plugin_dir / "config"
         
+        # 编译缓存：解析、校验、编译后的快照，按源文件哈希失效
+        self.use_cache = use_cache
+        self.cache_path = self.config_dir / "__cache__" / "config.pickle"
+        self.load_stats: Dict[str, Any] = {}
+        
+        self._listeners: List[ConfigListener] = []
+        self._preparers: List[ConfigPreparer] = []
+        self._reload_lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+        self.reload_errors = 0
+        self.last_error: Optional[str] = None
+        # 上次校验失败时的文件状态，文件再次修改前不重复加载
+        self._rejected_states: Optional[Dict[str, FileState]] = None
+        
         # 加载配置文件
-        self.level_config: List[Dict] = []
-        self.items: Dict[str, Dict] = {}
-        self.monsters: Dict[str, Dict] = {}
-        self.sects: Dict[str, Dict] = {}
-        self.bosses: Dict[str, Dict] = {}
+        self._snapshot = self._load_configs()
+    
+    # --- 当前快照（兼容原有的属性访问方式） ---
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        return self._snapshot
+    
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+    
+    @property
+    def level_config(self) -> Tuple[Dict, ...]:
+        return self._snapshot.level_config
+    
+    @property
+    def items(self) -> Mapping[str, Dict]:
+        return self._snapshot.items
+    
+    @property
+    def monsters(self) -> Mapping[str, Dict]:
+        return self._snapshot.monsters
+    
+    @property
+    def sects(self) -> Mapping[str, Dict]:
+        return self._snapshot.sects
+    
+    @property
+    def bosses(self) -> Mapping[str, Dict]:
+        return self._snapshot.bosses
+    
+    @property
+    def levels(self) -> Tuple[LevelConfig, ...]:
+        return self._snapshot.levels
+    
+    @property
+    def item_configs(self) -> Mapping[str, ItemConfig]:
+        return self._snapshot.item_configs
+    
+    @property
+    def monster_configs(self) -> Mapping[str, MonsterConfig]:
+        return self._snapshot.monster_configs
+    
+    @property
+    def boss_configs(self) -> Mapping[str, BossConfig]:
+        return self._snapshot.boss_configs
+    
+    @property
+    def monster_table(self) -> MonsterTable:
+        """按境界编译的怪物表"""
+        return self._snapshot.monster_table
+    
+    @property
+    def random_tables(self) -> RandomTables:
+        """灵根、闭关事件等随机表"""
+        return self._snapshot.random_tables
+    
+    @property
+    def realm_table(self) -> RealmTable:
+        """境界表（名称/索引查找、大境界、闭关倍率和突破参数）"""
+        return self._snapshot.realm_table
+    
+    @property
+    def catalog(self) -> Optional["ItemCatalog"]:
+        """与当前快照对应的物品目录"""
+        return self._snapshot.catalog
+    
+    def publish_catalog(self, catalog: "ItemCatalog"):
+        """替换物品目录（配置不变），与快照一起一次性替换引用"""
+        self._snapshot = replace(self._snapshot, catalog=catalog)
+    
+    # --- 重新加载 ---
+    def add_listener(self, callback: ConfigListener):
+        """注册配置替换后的回调：callback(旧快照, 新快照)"""
+        self._listeners.append(callback)
+    
+    def add_preparer(self, callback: ConfigPreparer):
+        """注册配置替换前的处理：callback(旧快照, 新快照) 返回要发布的快照
         
-        self._load_configs()
+        在重新加载的锁内、新快照发布之前执行，命令处理在此期间仍读取旧快照。
+        """
+        self._preparers.append(callback)
+    
+    def reload(self) -> bool:
+        """同步重新加载全部配置；校验失败时保留当前快照（不执行 preparer，物品目录保持不变）"""
+        try:
+            snapshot, _ = self._load_or_build(self._snapshot.version + 1)
+        except Exception as e:
+            self._record_error(e)
+            return False
+        self._snapshot = replace(snapshot, catalog=self._snapshot.catalog)
+        return True
     
     def reload_items(self):
         """重新加载items配置"""
+        self.reload()
+    
+    def reload_monsters(self):
+        """重新加载monsters配置并原子替换怪物表"""
+        self.reload()
+    
+    async def reload_async(self, force: bool = False) -> bool:
+        """在线程池中读取并校验配置，完成后在事件循环中一次性替换快照
+        
+        force 为 False 时，配置文件均未变化则直接返回。
+        返回是否替换了快照。
+        """
+        async with self._reload_lock:
+            old = self._snapshot
+            if not force:
+                states = await asyncio.to_thread(self._file_states)
+                if states == dict(old.file_states) or states == self._rejected_states:
+                    return False
+            try:
+                snapshot, _ = await asyncio.to_thread(self._load_or_build, old.version + 1)
+            except Exception as e:
+                self._rejected_states = await asyncio.to_thread(self._file_states)
+                self._record_error(e)
+                return False
+            for prepare in self._preparers:
+                try:
+                    snapshot = await prepare(old, snapshot)
+                except Exception as e:
+                    print(f"配置重新加载准备失败: {e}")
+            if snapshot.catalog is None:
+                # 没有新的物品目录时沿用当前的（期间可能已被替换，取最新的）
+                snapshot = replace(snapshot, catalog=self._snapshot.catalog)
+            self._snapshot = snapshot
+            self._rejected_states = None
+        
+        changed = [name for name in CONFIG_FILES.values() if old.file_states.get(name) != snapshot.file_states.get(name)]
+        print(f"配置已重新加载(v{snapshot.version}): {', '.join(changed) or '全部'}")
+        for callback in self._listeners:
+            try:
+                await callback(old, snapshot)
+            except Exception as e:
+                print(f"配置重新加载回调执行失败: {e}")
+        return True
+    
+    async def start_watching(self, interval: float = 5.0):
+        """定时检查配置文件的修改时间，有变化时自动重新加载"""
+        if self._watch_task is None and interval and interval > 0:
+            self._watch_task = asyncio.create_task(self._watch_loop(interval))
+    
+    async def stop_watching(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+    
+    async def _watch_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload_async()
+            except Exception as e:
+                print(f"检查配置文件变化失败: {e}")
+    
+    def _record_error(self, e: Exception):
+        self.reload_errors += 1
+        self.last_error = str(e)
+        print(f"重新加载配置文件失败，继续使用当前配置: {e}")
+    
+    # --- 构建快照 ---
+    def _file_states(self) -> Dict[str, FileState]:
+        states = {}
+        for filename in CONFIG_FILES.values():
+            try:
+                stat = os.stat(self.config_dir / filename)
+                states[filename] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                states[filename] = None
+        return states
+    
+    def _read_sources(self) -> Dict[str, Optional[bytes]]:
+        """读取全部配置文件的原始内容，文件不存在时为None"""
+        sources = {}
+        for filename in CONFIG_FILES.values():
+            try:
+                sources[filename] = (self.config_dir / filename).read_bytes()
+            except FileNotFoundError:
+                sources[filename] = None
+        return sources
+    
+    @staticmethod
+    def _hash_sources(sources: Dict[str, Optional[bytes]]) -> Dict[str, Optional[str]]:
+        return {
+            filename: hashlib.sha256(data).hexdigest() if data is not None else None
+            for filename, data in sources.items()
+        }
+    
+    @staticmethod
+    def _parse_json(filename: str, sources: Dict[str, Optional[bytes]], default_factory: Callable[[], Any]) -> Any:
+        data = sources.get(filename)
+        if data is None:
+            return default_factory()
         try:
-            items_path = self.config_dir / "items.json"
-            if items_path.exists():
-                with open(items_path, "r", encoding="utf-8") as f:
-                    self.items = json.load(f)
-            else:
-                self.items = self._get_default_items()
+            return json.loads(data.decode("utf-8"))
+        except ValueError as e:
+            raise ConfigError(f"{filename}: JSON格式错误: {e}") from e
+    
+    def _load_or_build(self, version: int) -> Tuple[ConfigSnapshot, str]:
+        """优先使用编译缓存，源文件有变化时重新编译并写回缓存
+        
+        文件的修改时间和大小都没变时直接使用缓存，不读取源文件；
+        否则比较源文件哈希，只有内容确实变化时才重新解析。
+        返回 (快照, 来源)，来源为 "cache" 或 "compiled"。
+        """
+        # 先记录文件状态再读取，读取期间被修改的文件会在下一轮检查中重新加载
+        file_states = self._file_states()
+        cached = self._read_cache() if self.use_cache else None
+        if cached and cached["file_states"] == file_states:
+            return replace(cached["snapshot"], version=version), "cache"
+        
+        sources = self._read_sources()
+        hashes = self._hash_sources(sources)
+        if cached and cached["hashes"] == hashes:
+            snapshot = replace(cached["snapshot"], version=version, file_states=MappingProxyType(file_states))
+            source = "cache"
+        else:
+            snapshot = self._build_snapshot(version, sources, file_states)
+            source = "compiled"
+        if self.use_cache:
+            self._write_cache(snapshot, hashes)
+        return snapshot, source
+    
+    def _read_cache(self) -> Optional[Dict]:
+        """读取编译缓存：文件头（格式版本、编译代码指纹、源文件哈希和状态）之后是快照本身
+        
+        格式版本或编译代码指纹不一致时只读文件头，不反序列化快照；
+        校验失败时回退使用的上次配置也经过这里，不会用旧代码编译的快照启动。
+        """
+        # 反序列化会一次性创建大量容器对象，期间暂停分代回收
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(self.cache_path, "rb") as f:
+                cached = pickle.load(f)
+                if not isinstance(cached, dict) or cached.get("format") != COMPILED_CACHE_VERSION:
+                    return None
+                if cached.get("compiler") != compiler_fingerprint():
+                    return None
+                cached["snapshot"] = pickle.load(f)
+        except FileNotFoundError:
+            return None
         except Exception as e:
-            print(f"重新加载物品配置失败: {e}")
+            print(f"读取配置编译缓存失败，将重新编译: {e}")
+            return None
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return cached
     
-    def _load_configs(self):
-        """加载所有配置文件"""
+    def _write_cache(self, snapshot: ConfigSnapshot, hashes: Dict[str, Optional[str]]):
+        """写入编译缓存（先写临时文件再替换，避免留下不完整的缓存）"""
+        header = {
+            "format": COMPILED_CACHE_VERSION,
+            "compiler": compiler_fingerprint(),
+            "hashes": hashes,
+            "file_states": dict(snapshot.file_states)
+        }
+        # 物品目录来自数据库，不属于编译结果
+        snapshot = replace(snapshot, catalog=None)
         try:
-            # 加载境界配置
-            level_path = self.config_dir / "level_config.json"
-            if level_path.exists():
-                with open(level_path, "r", encoding="utf-8") as f:
-                    self.level_config = json.load(f)
-            else:
-                # 使用默认配置
-                self.level_config = self._get_default_level_config()
-            
-            # 加载物品配置
-            items_path = self.config_dir / "items.json"
-            if items_path.exists():
-                with open(items_path, "r", encoding="utf-8") as f:
-                    self.items = json.load(f)
-            else:
-                self.items = self._get_default_items()
-            
-            # 加载怪物配置
-            monsters_path = self.config_dir / "monsters.json"
-            if monsters_path.exists():
-                with open(monsters_path, "r", encoding="utf-8") as f:
-                    self.monsters = json.load(f)
-            else:
-                self.monsters = self._get_default_monsters()
-            
-            # 加载宗门配置
-            sects_path = self.config_dir / "sects.json"
-            if sects_path.exists():
-                with open(sects_path, "r", encoding="utf-8") as f:
-                    self.sects = json.load(f)
-            else:
-                self.sects = self._get_default_sects()
-            
-            # 加载boss配置
-            bosses_path = self.config_dir / "bosses.json"
-            if bosses_path.exists():
-                with open(bosses_path, "r", encoding="utf-8") as f:
-                    self.bosses = json.load(f)
-            else:
-                self.bosses = self._get_default_bosses()
-            
+            self.cache_path.parent.mkdir(exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
         except Exception as e:
-            print(f"加载配置文件失败: {e}")
-            self._reset_to_defaults()
+            print(f"写入配置编译缓存失败: {e}")
     
-    def _reset_to_defaults(self):
-        """重置所有配置为默认值"""
-        self.level_config = self._get_default_level_config()
-        self.items = self._get_default_items()
-        self.monsters = self._get_default_monsters()
-        self.sects = self._get_default_sects()
-        self.bosses = self._get_default_bosses()
+    def _build_snapshot(
+        self,
+        version: int,
+        sources: Dict[str, Optional[bytes]],
+        file_states: Dict[str, FileState]
+    ) -> ConfigSnapshot:
+        """解析、校验并构建快照（不修改当前状态，可在线程中执行）"""
+        level_config = self._parse_json(CONFIG_FILES["level_config"], sources, self._get_default_level_config)
+        items = self._parse_json(CONFIG_FILES["items"], sources, self._get_default_items)
+        monsters = self._parse_json(CONFIG_FILES["monsters"], sources, self._get_default_monsters)
+        sects = self._parse_json(CONFIG_FILES["sects"], sources, self._get_default_sects)
+        bosses = self._parse_json(CONFIG_FILES["bosses"], sources, self._get_default_bosses)
+        random_tables = self._parse_json(CONFIG_FILES["random_tables"], sources, self._get_default_random_tables)
+        
+        # 逐个文件校验并编译为类型化模型，收集全部错误后一次性报告
+        errors: List[str] = []
+        
+        def collect(load: Callable, *args):
+            try:
+                return load(*args)
+            except ConfigError as e:
+                errors.extend(e.errors)
+                return None
+        
+        levels = collect(load_list, LevelConfig, CONFIG_FILES["level_config"], level_config)
+        item_configs = collect(load_mapping, ItemConfig, CONFIG_FILES["items"], items, "item_id")
+        monster_configs = collect(load_mapping, MonsterConfig, CONFIG_FILES["monsters"], monsters, "monster_id")
+        boss_configs = collect(load_mapping, BossConfig, CONFIG_FILES["bosses"], bosses, "boss_id")
+        collect(_validate_mapping, CONFIG_FILES["sects"], sects)
+        compiled_tables = collect(_load_random_tables, random_tables)
+        if levels is not None:
+            errors.extend(_check_levels(levels))
+        if item_configs is not None:
+            for filename, configs in ((CONFIG_FILES["monsters"], monster_configs), (CONFIG_FILES["bosses"], boss_configs)):
+                errors.extend(_check_drops(filename, configs or {}, item_configs))
+        if errors:
+            raise ConfigError(errors)
+        
+        return ConfigSnapshot(
+            version=version,
+            level_config=tuple(level_config),
+            items=MappingProxyType(items),
+            monsters=MappingProxyType(monsters),
+            sects=MappingProxyType(sects),
+            bosses=MappingProxyType(bosses),
+            levels=levels,
+            item_configs=MappingProxyType(item_configs),
+            monster_configs=MappingProxyType(monster_configs),
+            boss_configs=MappingProxyType(boss_configs),
+            monster_table=MonsterTable.compile(monster_configs, len(levels)),
+            random_tables=compiled_tables,
+            realm_table=RealmTable.compile(levels),
+            file_states=MappingProxyType(file_states)
+        )
+    
+    def _load_configs(self) -> ConfigSnapshot:
+        """加载所有配置文件
+        
+        校验失败时使用编译缓存中上一次成功加载的快照（缓存只在校验通过后写入），
+        并在配置文件再次修改前不重复加载；没有可用的缓存时抛出 ConfigError，
+        不以空配置启动。
+        """
+        start = time.perf_counter()
+        try:
+            snapshot, source = self._load_or_build(1)
+        except Exception as e:
+            cached = self._read_cache() if self.use_cache else None
+            if cached is None:
+                errors = e.errors if isinstance(e, ConfigError) else [str(e)]
+                raise ConfigError(["加载配置文件失败，且没有可用的上次配置:"] + errors) from e
+            self._rejected_states = self._file_states()
+            self.reload_errors += 1
+            self.last_error = str(e)
+            print(f"加载配置文件失败，使用上次成功加载的配置: {e}")
+            snapshot, source = replace(cached["snapshot"], version=1), "fallback"
+        self.load_stats = {"source": source, "ms": round((time.perf_counter() - start) * 1000, 3)}
+        return snapshot
     
     def _get_default_level_config(self) -> List[Dict]:
         """获取默认境界配置"""
@@ -101,7 +487,73 @@ class ConfigManager:
         # 由于配置文件存在，此方法应不会被调用，返回空字典
         return {}
 
+    def _get_default_sects(self) -> Dict[str, Dict]:
+        """获取默认宗门配置"""
+        # 宗门由玩家创建，默认没有预置宗门
+        return {}
+
     def _get_default_bosses(self) -> Dict[str, Dict]:
         """获取默认Boss配置"""
         # 由于配置文件存在，此方法应不会被调用，返回空字典
-        return {}
\ No newline at end of file
+        return {}
+
+    def _get_default_random_tables(self) -> Dict[str, Any]:
+        """获取默认随机表配置"""
+        # 由于配置文件存在，此方法应不会被调用，返回空字典
+        return {}
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_fingerprint() -> str:
+    """编译快照的模块源码与 metadata.yaml（插件版本）的哈希，每个进程只计算一次"""
+    core_dir = Path(__file__).resolve().parent
+    digest = hashlib.sha256()
+    for path in [core_dir / name for name in _COMPILER_MODULES] + [core_dir.parent / "metadata.yaml"]:
+        digest.update(path.name.encode("utf-8"))
+        try:
+            digest.update(path.read_bytes())
+        except FileNotFoundError:
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _check_levels(levels: Tuple[LevelConfig, ...]) -> List[str]:
+    if not levels:
+        return [f"{CONFIG_FILES['level_config']}: 至少需要一个境界"]
+    errors, names = [], set()
+    for index, level in enumerate(levels):
+        if level.name in names:
+            errors.append(f"{CONFIG_FILES['level_config']}:[{index}].name: 境界名称 {level.name} 重复")
+        names.add(level.name)
+    return errors
+
+
+def _check_drops(filename: str, configs: Mapping, item_configs: Mapping[str, ItemConfig]) -> List[str]:
+    """掉落物品必须在 items.json 中存在，概率在 0~1 之间"""
+    errors = []
+    for key, config in configs.items():
+        for index, drop in enumerate(config.drop_items):
+            path = f"{filename}:{key}.drop_items[{index}]"
+            if drop.item_id not in item_configs:
+                errors.append(f"{path}.item_id: 物品 {drop.item_id} 在 {CONFIG_FILES['items']} 中不存在")
+            if not 0.0 <= drop.probability <= 1.0:
+                errors.append(f"{path}.probability: 应在0到1之间，实际为 {drop.probability}")
+    return errors
+
+
+def _validate_mapping(filename: str, config: Any):
+    if not isinstance(config, dict):
+        raise ConfigError(f"{filename}: 顶层应为对象")
+    errors = [f"{filename}:{key}: 应为对象" for key, value in config.items() if not isinstance(value, dict)]
+    if errors:
+        raise ConfigError(errors)
+
+
+def _load_random_tables(config: Any) -> RandomTables:
+    filename = CONFIG_FILES["random_tables"]
+    if not isinstance(config, dict):
+        raise ConfigError(f"{filename}: 顶层应为对象")
+    try:
+        return RandomTables(config)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise ConfigError(f"{filename}: {e}") from e
\ No newline at end of file
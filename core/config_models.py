@@ -0,0 +1,247 @@
+# config_models.py
+
+import dataclasses
+import typing
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar, Union
+
+T = TypeVar("T")
+
+
+class ConfigError(Exception):
+    """配置文件内容不合法
+
+    消息中每行一个错误，格式为 文件名:键路径: 原因，如
+    items.json:hp_potion.price: 应为整数，实际为 'abc'
+    """
+
+    def __init__(self, errors: Union[str, List[str]]):
+        self.errors = [errors] if isinstance(errors, str) else list(errors)
+        super().__init__("\n".join(self.errors))
+
+
+class FrozenModel:
+    """配置模型的基类：按构造参数序列化
+
+    frozen + slots 的 dataclass 默认逐字段 setattr 反序列化，编译缓存中模型数量多时
+    明显变慢；改为直接调用构造函数。
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return self.__class__, tuple(getattr(self, name) for name in self.__slots__)
+
+
+@dataclass(frozen=True, slots=True)
+class LevelConfig(FrozenModel):
+    """level_config.json 中的一个境界"""
+    name: str
+    spirit: int = 0                                 # 突破到该境界所需灵气
+    major: Optional[str] = None                     # 所属大境界，不填时由名称推断
+    meditate_multiplier: Optional[float] = None     # 闭关倍率，不填时按大境界取默认值
+
+
+@dataclass(frozen=True, slots=True)
+class DropConfig(FrozenModel):
+    """一项掉落：物品ID和独立判定的掉落概率"""
+    item_id: str
+    probability: float = 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class ItemConfig(FrozenModel):
+    """items.json 中的一个物品、装备或功法"""
+    item_id: str
+    name: str
+    type: str
+    description: str = ""
+    price: int = 0
+    quality: str = "common"
+    required_realm: str = "练气一层"
+    effects: Tuple[Tuple[str, float], ...] = ()     # (属性, 数值)，配置中写作对象
+    attack_bonus: int = 0
+    defense_bonus: int = 0
+    hp_bonus: int = 0
+    speed_bonus: int = 0
+    cultivation_speed_bonus: float = 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class MonsterConfig(FrozenModel):
+    """monsters.json 中的一个怪物"""
+    monster_id: str
+    name: str
+    max_hp_base: int
+    attack_base: int
+    defense_base: int
+    speed_base: int
+    spirit_stone: int = 0
+    drop_items: Tuple[DropConfig, ...] = ()
+    weight: float = 1.0
+    min_level: Optional[int] = None     # 可遇到该怪物的境界范围，不填表示不限
+    max_level: Optional[int] = None
+
+
+@dataclass(frozen=True, slots=True)
+class BossConfig(FrozenModel):
+    """bosses.json 中的一个世界Boss"""
+    boss_id: str
+    name: str
+    max_hp_base: int
+    attack_base: int
+    defense_base: int
+    speed_base: int
+    spirit_stone: int = 0
+    drop_items: Tuple[DropConfig, ...] = ()
+
+
+class _Invalid(Exception):
+    """字段校验失败（键路径在向外传递时逐级补全）"""
+
+    def __init__(self, reason: str, path: str = ""):
+        self.reason = reason
+        self.path = path
+
+
+# 每个模型类编译一次的加载计划：(字段名, 转换函数, 是否必填)
+_PLANS: Dict[type, Tuple[Tuple[str, Callable[[Any], Any], bool], ...]] = {}
+
+
+def _plan(cls: type) -> Tuple[Tuple[str, Callable[[Any], Any], bool], ...]:
+    plan = _PLANS.get(cls)
+    if plan is None:
+        hints = typing.get_type_hints(cls)
+        plan = _PLANS[cls] = tuple(
+            (
+                f.name,
+                _converter(hints[f.name]),
+                f.default is dataclasses.MISSING and f.default_factory is dataclasses.MISSING
+            )
+            for f in dataclasses.fields(cls)
+        )
+    return plan
+
+
+def _build(cls: type, data: Any, values: Dict[str, Any]) -> Any:
+    if not isinstance(data, dict):
+        raise _Invalid(f"应为对象，实际为 {data!r}")
+    kwargs = dict(values)
+    for name, convert, required in _plan(cls):
+        if name in kwargs:
+            continue
+        if name not in data:
+            if required:
+                raise _Invalid("缺少必填字段", f".{name}")
+            continue
+        try:
+            kwargs[name] = convert(data[name])
+        except _Invalid as e:
+            e.path = f".{name}{e.path}"
+            raise
+    return cls(**kwargs)
+
+
+def load_model(cls: Type[T], data: Any, path: str, **values) -> T:
+    """按 dataclass 字段的类型注解校验 data 并构建模型
+
+    values 为不从 data 中读取的字段（如以配置键名作为ID）；
+    没有默认值的字段必须出现在 data 中，未声明的键忽略。
+    """
+    try:
+        return _build(cls, data, values)
+    except _Invalid as e:
+        raise ConfigError(f"{path}{e.path}: {e.reason}") from None
+
+
+def _converter(hint: Any) -> Callable[[Any], Any]:
+    """按类型注解生成转换函数（加载计划编译时调用一次）"""
+    origin, args = typing.get_origin(hint), typing.get_args(hint)
+    if origin is Union:
+        # Optional[X]
+        inner = _converter(next(arg for arg in args if arg is not type(None)))
+        return lambda value: None if value is None else inner(value)
+
+    if hint is str:
+        def convert_str(value):
+            if not isinstance(value, str):
+                raise _Invalid(f"应为字符串，实际为 {value!r}")
+            return value
+        return convert_str
+    if hint is int:
+        def convert_int(value):
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+                raise _Invalid(f"应为整数，实际为 {value!r}")
+            return int(value)
+        return convert_int
+    if hint is float:
+        def convert_float(value):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise _Invalid(f"应为数字，实际为 {value!r}")
+            return float(value)
+        return convert_float
+    if origin is tuple and len(args) == 2 and args[1] is Ellipsis:
+        element = _converter(args[0])
+
+        def convert_items(value):
+            # 变长元组：配置中为数组；元素是 (键, 值) 对时也接受对象写法
+            if isinstance(value, dict):
+                value = list(value.items())
+            if not isinstance(value, list):
+                raise _Invalid(f"应为数组，实际为 {value!r}")
+            result = []
+            for index, item in enumerate(value):
+                try:
+                    result.append(element(item))
+                except _Invalid as e:
+                    e.path = f"[{index}]{e.path}"
+                    raise
+            return tuple(result)
+        return convert_items
+    if origin is tuple:
+        elements = tuple(_converter(arg) for arg in args)
+
+        def convert_fixed(value):
+            if not isinstance(value, (list, tuple)) or len(value) != len(elements):
+                raise _Invalid(f"应为长度为{len(elements)}的数组，实际为 {value!r}")
+            result = []
+            for index, (convert, item) in enumerate(zip(elements, value)):
+                try:
+                    result.append(convert(item))
+                except _Invalid as e:
+                    e.path = f"[{index}]{e.path}"
+                    raise
+            return tuple(result)
+        return convert_fixed
+    if dataclasses.is_dataclass(hint):
+        return lambda value: _build(hint, value, {})
+    raise TypeError(f"不支持的配置字段类型: {hint}")
+
+
+def load_mapping(cls: Type[T], filename: str, data: Any, id_field: str) -> Dict[str, T]:
+    """加载 {ID: 对象} 形式的配置文件，收集全部条目的错误后一次性抛出"""
+    if not isinstance(data, dict):
+        raise ConfigError(f"{filename}: 顶层应为对象")
+    models, errors = {}, []
+    for key, value in data.items():
+        try:
+            models[key] = load_model(cls, value, f"{filename}:{key}", **{id_field: key})
+        except ConfigError as e:
+            errors.extend(e.errors)
+    if errors:
+        raise ConfigError(errors)
+    return models
+
+
+def load_list(cls: Type[T], filename: str, data: Any) -> Tuple[T, ...]:
+    """加载数组形式的配置文件，收集全部条目的错误后一次性抛出"""
+    if not isinstance(data, list):
+        raise ConfigError(f"{filename}: 顶层应为数组")
+    models, errors = [], []
+    for index, value in enumerate(data):
+        try:
+            models.append(load_model(cls, value, f"{filename}:[{index}]"))
+        except ConfigError as e:
+            errors.extend(e.errors)
+    if errors:
+        raise ConfigError(errors)
+    return tuple(models)
@@ -0,0 +1,120 @@
+# monster_table.py
+
+import bisect
+import random
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Tuple
+
+from ..models import Monster
+from .config_models import FrozenModel, MonsterConfig
+from .sampling import LootTable
+
+# 挑战时怪物属性为玩家属性的该比例，且不低于怪物的基础值
+MONSTER_STAT_SCALE = 0.5
+
+
+@dataclass(frozen=True, slots=True)
+class MonsterTemplate(FrozenModel):
+    """monsters.json 中的一条怪物配置（编译后只读）"""
+    monster_id: str
+    name: str
+    max_hp_base: int
+    attack_base: int
+    defense_base: int
+    speed_base: int
+    spirit_stone: int
+    drop_items: Tuple[Tuple[str, float], ...]   # (物品ID, 掉落概率)
+    loot: LootTable
+    weight: float = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class _LevelPool:
+    """某个境界可遇到的怪物及其累计权重（用于 O(log n) 加权抽取）"""
+    templates: Tuple[MonsterTemplate, ...]
+    cum_weights: Tuple[float, ...]
+
+
+class MonsterTable:
+    """按境界编译好的怪物表
+
+    配置加载时一次性生成：每个境界一个怪物池（按 monsters.json 中可选的
+    min_level / max_level 过滤）及累计权重数组，挑战时只需一次二分查找。
+    实例不可变，重新加载配置时整体替换。
+    """
+
+    def __init__(self, templates: Tuple[MonsterTemplate, ...], pools: Tuple[_LevelPool, ...]):
+        self.templates = templates
+        self._by_id = {template.monster_id: template for template in templates}
+        self._pools = pools
+
+    @classmethod
+    def compile(cls, monsters: Mapping[str, MonsterConfig], level_count: int) -> "MonsterTable":
+        level_count = max(1, level_count)
+        templates = []
+        ranges = []
+        for monster in monsters.values():
+            drop_items = tuple((drop.item_id, drop.probability) for drop in monster.drop_items)
+            templates.append(MonsterTemplate(
+                monster_id=monster.monster_id,
+                name=monster.name,
+                max_hp_base=monster.max_hp_base,
+                attack_base=monster.attack_base,
+                defense_base=monster.defense_base,
+                speed_base=monster.speed_base,
+                spirit_stone=monster.spirit_stone,
+                drop_items=drop_items,
+                loot=LootTable(drop_items),
+                weight=max(0.0, monster.weight)
+            ))
+            ranges.append((
+                0 if monster.min_level is None else monster.min_level,
+                level_count - 1 if monster.max_level is None else monster.max_level
+            ))
+
+        pools = []
+        for level_index in range(level_count):
+            pool = [
+                template for template, (min_level, max_level) in zip(templates, ranges)
+                if min_level <= level_index <= max_level and template.weight > 0
+            ]
+            cum_weights, total = [], 0.0
+            for template in pool:
+                total += template.weight
+                cum_weights.append(total)
+            pools.append(_LevelPool(tuple(pool), tuple(cum_weights)))
+        return cls(tuple(templates), tuple(pools))
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def get(self, monster_id: str) -> Optional[MonsterTemplate]:
+        return self._by_id.get(monster_id)
+
+    def pool(self, level_index: int) -> Tuple[MonsterTemplate, ...]:
+        return self._pool(level_index).templates
+
+    def _pool(self, level_index: int) -> _LevelPool:
+        return self._pools[min(max(0, level_index), len(self._pools) - 1)]
+
+    def pick(self, level_index: int, rng: random.Random) -> Optional[MonsterTemplate]:
+        """按权重随机选取该境界可遇到的怪物"""
+        pool = self._pool(level_index)
+        if not pool.templates:
+            return None
+        index = bisect.bisect_right(pool.cum_weights, rng.random() * pool.cum_weights[-1])
+        return pool.templates[min(index, len(pool.templates) - 1)]
+
+    @staticmethod
+    def spawn(template: MonsterTemplate, player_stats: Dict) -> Monster:
+        """按玩家的战斗属性生成怪物实例"""
+        return Monster(
+            monster_id=template.monster_id,
+            name=template.name,
+            max_hp=max(template.max_hp_base, int(player_stats["hp"] * MONSTER_STAT_SCALE)),
+            attack=max(template.attack_base, int(player_stats["attack"] * MONSTER_STAT_SCALE)),
+            defense=max(template.defense_base, int(player_stats["defense"] * MONSTER_STAT_SCALE)),
+            speed=max(template.speed_base, int(player_stats["speed"] * MONSTER_STAT_SCALE)),
+            spirit_stone=template.spirit_stone,
+            drop_items=[{"item_id": item_id, "probability": probability} for item_id, probability in template.drop_items]
+        )
@@ -0,0 +1,49 @@
+# realm_rules.py
+
+# 每次突破成功后基础属性的提升倍率
+BREAKTHROUGH_STAT_GROWTH = 1.2
+
+# 中境界起（该大境界的第一个小境界，如炼虚初期），突破失败可能触发天道惩罚；
+# 起始位置由编译后的境界表确定，level_config 中没有该大境界时不触发
+MIDDLE_REALM_MAJOR = "炼虚"
+
+# 中境界突破失败时触发天道惩罚（境界跌落、灵气减半）的概率
+HEAVENLY_PUNISHMENT_CHANCE = 0.3
+
+# 突破失败损失灵气的比例（中境界起惩罚更重）
+BREAKTHROUGH_SPIRIT_LOSS = 0.1
+MIDDLE_REALM_SPIRIT_LOSS = 0.2
+
+# 各大境界闭关获取灵气的倍率（未列出的大境界按1.0计算）
+MEDITATE_MULTIPLIERS = {
+    "练气": 1.0,
+    "筑基": 1.2,
+    "金丹": 1.5,
+    "元婴": 1.8,
+    "化神": 2.2,
+    "炼虚": 2.5,
+    "合体": 2.8,
+    "大乘": 3.0
+}
+
+
+def breakthrough_success_rate(spirit: int, next_level_index: int) -> float:
+    """计算突破成功率"""
+    # 基础成功率
+    base_success_rate = 0.5  # 50%基础成功率
+    
+    # 根据境界等级调整成功率，越往后成功率越低
+    level_multiplier = max(0.1, 1.0 - (next_level_index * 0.15))  # 更陡峭的下降曲线
+    
+    # 根据玩家当前灵气值调整成功率，灵气越多成功率越高
+    # 灵气值越高，突破成功率加成越高，最多增加50%成功率
+    spirit_multiplier = 1 + min(0.5, (spirit / 500) * 0.2)  # 每500点灵力增加20%成功率，最多增加50%
+    
+    success_rate = base_success_rate * level_multiplier * spirit_multiplier
+    
+    return min(0.95, success_rate)  # 最大成功率不超过95%
+
+
+def grow_stat(value: int) -> int:
+    """突破成功后单项基础属性的新值"""
+    return int(value * BREAKTHROUGH_STAT_GROWTH)
@@ -0,0 +1,105 @@
+# realm_table.py
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+from .config_models import FrozenModel, LevelConfig
+from .realm_rules import (
+    BREAKTHROUGH_SPIRIT_LOSS,
+    HEAVENLY_PUNISHMENT_CHANCE,
+    MEDITATE_MULTIPLIERS,
+    MIDDLE_REALM_MAJOR,
+    MIDDLE_REALM_SPIRIT_LOSS
+)
+
+# 境界名称末尾的小境界后缀：“X层”或“初期/中期/后期”等
+_STAGE_SUFFIX = re.compile(r"(?:[一二三四五六七八九十百\d]+层|[初中后]期|大圆满|圆满)$")
+
+
+def major_realm_name(name: str) -> str:
+    """境界名称对应的大境界，如 练气三层 -> 练气，筑基初期 -> 筑基"""
+    return _STAGE_SUFFIX.sub("", name) or name
+
+
+@dataclass(frozen=True, slots=True)
+class Realm(FrozenModel):
+    """一个境界（小境界）编译后的参数"""
+    index: int
+    name: str
+    major: str                  # 所属大境界
+    major_index: int
+    spirit: int                 # 突破到该境界所需灵气，也是该境界功法的升级经验
+    meditate_multiplier: float  # 闭关获取灵气的倍率
+    punishment_chance: float    # 突破到该境界失败时触发天道惩罚的概率
+    spirit_loss: float          # 突破到该境界失败时损失灵气的比例
+
+
+class RealmTable:
+    """level_config.json 编译后的境界表
+    
+    名称 -> 索引、索引 -> 大境界、闭关倍率和突破参数都在加载配置时一次性算好，
+    查询均为 O(1)。level_config 中的境界可用 major / meditate_multiplier 覆盖默认值。
+    实例不可变，重新加载配置时随快照整体替换。
+    """
+    
+    def __init__(self, realms: Tuple[Realm, ...]):
+        self.realms = realms
+        self._by_name: Dict[str, Realm] = {realm.name: realm for realm in realms}
+        self.majors: Tuple[str, ...] = tuple(dict.fromkeys(realm.major for realm in realms))
+    
+    @classmethod
+    def compile(cls, levels: Sequence[LevelConfig]) -> "RealmTable":
+        majors = [level.major or major_realm_name(level.name) for level in levels]
+        # 中境界从 MIDDLE_REALM_MAJOR 的第一个小境界开始
+        middle_index = majors.index(MIDDLE_REALM_MAJOR) if MIDDLE_REALM_MAJOR in majors else len(majors)
+        major_indexes: Dict[str, int] = {}
+        realms = []
+        for index, (level, major) in enumerate(zip(levels, majors)):
+            middle = index >= middle_index
+            if level.meditate_multiplier is not None:
+                meditate_multiplier = level.meditate_multiplier
+            else:
+                meditate_multiplier = MEDITATE_MULTIPLIERS.get(major, 1.0)
+            realms.append(Realm(
+                index=index,
+                name=level.name,
+                major=major,
+                major_index=major_indexes.setdefault(major, len(major_indexes)),
+                spirit=level.spirit,
+                meditate_multiplier=meditate_multiplier,
+                punishment_chance=HEAVENLY_PUNISHMENT_CHANCE if middle else 0.0,
+                spirit_loss=MIDDLE_REALM_SPIRIT_LOSS if middle else BREAKTHROUGH_SPIRIT_LOSS
+            ))
+        return cls(tuple(realms))
+    
+    def __len__(self) -> int:
+        return len(self.realms)
+    
+    @property
+    def max_index(self) -> int:
+        return len(self.realms) - 1
+    
+    def get(self, level_index: int) -> Realm:
+        """按索引获取境界，超出范围时取最高境界（与 Player.get_level 一致）"""
+        if not self.realms:
+            raise LookupError("境界表为空，请检查 level_config.json")
+        return self.realms[min(max(0, level_index), len(self.realms) - 1)]
+    
+    def next(self, level_index: int) -> Optional[Realm]:
+        """下一个境界，已是最高境界时返回None"""
+        if level_index + 1 < len(self.realms):
+            return self.realms[level_index + 1]
+        return None
+    
+    def by_name(self, name: str) -> Optional[Realm]:
+        return self._by_name.get(name)
+    
+    def index_of(self, name: str, default: Optional[int] = None) -> Optional[int]:
+        realm = self._by_name.get(name)
+        return realm.index if realm else default
+    
+    def upgrade_exp(self, realm_name: str) -> int:
+        """功法升级经验：取要求境界的突破灵气，找不到对应境界时为0（即练气一层）"""
+        realm = self._by_name.get(realm_name)
+        return realm.spirit if realm else 0
@@ -0,0 +1,74 @@
+# replay.py
+
+import random
+import struct
+from dataclasses import dataclass
+from typing import Dict, List
+
+from .combat_engine import CombatResult, resolve, iter_rounds, summarize
+
+# 战斗规则变化时递增，旧版本的回放记录不再按新规则重算
+ENGINE_VERSION = 1
+
+# 引擎版本(1字节) + 随机种子(8字节) + 双方 血量/攻击/防御/速度(8 x 4字节)，共41字节
+_REPLAY_FORMAT = struct.Struct("<BQ8i")
+
+
+@dataclass(frozen=True)
+class Replay:
+    """一场战斗的回放记录：随机种子和开战时双方属性的快照"""
+    engine_version: int
+    seed: int
+    a_hp: int
+    a_stats: Dict
+    b_hp: int
+    b_stats: Dict
+
+    def pack(self) -> bytes:
+        return _REPLAY_FORMAT.pack(
+            self.engine_version, self.seed,
+            self.a_hp, self.a_stats["attack"], self.a_stats["defense"], self.a_stats["speed"],
+            self.b_hp, self.b_stats["attack"], self.b_stats["defense"], self.b_stats["speed"]
+        )
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "Replay":
+        version, seed, a_hp, a_attack, a_defense, a_speed, b_hp, b_attack, b_defense, b_speed = \
+            _REPLAY_FORMAT.unpack(data)
+        return cls(
+            engine_version=version,
+            seed=seed,
+            a_hp=a_hp,
+            a_stats={"attack": a_attack, "defense": a_defense, "speed": a_speed},
+            b_hp=b_hp,
+            b_stats={"attack": b_attack, "defense": b_defense, "speed": b_speed}
+        )
+
+    def resolve(self) -> CombatResult:
+        """按记录的属性重新结算战斗"""
+        if self.engine_version != ENGINE_VERSION:
+            raise ValueError(f"不支持的战斗引擎版本: v{self.engine_version}（当前为 v{ENGINE_VERSION}）")
+        return resolve(self.a_hp, self.a_stats, self.b_hp, self.b_stats)
+
+    def transcript(self, b_name: str) -> List[str]:
+        """重新生成逐回合战报"""
+        result = self.resolve()
+        return list(iter_rounds(result, b_name)) + [summarize(result, b_name)]
+
+
+def new_seed() -> int:
+    return random.getrandbits(64)
+
+
+def battle_rng(seed: int) -> random.Random:
+    """每场战斗独立的随机数生成器（怪物选择、掉落等都从这里取）"""
+    return random.Random(seed)
+
+
+def _combat_stats(stats: Dict) -> Dict:
+    return {"attack": stats["attack"], "defense": stats["defense"], "speed": stats["speed"]}
+
+
+def record(seed: int, a_hp: int, a_stats: Dict, b_hp: int, b_stats: Dict) -> Replay:
+    """记录开战时的属性快照（只保留结算需要的字段）"""
+    return Replay(ENGINE_VERSION, seed, a_hp, _combat_stats(a_stats), b_hp, _combat_stats(b_stats))
@@ -0,0 +1,151 @@
+# sampling.py
+
+import math
+import random
+from collections import Counter
+from typing import Dict, Generic, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 未指定随机数生成器时使用（需要复现的场景应传入按种子创建的 random.Random）
+_default_rng = random.Random()
+
+
+class AliasTable(Generic[T]):
+    """按权重随机选取（Walker/Vose 别名法）
+
+    构建 O(n)，每次抽取 O(1)：一次随机选列，一次随机决定取本列还是别名列。
+    实例不可变，随配置加载一次性构建。
+    """
+
+    __slots__ = ("outcomes", "_prob", "_alias")
+
+    def __init__(self, outcomes: Sequence[T], weights: Sequence[float]):
+        if len(outcomes) != len(weights):
+            raise ValueError("outcomes 与 weights 长度不一致")
+        pairs = [(outcome, float(weight)) for outcome, weight in zip(outcomes, weights) if weight > 0]
+        if not pairs:
+            raise ValueError("至少需要一个权重大于0的选项")
+
+        n = len(pairs)
+        total = sum(weight for _, weight in pairs)
+        scaled = [weight * n / total for _, weight in pairs]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 剩余列因浮点误差可能略小于1，按1处理
+
+        self.outcomes: Tuple[T, ...] = tuple(outcome for outcome, _ in pairs)
+        self._prob = tuple(prob)
+        self._alias = tuple(alias)
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[T, float]]) -> "AliasTable[T]":
+        pairs = list(pairs)
+        return cls([outcome for outcome, _ in pairs], [weight for _, weight in pairs])
+
+    def __len__(self) -> int:
+        return len(self.outcomes)
+
+    def sample(self, rng: random.Random) -> T:
+        column = int(rng.random() * len(self._prob))
+        if rng.random() < self._prob[column]:
+            return self.outcomes[column]
+        return self.outcomes[self._alias[column]]
+
+    def sample_many(self, rng: random.Random, k: int) -> List[T]:
+        """一次抽取 k 个结果"""
+        n = len(self._prob)
+        outcomes, prob, alias, rand = self.outcomes, self._prob, self._alias, rng.random
+        result = []
+        for _ in range(k):
+            column = int(rand() * n)
+            result.append(outcomes[column] if rand() < prob[column] else outcomes[alias[column]])
+        return result
+
+    def counts(self, rng: random.Random, k: int) -> Dict[T, int]:
+        """抽取 k 次，只返回各结果出现的次数"""
+        return dict(Counter(self.sample_many(rng, k)))
+
+
+def _bernoulli_count(rng: random.Random, n: int, p: float) -> int:
+    """n 次概率为 p 的独立试验中成功的次数
+
+    按几何分布直接跳到下一次成功，耗时与成功次数成正比而不是与 n 成正比。
+    """
+    if n <= 0 or p <= 0:
+        return 0
+    if p >= 1:
+        return n
+    log_q = math.log1p(-p)
+    count, position = 0, 0
+    while True:
+        # 1 - random() 落在 (0, 1]，避免 log(0)
+        position += int(math.log(1.0 - rng.random()) / log_q) + 1
+        if position > n:
+            return count
+        count += 1
+
+
+class LootTable:
+    """独立掉落表：每个物品按各自概率独立判定（与 monsters.json 中 drop_items 的含义一致）"""
+
+    __slots__ = ("drops",)
+
+    def __init__(self, drops: Iterable[Tuple[str, float]]):
+        self.drops: Tuple[Tuple[str, float], ...] = tuple(
+            (item_id, min(1.0, max(0.0, float(probability)))) for item_id, probability in drops
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.drops)
+
+    def roll(self, rng: random.Random) -> List[str]:
+        """一场战斗的掉落"""
+        return [item_id for item_id, probability in self.drops if rng.random() < probability]
+
+    def roll_many(self, rng: random.Random, n: int) -> Dict[str, int]:
+        """n 场战斗的掉落汇总：物品ID -> 数量（用于连续战斗等批量结算）"""
+        totals: Dict[str, int] = {}
+        for item_id, probability in self.drops:
+            count = _bernoulli_count(rng, n, probability)
+            if count:
+                totals[item_id] = totals.get(item_id, 0) + count
+        return totals
+
+
+class RandomTables:
+    """random_tables.json 编译后的随机表：灵根分配和闭关特殊事件"""
+
+    def __init__(self, config: Dict):
+        roots = config.get("spiritual_roots", [])
+        self.spiritual_roots: Optional[AliasTable[str]] = AliasTable.from_pairs(
+            (root["name"], root.get("weight", 1)) for root in roots
+        ) if roots else None
+
+        meditate = config.get("meditate_events", {})
+        self.meditate_event_chance = min(1.0, max(0.0, float(meditate.get("chance", 0))))
+        events = meditate.get("events", [])
+        self.meditate_events = AliasTable.from_pairs(
+            (event["text"], event.get("weight", 1)) for event in events
+        ) if events else None
+
+    def roll_spiritual_root(self, rng: Optional[random.Random] = None) -> str:
+        """随机分配灵根（未配置时返回"未知"）"""
+        if self.spiritual_roots is None:
+            return "未知"
+        return self.spiritual_roots.sample(rng or _default_rng)
+
+    def roll_meditate_event(self, rng: Optional[random.Random] = None) -> Optional[str]:
+        """闭关特殊事件，未触发时返回None"""
+        rng = rng or _default_rng
+        if self.meditate_events is None or rng.random() >= self.meditate_event_chance:
+            return None
+        return self.meditate_events.sample(rng)
@@ -0,0 +1,424 @@
+# simulator.py
+"""离线战斗平衡模拟器
+
+按 level_config.json 中的每个境界、items.json 中所有可用的装备/功法组合生成玩家，
+用与 combat_engine.resolve 相同的规则批量结算：
+  - 玩家 vs 怪物（monsters.json 按挑战规则随玩家属性缩放，bosses.json 使用固定属性）
+  - 玩家 vs 玩家（境界 x 境界 胜率矩阵）
+并输出各境界的突破成功率。属性相同的配装合并计权；玩家对战规模过大时每个境界按权重抽样（--pvp-sample）。
+
+装备和功法的属性加成与插件运行时一致：items.json 按物品同步的规则转换为数据库记录，
+构建同样的物品目录后由 Player.get_combat_stats 计算；指定 --db 时直接使用插件数据库中的物品目录
+（包含迁移写入的 equipments 表装备）。
+
+用法（在 AstrBot 的插件目录下执行）：
+    python -m astrbot_plugin_xiuxianzhuan.core.simulator [--config-dir DIR] [--db FILE] [--json OUT]
+
+需要 numpy；插件运行时不依赖本模块。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 仅离线分析需要
+    np = None
+
+from ..data.catalog import ItemCatalog
+from ..data.item_sync import SYNC_TABLES, build_rows
+from ..models import Player
+from .combat_engine import resolve
+from .config_models import LevelConfig, load_list
+from .monster_table import MONSTER_STAT_SCALE
+from .realm_rules import breakthrough_success_rate, grow_stat
+from .realm_table import RealmTable
+
+EQUIPMENT_SLOTS = ("weapon", "armor", "shoes", "accessory")
+
+_STATS = ("hp", "attack", "defense", "speed")
+
+_NUMPY_REQUIRED = "模拟器需要 numpy，请先执行: pip install numpy"
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError(_NUMPY_REQUIRED)
+
+
+def load_config(config_dir: Path) -> Dict:
+    """直接读取配置目录中的JSON文件（不依赖插件运行环境）"""
+    config = {}
+    for key, filename, default in (
+        ("level_config", "level_config.json", []),
+        ("items", "items.json", {}),
+        ("monsters", "monsters.json", {}),
+        ("bosses", "bosses.json", {}),
+    ):
+        path = config_dir / filename
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                config[key] = json.load(f)
+        else:
+            config[key] = default
+    return config
+
+
+def synced_catalog(config: Dict) -> ItemCatalog:
+    """items.json 同步到数据库后插件使用的物品目录（不读数据库，不含 equipments 表中的装备）"""
+    realm_table = RealmTable.compile(load_list(LevelConfig, "level_config.json", config["level_config"]))
+    tables: Dict[str, List[Dict]] = {table: [] for table in SYNC_TABLES}
+    for item_id, item_data in config["items"].items():
+        for table, row in build_rows(item_id, item_data, realm_table).items():
+            tables[table].append(dict(zip(SYNC_TABLES[table][1], row)))
+    return ItemCatalog.from_rows(
+        danyao_rows=tables["danyao"], item_rows=tables["items"], gongfa_rows=tables["gongfas"]
+    )
+
+
+async def _load_catalog(db_path: Path) -> ItemCatalog:
+    import aiosqlite
+
+    async with aiosqlite.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+        return await ItemCatalog.load(conn)
+
+
+def _bonus(equipment: Optional[Mapping] = None, gongfa: Optional[Mapping] = None) -> Tuple[int, ...]:
+    """一件装备或一本功法经 Player.get_combat_stats 得到的属性加成（各项加成可直接相加）"""
+    player = Player(user_id="", max_hp=0, attack=0, defense=0, speed=0, spirit=0)
+    equipments = {}
+    if equipment is not None:
+        player.equipment_ids = {equipment.get("slot", "unknown"): equipment["item_id"]}
+        equipments[equipment["item_id"]] = equipment
+    stats = player.get_combat_stats(equipments, [gongfa] if gongfa is not None else [])
+    return tuple(int(stats[stat]) for stat in _STATS)
+
+
+def _required_level(record: Mapping, level_index_by_name: Dict[str, int]) -> int:
+    required = record.get("required_realm", 0)
+    if isinstance(required, str):
+        return level_index_by_name.get(required, 0)
+    return int(required or 0)
+
+
+class Roster:
+    """玩家属性表：每行是一种不同的属性组合，weight 为得到该组合的配装方式数量
+
+    行按境界排序；属性相同的配装合并为一行，以减少需要结算的对局数。
+    """
+
+    def __init__(self, level, stats, weight):
+        _require_numpy()
+        self.level = np.asarray(level, dtype=np.int64)
+        stats = np.asarray(stats, dtype=np.int64).reshape(-1, 4)
+        self.hp, self.attack, self.defense, self.speed = (stats[:, i].copy() for i in range(4))
+        self.weight = np.asarray(weight, dtype=np.float64)
+        self.level_count = int(self.level.max()) + 1 if len(self.level) else 0
+        # 每个境界的配装总数（用于按境界求加权平均）
+        self.level_weight = np.bincount(self.level, weights=self.weight, minlength=self.level_count)
+
+    def __len__(self) -> int:
+        return len(self.level)
+
+    def sample(self, per_level: int, rng) -> "Roster":
+        """每个境界按权重抽样至多 per_level 行，用于规模过大时的玩家对战"""
+        levels, stats, weights = [], [], []
+        for level_index in range(self.level_count):
+            rows = np.flatnonzero(self.level == level_index)
+            if len(rows) > per_level:
+                p = self.weight[rows] / self.weight[rows].sum()
+                rows = rng.choice(rows, size=per_level, p=p)
+                row_weights = np.full(per_level, 1.0)
+            else:
+                row_weights = self.weight[rows]
+            levels.append(self.level[rows])
+            stats.append(np.stack([self.hp[rows], self.attack[rows], self.defense[rows], self.speed[rows]], axis=1))
+            weights.append(row_weights)
+        return Roster(np.concatenate(levels), np.concatenate(stats), np.concatenate(weights))
+
+
+def _combination_totals(bonuses: List[np.ndarray]) -> np.ndarray:
+    """每个部位可选其一（或不装备）时，所有组合的属性加成之和"""
+    totals = np.zeros((1, 4), dtype=np.int64)
+    for options in bonuses:
+        totals = (totals[:, None, :] + options[None, :, :]).reshape(-1, 4)
+    return totals
+
+
+def build_roster(config: Dict, max_gongfas: int = 5, catalog: Optional[ItemCatalog] = None) -> Roster:
+    """catalog 为插件使用的物品目录，不指定时由 items.json 按同步规则构建"""
+    _require_numpy()
+    level_config = config["level_config"]
+    level_index_by_name = {level["name"]: index for index, level in enumerate(level_config)}
+    if catalog is None:
+        catalog = synced_catalog(config)
+
+    # 同一部位只能穿一件；未写明部位的装备与运行时一样都穿在 unknown 部位
+    equipments: Dict[str, List[Tuple[int, Tuple[int, ...]]]] = {slot: [] for slot in EQUIPMENT_SLOTS}
+    for record in catalog.by_type("equipment"):
+        equipments.setdefault(record.get("slot", "unknown"), []).append(
+            (_required_level(record, level_index_by_name), _bonus(equipment=record))
+        )
+    # gongfas 表不记录所需境界，取 items.json 中的配置
+    gongfas: List[Tuple[int, Tuple[int, ...]]] = [
+        (_required_level(config["items"].get(record["id"], {}), level_index_by_name), _bonus(gongfa=record))
+        for record in catalog.all_gongfas()
+    ]
+
+    # 与新玩家一致的初始属性，每个境界按突破规则成长
+    base = Player(user_id="")
+    stats = [base.max_hp, base.attack, base.defense, base.speed]
+
+    levels, rows, weights = [], [], []
+    for level_index in range(len(level_config)):
+        if level_index:
+            stats = [grow_stat(value) for value in stats]
+
+        gear = _combination_totals([
+            np.asarray([(0, 0, 0, 0)] + [bonus for required, bonus in entries if required <= level_index], dtype=np.int64)
+            for entries in equipments.values()
+        ])
+        usable = [bonus for required, bonus in gongfas if required <= level_index]
+        gongfa_sets = np.asarray([
+            np.sum(combo, axis=0) if combo else (0, 0, 0, 0)
+            for size in range(min(max_gongfas, len(usable)) + 1)
+            for combo in itertools.combinations(usable, size)
+        ], dtype=np.int64).reshape(-1, 4)
+
+        totals = (np.asarray(stats, dtype=np.int64) + gear[:, None, :] + gongfa_sets[None, :, :]).reshape(-1, 4)
+        unique, counts = np.unique(totals, axis=0, return_counts=True)
+        levels.append(np.full(len(unique), level_index, dtype=np.int64))
+        rows.append(unique)
+        weights.append(counts)
+    return Roster(np.concatenate(levels), np.concatenate(rows), np.concatenate(weights))
+
+
+def resolve_batch(a_hp, a_attack, a_defense, a_speed, b_hp, b_attack, b_defense, b_speed):
+    """combat_engine.resolve 的向量化版本，参数为可广播的整数数组
+
+    返回 (a_won, rounds, a_hp_left, b_hp_left)。
+    """
+    _require_numpy()
+    a_damage = np.maximum(1, a_attack - b_defense)
+    b_damage = np.maximum(1, b_attack - a_defense)
+    a_first = a_speed >= b_speed
+    fighting = (a_hp > 0) & (b_hp > 0)
+
+    a_needed = -(-np.maximum(b_hp, 1) // a_damage)
+    b_needed = -(-np.maximum(a_hp, 1) // b_damage)
+    a_kills_first = np.where(a_first, a_needed <= b_needed, a_needed < b_needed)
+
+    rounds = np.where(fighting, np.minimum(a_needed, b_needed), 0)
+    a_hits = np.where(a_kills_first, a_needed, np.where(a_first, b_needed, b_needed - 1))
+    b_hits = np.where(a_kills_first, np.where(a_first, a_needed - 1, a_needed), b_needed)
+    a_hits = np.where(fighting, a_hits, 0)
+    b_hits = np.where(fighting, b_hits, 0)
+
+    a_left = a_hp - b_hits * b_damage
+    b_left = b_hp - a_hits * a_damage
+    return a_left > 0, rounds, a_left, b_left
+
+
+def _level_average(values, roster: Roster) -> List[float]:
+    """按境界求加权平均"""
+    totals = np.bincount(roster.level, weights=values * roster.weight, minlength=roster.level_count)
+    return (totals / np.maximum(roster.level_weight, 1)).tolist()
+
+
+def simulate_pve(roster: Roster, monsters: Dict[str, Dict], scaled: bool = True) -> Dict[str, Dict]:
+    """玩家 vs 怪物：scaled=True 时按挑战规则缩放（玩家属性乘以 MONSTER_STAT_SCALE，不低于基础值）"""
+    results = {}
+    for monster_id, monster in monsters.items():
+        m_hp = np.full(len(roster), int(monster["max_hp_base"]), dtype=np.int64)
+        m_attack = np.full(len(roster), int(monster["attack_base"]), dtype=np.int64)
+        m_defense = np.full(len(roster), int(monster["defense_base"]), dtype=np.int64)
+        m_speed = np.full(len(roster), int(monster.get("speed_base", 0)), dtype=np.int64)
+        if scaled:
+            m_hp = np.maximum(m_hp, (roster.hp * MONSTER_STAT_SCALE).astype(np.int64))
+            m_attack = np.maximum(m_attack, (roster.attack * MONSTER_STAT_SCALE).astype(np.int64))
+            m_defense = np.maximum(m_defense, (roster.defense * MONSTER_STAT_SCALE).astype(np.int64))
+            m_speed = np.maximum(m_speed, (roster.speed * MONSTER_STAT_SCALE).astype(np.int64))
+        won, rounds, _, _ = resolve_batch(
+            roster.hp, roster.attack, roster.defense, roster.speed,
+            m_hp, m_attack, m_defense, m_speed
+        )
+        results[monster_id] = {
+            "name": monster.get("name", monster_id),
+            "win_rate": _level_average(won.astype(np.float64), roster),
+            "expected_rounds": _level_average(rounds.astype(np.float64), roster)
+        }
+    return results
+
+
+def simulate_pvp(roster: Roster, max_cells: int = 4_000_000) -> Dict[str, List[List[float]]]:
+    """玩家 vs 玩家：返回 境界 x 境界 的胜率和期望回合数矩阵（行为挑战方）
+
+    按块结算，每块最多 max_cells 场对局，内存占用与玩家配置数量线性相关。
+    """
+    level_count = roster.level_count
+    wins = np.zeros((level_count, level_count))
+    rounds_total = np.zeros((level_count, level_count))
+    chunk_size = max(1, max_cells // max(1, len(roster)))
+    # 对手一侧的权重和境界下标
+    defender_weight = roster.weight[None, :]
+    defender_onehot = np.zeros((len(roster), level_count))
+    defender_onehot[np.arange(len(roster)), roster.level] = 1.0
+
+    for start in range(0, len(roster), chunk_size):
+        end = min(start + chunk_size, len(roster))
+        won, rounds, _, _ = resolve_batch(
+            roster.hp[start:end, None], roster.attack[start:end, None],
+            roster.defense[start:end, None], roster.speed[start:end, None],
+            roster.hp[None, :], roster.attack[None, :], roster.defense[None, :], roster.speed[None, :]
+        )
+        # 先按对手境界汇总，再乘以挑战方权重按挑战方境界汇总
+        attacker_weight = roster.weight[start:end, None]
+        won_by_level = ((won * defender_weight) @ defender_onehot) * attacker_weight
+        rounds_by_level = ((rounds * defender_weight) @ defender_onehot) * attacker_weight
+        np.add.at(wins, roster.level[start:end], won_by_level)
+        np.add.at(rounds_total, roster.level[start:end], rounds_by_level)
+
+    pairs = np.outer(roster.level_weight, roster.level_weight)
+    pairs[pairs == 0] = 1
+    return {"win_rate": (wins / pairs).tolist(), "expected_rounds": (rounds_total / pairs).tolist()}
+
+
+def breakthrough_table(level_config: List[Dict]) -> List[Dict]:
+    """各境界在灵气刚好达到门槛时的突破成功率和期望尝试次数（不计失败损失的灵气）"""
+    table = []
+    for next_index in range(1, len(level_config)):
+        threshold = level_config[next_index]["spirit"]
+        rate = breakthrough_success_rate(threshold, next_index)
+        table.append({
+            "to": level_config[next_index]["name"],
+            "spirit": threshold,
+            "success_rate": rate,
+            "expected_attempts": 1 / rate if rate > 0 else float("inf")
+        })
+    return table
+
+
+def self_check(samples: int = 20000, seed: int = 0) -> int:
+    """随机抽样对比 resolve_batch 与 combat_engine.resolve，返回不一致的数量"""
+    _require_numpy()
+    rng = random.Random(seed)
+    rows = [
+        [rng.randint(-5, 500), rng.randint(0, 80), rng.randint(0, 80), rng.randint(0, 10)]
+        for _ in range(samples * 2)
+    ]
+    a = np.asarray(rows[:samples], dtype=np.int64)
+    b = np.asarray(rows[samples:], dtype=np.int64)
+    won, rounds, a_left, b_left = resolve_batch(*a.T, *b.T)
+    mismatches = 0
+    for i in range(samples):
+        expected = resolve(
+            int(a[i, 0]), dict(zip(("attack", "defense", "speed"), map(int, a[i, 1:]))),
+            int(b[i, 0]), dict(zip(("attack", "defense", "speed"), map(int, b[i, 1:])))
+        )
+        if (expected.a_won, expected.rounds, expected.a_hp, expected.b_hp) != (
+            bool(won[i]), int(rounds[i]), int(a_left[i]), int(b_left[i])
+        ):
+            mismatches += 1
+    return mismatches
+
+
+def _print_report(level_names: List[str], pve: Dict, bosses: Dict, pvp: Dict, breakthrough: List[Dict]):
+    print("\n== 玩家 vs 怪物（胜率 / 期望回合） ==")
+    columns = list(pve.values()) + list(bosses.values())
+    print("境界".ljust(8) + "".join(f"{c['name']:>16}" for c in columns))
+    for index, name in enumerate(level_names):
+        cells = "".join(
+            f"{c['win_rate'][index]:>9.1%} /{c['expected_rounds'][index]:>5.1f}" for c in columns
+        )
+        print(name.ljust(8) + cells)
+
+    print("\n== 玩家 vs 玩家（对同境界 / 高一境界 / 高两境界 的胜率） ==")
+    win_rate = pvp["win_rate"]
+    for index, name in enumerate(level_names):
+        cells = []
+        for offset in (0, 1, 2):
+            target = index + offset
+            cells.append(f"{win_rate[index][target]:>8.1%}" if target < len(level_names) else f"{'-':>8}")
+        print(name.ljust(8) + "".join(cells))
+
+    print("\n== 突破成功率（灵气刚达门槛时） ==")
+    for row in breakthrough:
+        print(f"{row['to']:<8}{row['spirit']:>10}{row['success_rate']:>9.1%}{row['expected_attempts']:>8.1f}次")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="修仙转离线战斗平衡模拟器")
+    parser.add_argument(
+        "--config-dir", type=Path, default=Path(__file__).resolve().parent.parent / "config",
+        help="配置目录（默认为插件自带的 config 目录）"
+    )
+    parser.add_argument(
+        "--db", type=Path,
+        help="插件数据库文件，指定时使用其中的物品目录（含 equipments 表中的装备）"
+    )
+    parser.add_argument("--max-gongfas", type=int, default=5, help="同时修炼的功法数量上限")
+    parser.add_argument(
+        "--pvp-sample", type=int, default=500,
+        help="玩家对战时每个境界最多抽取的属性组合数量（超过时按权重抽样）"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="抽样使用的随机种子")
+    parser.add_argument("--json", type=Path, help="将完整结果（含胜率矩阵）写入JSON文件")
+    parser.add_argument("--check", type=int, default=0, help="与逐场结算对比的随机样本数量")
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print(_NUMPY_REQUIRED, file=sys.stderr)
+        return 1
+
+    if args.check:
+        mismatches = self_check(args.check)
+        print(f"一致性检查：{args.check} 场中 {mismatches} 场不一致")
+        if mismatches:
+            return 1
+
+    started = time.perf_counter()
+    config = load_config(args.config_dir)
+    catalog = asyncio.run(_load_catalog(args.db)) if args.db else None
+    roster = build_roster(config, args.max_gongfas, catalog)
+    pve = simulate_pve(roster, config["monsters"], scaled=True)
+    bosses = simulate_pve(roster, config["bosses"], scaled=False)
+    pvp_roster = roster.sample(args.pvp_sample, np.random.default_rng(args.seed))
+    pvp = simulate_pvp(pvp_roster)
+    breakthrough = breakthrough_table(config["level_config"])
+    elapsed = time.perf_counter() - started
+
+    level_names = [level["name"] for level in config["level_config"]]
+    loadouts = int(roster.weight.sum())
+    matchups = len(roster) * (len(config["monsters"]) + len(config["bosses"])) + len(pvp_roster) ** 2
+    _print_report(level_names, pve, bosses, pvp, breakthrough)
+    print(
+        f"\n共 {loadouts} 种配装（{len(roster)} 种不同属性），"
+        f"玩家对战使用 {len(pvp_roster)} 种，结算 {matchups} 场对局，用时 {elapsed:.2f} 秒"
+    )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "levels": level_names,
+                "loadouts": loadouts,
+                "distinct_stats": len(roster),
+                "pvp_sample": len(pvp_roster),
+                "pve": pve,
+                "bosses": bosses,
+                "pvp": pvp,
+                "breakthrough": breakthrough
+            }, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
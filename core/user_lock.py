@@ -0,0 +1,87 @@
+# user_lock.py
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from ..data.instrumentation import LatencyStats
+
+
+class UserLockTimeout(Exception):
+    """等待同一用户的上一条命令超时"""
+
+
+class _Entry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0      # 持有和等待该锁的协程数
+
+
+class UserLocks:
+    """按 user_id 串行执行命令，不同用户之间完全并发
+
+    每个用户一把 asyncio.Lock，只在有命令持有或等待时存在：
+    最后一个使用者释放后立即移除，内存占用与同时活跃的用户数成正比。
+    """
+
+    def __init__(self, timeout: Optional[float] = 30.0, sample_size: int = 1024):
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self._entries: Dict[str, _Entry] = {}
+        self.wait_stats = LatencyStats(sample_size)
+        self.contended = 0
+        self.timeouts = 0
+        self.max_active = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None) -> "UserLocks":
+        """根据插件配置中的 USER_LOCK 配置段创建"""
+        lock_config = (config or {}).get("USER_LOCK", {})
+        return cls(timeout=lock_config.get("TIMEOUT", 30.0))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @asynccontextmanager
+    async def hold(self, user_id: str, wait: bool = False):
+        """持有该用户的锁；等待超过 timeout 秒时抛出 UserLockTimeout
+
+        wait=True 时不限等待时间（供后台任务使用，如世界Boss结算）。
+        """
+        entry = self._entries.get(user_id)
+        if entry is None:
+            entry = self._entries[user_id] = _Entry()
+            self.max_active = max(self.max_active, len(self._entries))
+        entry.users += 1
+        start = time.perf_counter()
+        try:
+            if entry.users > 1:
+                # 同一用户已有命令在执行或排队
+                self.contended += 1
+            try:
+                await asyncio.wait_for(entry.lock.acquire(), timeout=None if wait else self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.wait_stats.record((time.perf_counter() - start) * 1000, error=True)
+                raise UserLockTimeout(user_id)
+            self.wait_stats.record((time.perf_counter() - start) * 1000)
+            try:
+                yield
+            finally:
+                entry.lock.release()
+        finally:
+            entry.users -= 1
+            if entry.users == 0 and self._entries.get(user_id) is entry:
+                del self._entries[user_id]
+
+    def stats(self) -> Dict:
+        stats = self.wait_stats.snapshot()
+        stats.update({
+            "active_users": len(self._entries),
+            "max_active_users": self.max_active,
+            "contended": self.contended,
+            "timeouts": self.timeouts
+        })
+        return stats
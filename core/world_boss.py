@@ -0,0 +1,321 @@
+# world_boss.py
+
+import asyncio
+import datetime
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Dict, List, Optional, Set, Tuple
+
+from astrbot.api import logger
+from ..models import Player
+from ..data.data_manager import DataBase
+from .config_manager import ConfigManager
+from .config_models import BossConfig, DropConfig
+from .combat_engine import CombatResult, resolve
+from .user_lock import UserLocks
+
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _now() -> str:
+    return datetime.datetime.now().strftime(_TIME_FORMAT)
+
+
+@dataclass
+class BossInstance:
+    """当前世界Boss的运行时状态（血量全服共享）"""
+    instance_id: str
+    boss_id: str
+    name: str
+    max_hp: int
+    hp: int
+    attack: int
+    defense: int
+    speed: int
+    spirit_stone: int
+    drop_items: Tuple[DropConfig, ...] = ()
+    spawn_time: str = ""
+
+    @property
+    def alive(self) -> bool:
+        return self.hp > 0
+
+    def combat_stats(self) -> Dict:
+        return {"attack": self.attack, "defense": self.defense, "speed": self.speed}
+
+
+@dataclass
+class AttackResult:
+    """一次攻击的结果"""
+    outcome: CombatResult
+    damage: int         # 本次对Boss造成的伤害
+    boss_hp: int        # 攻击后Boss剩余血量
+    killed: bool        # 是否由本次攻击击败Boss
+
+
+@dataclass
+class Settlement:
+    """Boss被击败后的结算结果"""
+    boss_name: str
+    ranking: List[Tuple[str, int]]              # (user_id, 伤害)，按伤害从高到低
+    spirit_stones: Dict[str, int]               # user_id: 灵石奖励
+    drops: List[Tuple[str, str]]                # (user_id, 物品ID)
+
+
+class WorldBossManager:
+    """世界Boss：全服玩家共同攻击同一个Boss
+
+    攻击只修改内存中的血量和伤害统计（不含await，在事件循环内天然原子），
+    伤害增量由后台任务按 FLUSH_INTERVAL 批量写入数据库，攻击本身不提交事务。
+    Boss被击败时先写回剩余增量，再按伤害排名确定灵石和掉落，与击败时间一起保存
+    （状态为 settling），然后逐个玩家发放：每名玩家只持有自己的用户锁、各用一个事务，
+    避免进行中的命令用旧的玩家数据覆盖奖励，也不会因某一名玩家的命令拖住其他人。
+    全部发放后状态改为 defeated；中途失败或重启时，start() 会继续发放未完成的部分。
+    """
+
+    def __init__(
+        self,
+        db: DataBase,
+        config_manager: ConfigManager,
+        config: Optional[Dict] = None,
+        user_locks: Optional[UserLocks] = None
+    ):
+        self.db = db
+        self.config_manager = config_manager
+        # 与命令处理共用的用户锁（结算时按玩家加锁）
+        self.user_locks = user_locks if user_locks is not None else UserLocks()
+
+        boss_config = (config or {}).get("WORLD_BOSS", {})
+        self.hp_multiplier = max(1, int(boss_config.get("HP_MULTIPLIER", 200)))
+        self.rounds_per_attack = max(1, int(boss_config.get("ROUNDS_PER_ATTACK", 5)))
+        self.attack_cooldown = max(0.0, float(boss_config.get("ATTACK_COOLDOWN", 60.0)))
+        self.flush_interval = max(0.1, float(boss_config.get("FLUSH_INTERVAL", 5.0)))
+        self.respawn_interval = max(0.0, float(boss_config.get("RESPAWN_INTERVAL", 3600.0)))
+        self.reward_multiplier = max(0, int(boss_config.get("REWARD_MULTIPLIER", 10)))
+
+        self.boss: Optional[BossInstance] = None
+        self.damage: Dict[str, int] = {}                 # user_id: 累计伤害
+        self._pending: Dict[str, Tuple[int, int]] = {}   # user_id: (未写入的伤害, 次数)
+        self._last_attack: Dict[str, float] = {}
+        self._defeated_at: Optional[float] = None          # 上次击败Boss的时间（monotonic）
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._settle_tasks: Set[asyncio.Task] = set()
+        self.last_settlement: Optional[Settlement] = None
+
+    async def start(self):
+        """恢复上次击败Boss的时间和未击败的Boss，继续未完成的结算，并启动定时写回任务"""
+        defeat_time = await self.db.get_last_world_boss_defeat_time()
+        if defeat_time:
+            self._restore_defeated_at(defeat_time)
+        for row in await self.db.get_unsettled_world_bosses():
+            if row["defeat_time"] is None:
+                # 击败后还没来得及记录时间，从现在开始计算刷新间隔
+                self._defeated_at = time.monotonic()
+            template = self.config_manager.boss_configs.get(row["boss_id"])
+            boss = self._make_instance(row["boss_id"], template, row["instance_id"], row["max_hp"], row["spawn_time"])
+            boss.hp = 0
+            damage = {user_id: damage for user_id, (damage, _) in
+                      (await self.db.get_world_boss_damage(row["instance_id"])).items()}
+            self._spawn_settlement(self._settle(boss, damage, {}, row["defeat_time"] or _now()))
+
+        row = await self.db.get_active_world_boss()
+        if row and row["hp"] > 0:
+            template = self.config_manager.boss_configs.get(row["boss_id"])
+            self.boss = self._make_instance(row["boss_id"], template, row["instance_id"], row["max_hp"], row["spawn_time"])
+            self.boss.hp = row["hp"]
+            self.damage = {user_id: damage for user_id, (damage, _) in
+                           (await self.db.get_world_boss_damage(row["instance_id"])).items()}
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._settle_tasks:
+            await asyncio.gather(*self._settle_tasks)
+        await self.flush()
+
+    def _restore_defeated_at(self, defeat_time: str):
+        """按数据库中的击败时间换算 monotonic 时间，刷新间隔在重启后继续计算"""
+        try:
+            defeated = datetime.datetime.strptime(defeat_time, _TIME_FORMAT)
+        except ValueError:
+            return
+        elapsed = (datetime.datetime.now() - defeated).total_seconds()
+        self._defeated_at = time.monotonic() - max(0.0, elapsed)
+
+    def _spawn_settlement(self, settlement: Awaitable[None]):
+        task = asyncio.create_task(settlement)
+        self._settle_tasks.add(task)
+        task.add_done_callback(self._settle_tasks.discard)
+
+    def _make_instance(
+        self, boss_id: str, template: Optional[BossConfig], instance_id: str, max_hp: int, spawn_time: str
+    ) -> BossInstance:
+        if template is None:
+            # 配置中已删除的Boss（重启后恢复），只保留名称和血量
+            return BossInstance(instance_id, boss_id, boss_id, max_hp, max_hp, 0, 0, 0, 0, spawn_time=spawn_time)
+        return BossInstance(
+            instance_id=instance_id,
+            boss_id=boss_id,
+            name=template.name,
+            max_hp=max_hp,
+            hp=max_hp,
+            attack=template.attack_base,
+            defense=template.defense_base,
+            speed=template.speed_base,
+            spirit_stone=template.spirit_stone,
+            drop_items=template.drop_items,
+            spawn_time=spawn_time
+        )
+
+    async def ensure_boss(self) -> Optional[BossInstance]:
+        """返回存活的Boss；没有时若已过刷新间隔则随机刷新一个"""
+        if self.boss and self.boss.alive:
+            return self.boss
+        bosses = self.config_manager.boss_configs
+        if not bosses:
+            return None
+        if self._defeated_at is not None and time.monotonic() - self._defeated_at < self.respawn_interval:
+            return None
+
+        boss_id = random.choice(list(bosses.keys()))
+        template = bosses[boss_id]
+        boss = self._make_instance(
+            boss_id, template, uuid.uuid4().hex,
+            template.max_hp_base * self.hp_multiplier,
+            _now()
+        )
+        self.boss, self.damage, self._pending = boss, {}, {}
+        if not await self.db.create_world_boss(boss.instance_id, boss.boss_id, boss.max_hp, boss.spawn_time):
+            logger.error(f"世界Boss {boss.name} 写入数据库失败，本次仅保存在内存中")
+        return boss
+
+    def cooldown_remaining(self, user_id: str) -> float:
+        last = self._last_attack.get(user_id)
+        if last is None:
+            return 0.0
+        return max(0.0, self.attack_cooldown - (time.monotonic() - last))
+
+    def attack(self, player: Player, player_stats: Dict) -> Optional[AttackResult]:
+        """结算一次攻击（同步执行，不会与其他攻击交错）
+
+        每次攻击最多进行 ROUNDS_PER_ATTACK 回合：把Boss剩余血量和本次可造成的最大伤害
+        中较小者当作对手血量交给 combat_engine 结算，玩家先倒下则只计已造成的伤害。
+        """
+        boss = self.boss
+        if boss is None or not boss.alive:
+            return None
+        per_hit = max(1, player_stats["attack"] - boss.defense)
+        budget = min(boss.hp, per_hit * self.rounds_per_attack)
+        outcome = resolve(player.current_hp, player_stats, budget, boss.combat_stats())
+        damage = min(budget, outcome.a_damage_dealt)
+
+        boss.hp -= damage
+        user_id = player.user_id
+        self.damage[user_id] = self.damage.get(user_id, 0) + damage
+        pending_damage, pending_hits = self._pending.get(user_id, (0, 0))
+        self._pending[user_id] = (pending_damage + damage, pending_hits + 1)
+        self._last_attack[user_id] = time.monotonic()
+
+        killed = not boss.alive
+        if killed:
+            # 剩余增量随结算一起写入，之后刷新的新Boss从空的统计开始
+            pending, self._pending = self._pending, {}
+            self._defeated_at = time.monotonic()
+            self._spawn_settlement(self._settle(boss, dict(self.damage), pending, _now()))
+        return AttackResult(outcome=outcome, damage=damage, boss_hp=max(0, boss.hp), killed=killed)
+
+    def ranking(self, limit: int = 10) -> List[Tuple[str, int]]:
+        return sorted(self.damage.items(), key=lambda entry: entry[1], reverse=True)[:limit]
+
+    async def flush(self) -> int:
+        """把内存中的伤害增量和Boss血量写入数据库，返回写入的玩家数
+
+        同一时间只有一次写回；正在进行的写回结束后才开始下一次。
+        """
+        async with self._flush_lock:
+            boss = self.boss
+            if boss is None or not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            if await self.db.save_world_boss_progress(boss.instance_id, max(0, boss.hp), pending):
+                return len(pending)
+            if self.boss is not boss:
+                logger.error(f"世界Boss {boss.name} 的伤害统计写入失败，{len(pending)} 条记录未保存")
+                return 0
+            # 写入失败时把增量并回去，下次重试
+            for user_id, (damage, hits) in pending.items():
+                current_damage, current_hits = self._pending.get(user_id, (0, 0))
+                self._pending[user_id] = (current_damage + damage, current_hits + hits)
+            return 0
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # 停止时的取消只打断等待：已取出的增量不能随回滚丢失（也不能重试，增量写入不幂等），
+            # 进行中的写回照常完成，stop() 中最后一次 flush() 会等它结束
+            await asyncio.shield(self.flush())
+
+    async def _settle(
+        self, boss: BossInstance, damage: Dict[str, int], pending: Dict[str, Tuple[int, int]], defeat_time: str
+    ):
+        """Boss被击败：写回剩余伤害，保存按伤害确定的奖励后逐个玩家发放
+
+        重启后对结算中的Boss再次调用时，已保存的奖励保持不变，只发放尚未发放的部分。
+        """
+        try:
+            if pending:
+                await self.db.save_world_boss_progress(boss.instance_id, 0, pending)
+            if not await self.db.begin_world_boss_settlement(
+                boss.instance_id, defeat_time, self._plan_rewards(boss, damage)
+            ):
+                # 数据库中仍是血量为0的未击败状态，重启后重新结算
+                logger.error(f"世界Boss {boss.name} 的奖励保存失败，将在重启后重新结算")
+                return
+
+            rewards = await self.db.get_world_boss_rewards(boss.instance_id)
+            unpaid = [user_id for user_id, (_, _, paid) in rewards.items() if not paid]
+            results = await asyncio.gather(
+                *(self._pay_reward(boss.instance_id, user_id) for user_id in unpaid), return_exceptions=True
+            )
+            failed = [(user_id, result) for user_id, result in zip(unpaid, results) if isinstance(result, BaseException)]
+            for user_id, error in failed:
+                logger.error(f"世界Boss {boss.name} 向玩家 {user_id} 发放奖励失败: {error}")
+            if failed:
+                # 保持结算中状态，重启后继续发放
+                return
+            await self.db.finish_world_boss(boss.instance_id, defeat_time)
+
+            ranking = sorted(damage.items(), key=lambda entry: entry[1], reverse=True)
+            spirit_stones = {user_id: spirit_stone for user_id, (spirit_stone, _, _) in rewards.items()}
+            drops = [(user_id, item_id) for user_id, (_, items, _) in rewards.items() for item_id in items]
+            self.last_settlement = Settlement(boss.name, ranking, spirit_stones, drops)
+            logger.info(f"世界Boss {boss.name} 已被击败，{len(spirit_stones)} 名玩家获得奖励")
+        except Exception as e:
+            logger.error(f"世界Boss {boss.name} 结算失败: {e}", exc_info=True)
+
+    def _plan_rewards(self, boss: BossInstance, damage: Dict[str, int]) -> Dict[str, Tuple[int, List[str]]]:
+        """按伤害占比分配灵石，掉落按伤害加权抽取获得者，返回 user_id: (灵石, 掉落物品ID列表)"""
+        participants = [user_id for user_id, value in damage.items() if value > 0]
+        total = sum(damage[user_id] for user_id in participants) or 1
+        pool = boss.spirit_stone * self.reward_multiplier
+        rewards = {user_id: (max(1, pool * damage[user_id] // total), []) for user_id in participants}
+
+        weights = [damage[user_id] for user_id in participants]
+        for drop_item in boss.drop_items:
+            if participants and random.random() < drop_item.probability:
+                rewards[random.choices(participants, weights=weights)[0]][1].append(drop_item.item_id)
+        return rewards
+
+    async def _pay_reward(self, instance_id: str, user_id: str):
+        # 等待该玩家正在执行的命令结束（只锁这一名玩家），再在单独的事务中发放
+        async with self.user_locks.hold(user_id, wait=True):
+            await self.db.pay_world_boss_reward(instance_id, user_id)
@@ -0,0 +1,187 @@
+import json
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import aiosqlite
+
+from .rows import fetch_all
+
+
+def _freeze(record: Dict) -> Mapping:
+    return MappingProxyType(record)
+
+
+def _load_json(value, default):
+    if not value:
+        return default
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class ItemCatalog:
+    """物品目录：将装备、物品、丹药和功法合并为只读的内存索引
+
+    目录对象构建后不再修改，更新时整体重建并替换引用，
+    读取方要么看到旧目录，要么看到新目录。
+    """
+
+    def __init__(
+        self,
+        items: Optional[Dict[str, Dict]] = None,
+        gongfas: Optional[Dict[str, Dict]] = None,
+        danyao: Optional[Dict[str, Dict]] = None,
+        version: int = 0
+    ):
+        self.version = version
+        self._items = MappingProxyType({k: _freeze(v) for k, v in (items or {}).items()})
+        self._gongfas = MappingProxyType({k: _freeze(v) for k, v in (gongfas or {}).items()})
+        self._danyao = MappingProxyType({k: _freeze(v) for k, v in (danyao or {}).items()})
+
+        # 合并后的 id -> 记录 映射（物品/装备优先于同ID的功法）
+        records = dict(self._gongfas)
+        records.update(self._items)
+        self.records: Mapping[str, Mapping] = MappingProxyType(records)
+
+        # 二级索引
+        by_name: Dict[str, List[Mapping]] = {}
+        by_type: Dict[str, List[Mapping]] = {}
+        by_slot: Dict[str, List[Mapping]] = {}
+        for record in self.records.values():
+            by_name.setdefault(record.get("name", ""), []).append(record)
+            by_type.setdefault(record.get("type", ""), []).append(record)
+            if record.get("slot"):
+                by_slot.setdefault(record["slot"], []).append(record)
+        self._by_name = MappingProxyType({k: tuple(v) for k, v in by_name.items()})
+        self._by_type = MappingProxyType({k: tuple(v) for k, v in by_type.items()})
+        self._by_slot = MappingProxyType({k: tuple(v) for k, v in by_slot.items()})
+        self._danyao_by_name = MappingProxyType({v["name"]: v for v in self._danyao.values()})
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get_item(self, item_id: str) -> Optional[Mapping]:
+        """获取物品或装备（不包含功法）"""
+        return self._items.get(item_id)
+
+    def get_gongfa(self, gongfa_id: str) -> Optional[Mapping]:
+        return self._gongfas.get(gongfa_id)
+
+    def get_danyao(self, danyao_id: str) -> Optional[Mapping]:
+        return self._danyao.get(danyao_id)
+
+    def get_danyao_by_name(self, name: str) -> Optional[Mapping]:
+        return self._danyao_by_name.get(name)
+
+    def by_name(self, name: str) -> Tuple[Mapping, ...]:
+        return self._by_name.get(name, ())
+
+    def by_type(self, item_type: str) -> Tuple[Mapping, ...]:
+        return self._by_type.get(item_type, ())
+
+    def by_slot(self, slot: str) -> Tuple[Mapping, ...]:
+        return self._by_slot.get(slot, ())
+
+    def all_gongfas(self) -> Tuple[Mapping, ...]:
+        return tuple(self._gongfas.values())
+
+    def all_danyao(self) -> Tuple[Mapping, ...]:
+        return tuple(self._danyao.values())
+
+    @classmethod
+    async def load(cls, conn: aiosqlite.Connection, version: int = 0) -> "ItemCatalog":
+        """从数据库的 equipments / items / danyao / gongfas 表构建目录"""
+        return cls.from_rows(
+            danyao_rows=await _fetch_dicts(conn, "SELECT id, name, effect FROM danyao"),
+            item_rows=await _fetch_dicts(conn, "SELECT * FROM items"),
+            equipment_rows=await _fetch_dicts(conn, "SELECT * FROM equipments"),
+            gongfa_rows=await _fetch_dicts(conn, "SELECT * FROM gongfas"),
+            version=version
+        )
+
+    @classmethod
+    def from_rows(
+        cls,
+        danyao_rows: Sequence[Dict] = (),
+        item_rows: Sequence[Dict] = (),
+        equipment_rows: Sequence[Dict] = (),
+        gongfa_rows: Sequence[Dict] = (),
+        version: int = 0
+    ) -> "ItemCatalog":
+        """由各表的行（列名 -> 值）构建目录，items 表缺少的列按建表时的默认值处理"""
+        danyao = {}
+        for row in danyao_rows:
+            danyao[row["id"]] = {
+                "id": row["id"],
+                "name": row["name"],
+                "effect": _load_json(row["effect"], {})
+            }
+
+        items = {}
+        for row in item_rows:
+            item_data = {
+                "item_id": row["item_id"],
+                "name": row["name"],
+                "description": row["description"],
+                "type": row.get("item_type", row.get("type")),
+                "category": row.get("category", ""),
+                "quality": row.get("quality", "common"),
+                "effect": row.get("effect", ""),
+                "price": row.get("price", 0),
+                "max_stack": row.get("max_stack", 99),
+                "usage_requirements": _load_json(row.get("usage_requirements"), []),
+                "upgrade_level": row.get("upgrade_level", 0),
+                "base_attack": row.get("base_attack", 0),
+                "base_defense": row.get("base_defense", 0),
+                "base_speed": row.get("base_speed", 0),
+                "base_hp": row.get("base_hp", 0),
+                "base_spirit": row.get("base_spirit", 0)
+            }
+            # 丹药效果以danyao表为准
+            if item_data["type"] == "consumable" and item_data["item_id"] in danyao:
+                item_data["effect"] = json.dumps(danyao[item_data["item_id"]]["effect"])
+            items[item_data["item_id"]] = item_data
+
+        # 装备表优先于items表
+        for row in equipment_rows:
+            items[row["id"]] = {
+                "item_id": row["id"],
+                "name": row["name"],
+                "description": row["description"],
+                "slot": row["slot"],
+                "base_attack": row["base_attack"],
+                "base_defense": row["base_defense"],
+                "base_speed": row["base_speed"],
+                "base_hp": row["base_hp"],
+                "base_spirit": row["base_spirit"],
+                "upgrade_level": row["upgrade_level"],
+                "quality": row["quality"],
+                "price": row["price"],
+                "required_realm": row["required_realm"],
+                "type": "equipment"
+            }
+
+        gongfas = {}
+        for row in gongfa_rows:
+            gongfas[row["id"]] = {
+                "id": row["id"],
+                "name": row["name"],
+                "upgrade_exp": row["upgrade_exp"],
+                "attack_bonus": row["attack_bonus"],
+                "hp_bonus": row["hp_bonus"],
+                "defense_bonus": row["defense_bonus"],
+                "speed_bonus": row["speed_bonus"],
+                "cultivation_speed_bonus": row["cultivation_speed_bonus"],
+                "type": "gongfa"
+            }
+
+        return cls(items=items, gongfas=gongfas, danyao=danyao, version=version)
+
+
+async def _fetch_dicts(conn: aiosqlite.Connection, sql: str) -> List[Dict]:
+    """执行查询并按列名返回字典列表，表不存在时返回空列表"""
+    try:
+        return await fetch_all(conn, sql)
+    except aiosqlite.OperationalError:
+        return []
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from ..models import CombatLog
+
+# 通知后台任务写完当前批次后退出
+_STOP = object()
+
+
+class CombatLogWriter:
+    """战斗日志后台批量写入器
+
+    战斗日志先进入有界队列，由后台任务按数量或时间阈值
+    使用 executemany 批量写入。队列满时提交方最多等待 put_timeout 秒
+    （背压），仍无法入队则丢弃并计数。关闭时会写完队列中剩余的日志。
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[CombatLog]], Awaitable[None]],
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        put_timeout: float = 1.0
+    ):
+        self._write_batch = write_batch
+        self.max_queue = max(1, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.put_timeout = max(0.0, float(put_timeout))
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计指标
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @classmethod
+    def from_config(cls, write_batch: Callable[[List[CombatLog]], Awaitable[None]], log_config: Optional[Dict] = None) -> "CombatLogWriter":
+        """根据插件配置中的 COMBAT_LOG 配置段创建写入器"""
+        log_config = log_config or {}
+        return cls(
+            write_batch,
+            max_queue=log_config.get("QUEUE_SIZE", 10000),
+            batch_size=log_config.get("BATCH_SIZE", 200),
+            flush_interval=log_config.get("FLUSH_INTERVAL", 1.0),
+            put_timeout=log_config.get("PUT_TIMEOUT", 1.0)
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, log: CombatLog) -> bool:
+        """提交一条战斗日志，队列已满且等待超时时丢弃并返回False"""
+        try:
+            self._queue.put_nowait(log)
+            return True
+        except asyncio.QueueFull:
+            pass
+        try:
+            await asyncio.wait_for(self._queue.put(log), timeout=self.put_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            return False
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            # 攒满一批或到达时间阈值后写入
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                # 停止标记本身也算一项，否则 join() 永远等不到计数归零
+                self._queue.task_done()
+                return
+
+    async def _flush(self, batch: List[CombatLog]):
+        start = time.perf_counter()
+        try:
+            await self._write_batch(batch)
+            self.written += len(batch)
+        except Exception as e:
+            print(f"批量写入战斗日志失败: {e}")
+            if len(batch) == 1:
+                self.dropped += 1
+            else:
+                # 逐条重试，避免一条坏数据拖累整批日志
+                for log in batch:
+                    try:
+                        await self._write_batch([log])
+                        self.written += 1
+                    except Exception:
+                        self.dropped += 1
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.batches += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    async def flush(self):
+        """等待已提交的日志全部写入（最多多等一个 flush_interval）"""
+        if self.running:
+            await self._queue.join()
+
+    async def close(self):
+        """停止后台任务并写完队列中剩余的日志"""
+        if self.running:
+            await self._queue.put(_STOP)
+            await self._task
+        self._task = None
+        while not self._queue.empty():
+            batch = []
+            taken = 0
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                taken += 1
+                if item is not _STOP:
+                    batch.append(item)
+            if batch:
+                await self._flush(batch)
+            for _ in range(taken):
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self.max_queue,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 3) if self.batches else 0.0
+        }
@@ -0,0 +1,109 @@
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiosqlite
+
+from .instrumentation import Instrumentation, TracedConnection
+
+
+class ConnectionPool:
+    """SQLite连接池：一个写连接 + N个只读连接，使用WAL模式
+
+    WAL模式下读连接不会被写事务阻塞，后台管理的全表扫描
+    可以与游戏内的写操作并行执行。
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        read_pool_size: int = 2,
+        synchronous: str = "NORMAL",
+        cache_size: int = -8000,
+        mmap_size: int = 0,
+        busy_timeout: int = 5000,
+        instrumentation: Optional[Instrumentation] = None
+    ):
+        self.db_path = Path(db_path)
+        self.read_pool_size = max(0, int(read_pool_size))
+        self.synchronous = str(synchronous).upper()
+        self.cache_size = int(cache_size)
+        self.mmap_size = int(mmap_size)
+        self.busy_timeout = int(busy_timeout)
+        self.instrumentation = instrumentation
+
+        self.writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle: Optional[asyncio.Queue] = None
+
+    @classmethod
+    def from_config(
+        cls,
+        db_path: Path,
+        db_config: Optional[Dict] = None,
+        instrumentation: Optional[Instrumentation] = None
+    ) -> "ConnectionPool":
+        """根据插件配置中的 DATABASE 配置段创建连接池"""
+        db_config = db_config or {}
+        return cls(
+            db_path,
+            read_pool_size=db_config.get("READ_POOL_SIZE", 2),
+            synchronous=db_config.get("SYNCHRONOUS", "NORMAL"),
+            cache_size=db_config.get("CACHE_SIZE", -8000),
+            mmap_size=db_config.get("MMAP_SIZE", 0),
+            busy_timeout=db_config.get("BUSY_TIMEOUT", 5000),
+            instrumentation=instrumentation
+        )
+
+    async def open(self) -> aiosqlite.Connection:
+        """打开写连接和只读连接，返回写连接"""
+        writer = await aiosqlite.connect(self.db_path)
+        await writer.execute("PRAGMA journal_mode = WAL")
+        await writer.execute(f"PRAGMA synchronous = {self.synchronous}")
+        await self._apply_common_pragmas(writer)
+        self.writer = self._traced(writer)
+
+        self._idle = asyncio.Queue()
+        read_uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+        for _ in range(self.read_pool_size):
+            reader = await aiosqlite.connect(read_uri, uri=True)
+            await self._apply_common_pragmas(reader)
+            await reader.execute("PRAGMA query_only = ON")
+            reader = self._traced(reader)
+            self._readers.append(reader)
+            self._idle.put_nowait(reader)
+        return self.writer
+
+    def _traced(self, conn: aiosqlite.Connection):
+        """配置了统计时为连接套上统计代理"""
+        if self.instrumentation is None:
+            return conn
+        return TracedConnection(conn, self.instrumentation)
+
+    async def _apply_common_pragmas(self, conn: aiosqlite.Connection):
+        await conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+        await conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        await conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """借出一个只读连接；未配置只读连接时退回写连接"""
+        if not self._readers:
+            yield self.writer
+            return
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        """关闭所有连接"""
+        for reader in self._readers:
+            await reader.close()
+        self._readers = []
+        self._idle = None
+        if self.writer:
+            await self.writer.close()
+            self.writer = None
@@ -1,291 +1,748 @@
 import aiosqlite
+import asyncio
 import datetime
+import json
+import random
+import time
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import replace
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
 
-from ..models import Player, Item, InventoryItem, CombatLog
+from ..models import Player, PlayerProfile, Item, InventoryItem, CombatLog
+from ..core.combat_engine import combat_power
 from .migration import MigrationManager
+from .player_cache import PlayerCache
+from .matchmaking import LevelIndex
+from .stats_cache import CombatStatsCache, stats_fingerprint
+from .catalog import ItemCatalog
+from .connection_pool import ConnectionPool
+from .combat_log_writer import CombatLogWriter
+from .item_sync import SyncReport, sync_items
+from .instrumentation import Instrumentation, instrument_methods
+from .rows import PLAYER_CODEC, ITEM_CODEC, INVENTORY_CODEC, COMBAT_LOG_CODEC, fetch_all, fetch_one
 
 
+class Transaction:
+    """工作单元：记录事务内写入的玩家和提交后需要执行的回调"""
+    
+    def __init__(self, db: "DataBase"):
+        self.db = db
+        self.players: Dict[str, Player] = {}
+        self.after_commit: List[Callable[[], Awaitable]] = []
+
+
+# 当前协程所在的事务（按任务上下文隔离）
+_current_transaction: ContextVar[Optional[Transaction]] = ContextVar("xiuxianzhuan_transaction", default=None)
+
+# 数据库初始化之前使用的空物品目录
+_EMPTY_CATALOG = ItemCatalog()
+
+
+@instrument_methods
 class DataBase:
-    def __init__(self, plugin_dir: str):
+    def __init__(
+        self,
+        plugin_dir: str,
+        cache_config: Optional[Dict] = None,
+        db_config: Optional[Dict] = None,
+        log_config: Optional[Dict] = None
+    ):
         self.plugin_dir = Path(plugin_dir)
         self.db_path = self.plugin_dir / "xiuxianzhuan_data.db"
         self.conn: Optional[aiosqlite.Connection] = None
+        
+        # 查询统计（按方法和SQL语句）与慢查询日志
+        self.instrumentation = Instrumentation.from_config(db_config)
+        
+        # 连接池：self.conn 为写连接，读操作走只读连接
+        self.pool = ConnectionPool.from_config(self.db_path, db_config, self.instrumentation)
+        
+        # 玩家写回缓存
+        cache_config = cache_config or {}
+        self.player_cache = PlayerCache(
+            max_size=cache_config.get("PLAYER_CACHE_SIZE", 10000),
+            flush_interval=cache_config.get("PLAYER_FLUSH_INTERVAL", 5.0),
+            flush_size=cache_config.get("PLAYER_FLUSH_SIZE", 100)
+        )
+        # 有效战斗属性缓存（按属性指纹失效）
+        self.combat_stats = CombatStatsCache(max_size=cache_config.get("COMBAT_STATS_CACHE_SIZE", 10000))
+        self._write_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        # 配置管理器（init 时传入，同步物品配置时查询境界表；物品目录随其快照一起发布）
+        self.config_manager = None
+        # 最近一次物品配置同步的统计
+        self.last_item_sync: Optional[SyncReport] = None
+        
+        # 竞技场匹配索引（按境界分桶）
+        self.matchmaking = LevelIndex()
+        
+        # 战斗日志后台批量写入
+        self.combat_log_writer = CombatLogWriter.from_config(self._write_combat_logs, log_config)
     
-    async def init(self):
-        """初始化数据库连接和表结构"""
+    async def init(self, config_manager=None):
+        """初始化数据库连接和表结构
+        
+        config_manager 传入插件共用的配置管理器（迁移时读取物品、宗门配置），
+        未传入时才单独创建一个。
+        """
         # 确保数据目录存在
         self.db_path.parent.mkdir(exist_ok=True)
         
-        # 连接数据库
-        self.conn = await aiosqlite.connect(self.db_path)
+        # 连接数据库（WAL模式，一个写连接 + 若干只读连接）
+        self.conn = await self.pool.open()
         
         # 执行数据库迁移
-        from ..core.config_manager import ConfigManager
-        config_manager = ConfigManager(self.plugin_dir.parent)
+        if config_manager is None:
+            from ..core.config_manager import ConfigManager
+            config_manager = ConfigManager(self.plugin_dir.parent)
+        self.config_manager = config_manager
         migration_manager = MigrationManager(self.conn, config_manager)
         await migration_manager.migrate()
         
         await self.conn.execute("PRAGMA foreign_keys = ON")
+        
+        # 同步物品配置（只写入与上次同步相比有变化的物品）
+        await self.sync_items_to_database(config_manager.items)
+        
+        # 加载物品目录
+        await self.reload_catalog()
+        await self.rebuild_matchmaking()
+        await self._backfill_combat_power()
+        
+        # 启动玩家缓存的定时写回任务和战斗日志写入任务
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        self.combat_log_writer.start()
     
     async def close(self):
         """关闭数据库连接"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
         if self.conn:
-            await self.conn.close()
+            await self.combat_log_writer.close()
+            await self.flush_players()
+            await self.pool.close()
             self.conn = None
     
-    # 注意：表创建逻辑已移至migration.py中的_create_all_tables_v1函数
-    # 现在由MigrationManager负责处理表结构的创建和更新
+    def _current_transaction(self) -> Optional[Transaction]:
+        tx = _current_transaction.get()
+        return tx if tx is not None and tx.db is self else None
     
-    def _calculate_upgrade_exp_by_realm(self, realm_name: str) -> int:
-        """根据境界名称计算升级经验"""
-        # 境界名称与经验值的映射
-        realm_exp_map = {
-            "练气一层": 0,
-            "练气二层": 50,
-            "练气三层": 100,
-            "练气四层": 200,
-            "练气五层": 350,
-            "练气六层": 500,
-            "练气七层": 700,
-            "练气八层": 1000,
-            "练气九层": 1400,
-            "练气十层": 2000,
-            "筑基初期": 3000,
-            "筑基中期": 4500,
-            "筑基后期": 6500,
-            "金丹初期": 9000,
-            "金丹中期": 12000,
-            "金丹后期": 16000,
-            "元婴初期": 21000,
-            "元婴中期": 27000,
-            "元婴后期": 35000,
-            "化神初期": 45000,
-            "化神中期": 57000,
-            "化神后期": 72000,
-            "炼虚初期": 90000,
-            "炼虚中期": 110000,
-            "炼虚后期": 135000,
-            "合体初期": 165000,
-            "合体中期": 200000,
-            "合体后期": 240000,
-            "大乘初期": 285000,
-            "大乘中期": 335000,
-            "大乘后期": 400000
-        }
+    def _reader(self):
+        """获取只读连接的上下文管理器（事务内读写连接以看到未提交的修改）"""
+        if self._current_transaction():
+            return nullcontext(self.conn)
+        return self.pool.reader()
+    
+    @asynccontextmanager
+    async def transaction(self):
+        """工作单元：块内所有写操作共用一个事务，退出时只提交一次
+        
+        用法：
+            async with db.transaction():
+                await db.update_player(player)
+                await db.add_item_to_inventory(user_id, item_id)
+        块内抛出异常时整体回滚。嵌套调用会并入外层事务。
+        """
+        tx = self._current_transaction()
+        if tx:
+            yield tx
+            return
         
-        # 如果找不到对应的境界，默认使用练气一层
-        return realm_exp_map.get(realm_name, 0)
+        async with self._write_lock:
+            tx = Transaction(self)
+            token = _current_transaction.set(tx)
+            try:
+                await self.conn.execute("BEGIN IMMEDIATE")
+                yield tx
+                await self.conn.commit()
+            except BaseException:
+                await self.conn.rollback()
+                raise
+            finally:
+                _current_transaction.reset(token)
+            
+            # 提交成功后、释放写锁前同步缓存（替换同一玩家尚未写回的旧数据），
+            # 等待写锁的批量写回不会再用旧数据覆盖刚提交的记录；回滚时缓存保持原状
+            for player in tx.players.values():
+                self.player_cache.put(player)
+                self.matchmaking.update(player.user_id, player.level_index)
+        
+        for callback in tx.after_commit:
+            await callback()
+    
+    @asynccontextmanager
+    async def _write(self):
+        """单个写操作：在事务内直接复用事务，否则独占写连接并立即提交"""
+        if self._current_transaction():
+            yield self.conn
+            return
+        async with self._write_lock:
+            try:
+                yield self.conn
+                await self.conn.commit()
+            except BaseException:
+                await self.conn.rollback()
+                raise
+    
+    async def _after_commit(self, callback: Callable[[], Awaitable]):
+        """在当前事务提交后执行回调；不在事务中时立即执行"""
+        tx = self._current_transaction()
+        if tx:
+            tx.after_commit.append(callback)
+        else:
+            await callback()
+    
+    def get_stats(self) -> Dict:
+        """查询统计、玩家缓存和战斗日志写入器的运行数据"""
+        stats = self.instrumentation.snapshot()
+        stats["player_cache"] = self.player_cache.stats()
+        stats["combat_log"] = self.combat_log_writer.stats()
+        stats["matchmaking"] = self.matchmaking.stats()
+        stats["combat_stats"] = self.combat_stats.stats()
+        if self.last_item_sync:
+            stats["item_sync"] = self.last_item_sync.to_dict()
+        return stats
+    
+    @property
+    def catalog(self) -> ItemCatalog:
+        """当前物品目录（只读）：保存在配置快照中，与快照中的物品配置总是对应同一次加载"""
+        catalog = self.config_manager.catalog if self.config_manager else None
+        return catalog if catalog is not None else _EMPTY_CATALOG
+    
+    async def reload_catalog(self):
+        """从数据库重建物品目录，随配置快照一起原子替换"""
+        self.config_manager.publish_catalog(
+            await ItemCatalog.load(self.conn, version=self.catalog.version + 1)
+        )
+    
+    async def prepare_snapshot(self, snapshot):
+        """配置重新加载、发布新快照之前：按新的物品配置同步数据库并构建物品目录
+        
+        返回附带新物品目录的快照，由配置管理器与配置一起发布；
+        物品没有变化时原样返回（沿用当前目录）。
+        """
+        report = await self._sync_items(snapshot.items, snapshot.realm_table)
+        if report and report.changed:
+            catalog = await ItemCatalog.load(self.conn, version=self.catalog.version + 1)
+            return replace(snapshot, catalog=catalog)
+        return snapshot
+    
+    async def rebuild_matchmaking(self):
+        """从数据库重建竞技场匹配索引（只读取 user_id 和境界，走 idx_players_level 覆盖索引）"""
+        try:
+            async with self._reader() as conn:
+                async with conn.execute("SELECT user_id, level_index FROM players") as cursor:
+                    rows = await cursor.fetchall()
+            self.matchmaking.rebuild(rows)
+        except Exception as e:
+            print(f"重建匹配索引失败: {e}")
+            self.matchmaking.ready = False
+    
+    async def _backfill_combat_power(self):
+        """为尚未计算战力的玩家（升级到v11前的数据）补算并写入战力"""
+        try:
+            async with self._reader() as conn:
+                players = await fetch_all(
+                    conn, "SELECT * FROM players WHERE combat_power = 0", codec=PLAYER_CODEC
+                )
+            if not players:
+                return
+            async with self._write():
+                await self.conn.executemany(
+                    "UPDATE players SET combat_power = ? WHERE user_id = ?",
+                    [(self.get_combat_power(player), player.user_id) for player in players]
+                )
+        except Exception as e:
+            print(f"补算玩家战力失败: {e}")
+    
+    async def _flush_loop(self):
+        """按配置的时间间隔写回玩家缓存"""
+        while True:
+            await asyncio.sleep(self.player_cache.flush_interval)
+            await self.flush_players()
+    
+    async def flush_players(self) -> int:
+        """将缓存中的脏玩家数据在一个事务中批量写回，返回写回数量"""
+        if not self.player_cache.dirty_count or not self.conn:
+            return 0
+        players: List[Player] = []
+        try:
+            async with self._write():
+                # 持有写锁后再取脏数据，期间提交的事务已先更新缓存
+                players = self.player_cache.take_dirty()
+                if players:
+                    await self._write_players(players)
+            self.player_cache.trim()
+            return len(players)
+        except asyncio.CancelledError:
+            # 关闭时取消了进行中的写回：恢复脏标记，由 close() 中最后一次写回写入（整行更新，重复写入无害）
+            self.player_cache.mark_dirty([player.user_id for player in players])
+            raise
+        except Exception as e:
+            print(f"写回玩家缓存失败: {e}")
+            self.player_cache.mark_dirty([player.user_id for player in players])
+            return 0
+    
+    async def _write_players(self, players: List[Player]):
+        """批量写入玩家数据（调用方负责提交）"""
+        import json
+        await self.conn.executemany(
+            """
+            UPDATE players SET 
+                name = ?, level_index = ?, spirit = ?, spiritual_root = ?, 
+                max_hp = ?, current_hp = ?, attack = ?, defense = ?, speed = ?, 
+                spirit_stone = ?, last_sign_in = ?, update_time = ?, sect_id = ?, 
+                sect_position = ?, gongfa_ids = ?, equipment_ids = ?, combat_power = ?
+            WHERE user_id = ?
+            """,
+            [
+                (
+                    player.name, player.level_index, player.spirit, player.spiritual_root,
+                    player.max_hp, player.current_hp, player.attack, player.defense,
+                    player.speed, player.spirit_stone, player.last_sign_in,
+                    player.update_time, player.sect_id, player.sect_position,
+                    json.dumps(player.gongfa_ids), json.dumps(player.equipment_ids),
+                    self.get_combat_power(player), player.user_id
+                )
+                for player in players
+            ]
+        )
+    
+    # 注意：表创建逻辑已移至migration.py中的_create_all_tables_v1函数
+    # 现在由MigrationManager负责处理表结构的创建和更新
     
     # 玩家相关操作
     async def get_player_by_id(self, user_id: str) -> Optional[Player]:
-        """根据用户ID获取玩家信息"""
-        async with self.conn.execute(
-            "SELECT * FROM players WHERE user_id = ?", (user_id,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                import json
-                return Player(
-                    user_id=row[0],
-                    name=row[1],
-                    level_index=row[2],
-                    spiritual_root=row[4],
-                    max_hp=row[5],
-                    current_hp=row[6],
-                    attack=row[7],
-                    defense=row[8],
-                    speed=row[9],
-                    spirit=row[10],
-                    spirit_stone=row[11],
-                    last_sign_in=row[12],
-                    create_time=row[13],
-                    update_time=row[14],
-                    sect_id=row[15],
-                    sect_position=row[16],
-                    gongfa_ids=json.loads(row[17]),  # 更新为gongfa_ids
-                    equipment_ids=json.loads(row[18])
-                )
-            return None
+        """根据用户ID获取玩家信息（优先读取缓存）"""
+        tx = self._current_transaction()
+        if tx and user_id in tx.players:
+            return tx.players[user_id].clone()
+        
+        cached = self.player_cache.get(user_id)
+        if cached:
+            return cached
+        
+        async with self._reader() as conn:
+            player = await fetch_one(
+                conn, "SELECT * FROM players WHERE user_id = ?", (user_id,), PLAYER_CODEC
+            )
+        if player:
+            # 读取期间可能已有其他协程写入缓存，以缓存为准
+            return self.player_cache.load(player)
+        return None
     
     async def create_player(self, player: Player) -> bool:
         """创建新玩家"""
         try:
-            import json
-            await self.conn.execute(
-                """
-                INSERT INTO players (
-                    user_id, name, level_index, spiritual_root, 
-                    max_hp, current_hp, attack, defense, speed, spirit_stone, 
-                    last_sign_in, create_time, update_time, sect_id, 
-                    sect_position, gongfa_ids, equipment_ids
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    player.user_id, player.name, player.level_index,
-                    player.spiritual_root, player.max_hp, player.current_hp, player.attack,
-                    player.defense, player.speed, player.spirit_stone, player.last_sign_in,
-                    player.create_time, player.update_time, player.sect_id,
-                    player.sect_position, json.dumps(player.gongfa_ids), json.dumps(player.equipment_ids)
+            async with self._write():
+                import json
+                await self.conn.execute(
+                    """
+                    INSERT INTO players (
+                        user_id, name, level_index, spirit, spiritual_root, 
+                        max_hp, current_hp, attack, defense, speed, spirit_stone, 
+                        last_sign_in, create_time, update_time, sect_id, 
+                        sect_position, gongfa_ids, equipment_ids, combat_power
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        player.user_id, player.name, player.level_index, player.spirit,
+                        player.spiritual_root, player.max_hp, player.current_hp, player.attack,
+                        player.defense, player.speed, player.spirit_stone, player.last_sign_in,
+                        player.create_time, player.update_time, player.sect_id,
+                        player.sect_position, json.dumps(player.gongfa_ids), json.dumps(player.equipment_ids),
+                        self.get_combat_power(player)
+                    )
                 )
-            )
-            await self.conn.commit()
+            self.player_cache.put(player)
+            self.matchmaking.update(player.user_id, player.level_index)
             return True
         except Exception as e:
             print(f"创建玩家失败: {e}")
+            if self._current_transaction():
+                raise
             return False
     
     async def update_player(self, player: Player) -> bool:
-        """更新玩家信息"""
+        """更新玩家信息
+        
+        事务内直接写入数据库，随事务一起提交；
+        否则写入缓存，由后台批量写回数据库。
+        """
+        tx = self._current_transaction()
+        if tx:
+            await self._write_players([player])
+            tx.players[player.user_id] = player.clone()
+            return True
+        
+        self.player_cache.put(player, dirty=True)
+        self.matchmaking.update(player.user_id, player.level_index)
+        if self.player_cache.needs_flush:
+            await self.flush_players()
+        return True
+    
+    async def adjust_currency(self, user_id: str, spirit_stone: int = 0, spirit: int = 0) -> Optional[Player]:
+        """增减玩家的灵石和灵气（增量写入，避免读-改-写丢失更新）
+        
+        余额不足（结果为负）或玩家不存在时不做修改并返回None，
+        否则返回修改后的玩家。
+        """
+        deltas = {"spirit_stone": spirit_stone, "spirit": spirit}
+        tx = self._current_transaction()
+        if tx:
+            # 事务内以事务中的玩家数据为准，随事务一起提交
+            player = await self.get_player_by_id(user_id)
+            if not player or player.spirit_stone + spirit_stone < 0 or player.spirit + spirit < 0:
+                return None
+            player.spirit_stone += spirit_stone
+            player.spirit += spirit
+            await self.update_player(player)
+            return player
+        
+        # 缓存是玩家数据的最新版本，直接在缓存项上修改
+        if user_id not in self.player_cache:
+            await self.get_player_by_id(user_id)
+        if user_id in self.player_cache:
+            player = self.player_cache.adjust(user_id, **deltas)
+            if player and self.player_cache.needs_flush:
+                await self.flush_players()
+            return player
+        
+        # 未能放入缓存时直接在数据库上做带条件的增量更新
         try:
-            import json
-            await self.conn.execute(
-                """
-                UPDATE players SET 
-                    name = ?, level_index = ?, spiritual_root = ?, 
-                    max_hp = ?, current_hp = ?, attack = ?, defense = ?, speed = ?, 
-                    spirit_stone = ?, last_sign_in = ?, update_time = ?, sect_id = ?, 
-                    sect_position = ?, gongfa_ids = ?, equipment_ids = ?
-                WHERE user_id = ?
-                """,
-                (
-                    player.name, player.level_index, player.spiritual_root,
-                    player.max_hp, player.current_hp, player.attack, player.defense,
-                    player.speed, player.spirit_stone, player.last_sign_in,
-                    player.update_time, player.sect_id, player.sect_position, json.dumps(player.gongfa_ids),
-                    json.dumps(player.equipment_ids), player.user_id
+            async with self._write():
+                cursor = await self.conn.execute(
+                    """
+                    UPDATE players SET spirit_stone = spirit_stone + ?, spirit = spirit + ?
+                    WHERE user_id = ? AND spirit_stone + ? >= 0 AND spirit + ? >= 0
+                    """,
+                    (spirit_stone, spirit, user_id, spirit_stone, spirit)
                 )
-            )
-            await self.conn.commit()
-            return True
+                if cursor.rowcount == 0:
+                    return None
         except Exception as e:
-            print(f"更新玩家失败: {e}")
-            return False
+            print(f"更新玩家货币失败: {e}")
+            return None
+        return await self.get_player_by_id(user_id)
     
     # 背包相关操作
     async def get_player_inventory(self, user_id: str) -> List[InventoryItem]:
         """获取玩家背包"""
-        async with self.conn.execute(
-            "SELECT user_id, item_id, quantity FROM inventory WHERE user_id = ?", (user_id,)
-        ) as cursor:
-            rows = await cursor.fetchall()
-            return [
-                InventoryItem(user_id=row[0], item_id=row[1], quantity=row[2])
-                for row in rows
-            ]
+        async with self._reader() as conn:
+            return await fetch_all(
+                conn,
+                "SELECT user_id, item_id, quantity FROM inventory WHERE user_id = ?",
+                (user_id,),
+                INVENTORY_CODEC
+            )
     
     async def add_item_to_inventory(self, user_id: str, item_id: str, quantity: int = 1) -> bool:
         """添加物品到背包"""
         try:
-            # 检查是否已存在该物品
-            async with self.conn.execute(
-                "SELECT quantity FROM inventory WHERE user_id = ? AND item_id = ?",
-                (user_id, item_id)
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    # 更新数量
-                    await self.conn.execute(
-                        "UPDATE inventory SET quantity = quantity + ? WHERE user_id = ? AND item_id = ?",
-                        (quantity, user_id, item_id)
-                    )
-                else:
-                    # 插入新记录
-                    await self.conn.execute(
-                        "INSERT INTO inventory (user_id, item_id, quantity) VALUES (?, ?, ?)",
-                        (user_id, item_id, quantity)
-                    )
-            await self.conn.commit()
+            async with self._write():
+                # 已有该物品时在原数量上累加
+                await self.conn.execute(
+                    """
+                    INSERT INTO inventory (user_id, item_id, quantity) VALUES (?, ?, ?)
+                    ON CONFLICT(user_id, item_id) DO UPDATE SET quantity = quantity + excluded.quantity
+                    """,
+                    (user_id, item_id, quantity)
+                )
             return True
         except Exception as e:
             print(f"添加物品失败: {e}")
+            if self._current_transaction():
+                raise
             return False
     
     async def remove_item_from_inventory(self, user_id: str, item_id: str, quantity: int = 1) -> bool:
-        """从背包移除物品"""
+        """从背包移除物品（数量不足时不做修改并返回False）"""
         try:
-            # 检查是否有足够数量
-            async with self.conn.execute(
-                "SELECT quantity FROM inventory WHERE user_id = ? AND item_id = ?",
-                (user_id, item_id)
-            ) as cursor:
-                row = await cursor.fetchone()
-                if not row or row[0] < quantity:
+            async with self._write():
+                # 带条件的扣减，数量不足时不会更新任何行
+                cursor = await self.conn.execute(
+                    "UPDATE inventory SET quantity = quantity - ? WHERE user_id = ? AND item_id = ? AND quantity >= ?",
+                    (quantity, user_id, item_id, quantity)
+                )
+                if cursor.rowcount == 0:
                     return False
-                
-                if row[0] == quantity:
-                    # 删除记录
-                    await self.conn.execute(
-                        "DELETE FROM inventory WHERE user_id = ? AND item_id = ?",
-                        (user_id, item_id)
-                    )
-                else:
-                    # 更新数量
-                    await self.conn.execute(
-                        "UPDATE inventory SET quantity = quantity - ? WHERE user_id = ? AND item_id = ?",
-                        (quantity, user_id, item_id)
-                    )
-            await self.conn.commit()
+                await self.conn.execute(
+                    "DELETE FROM inventory WHERE user_id = ? AND item_id = ? AND quantity <= 0",
+                    (user_id, item_id)
+                )
             return True
         except Exception as e:
             print(f"移除物品失败: {e}")
+            if self._current_transaction():
+                raise
             return False
     
     # 战斗日志相关操作
     async def add_combat_log(self, log: CombatLog) -> bool:
-        """添加战斗日志"""
+        """添加战斗日志（交给后台写入器批量写入）"""
+        if self.combat_log_writer.running:
+            # 事务中的日志在提交后再入队，回滚时不会留下日志
+            if self._current_transaction():
+                await self._after_commit(lambda: self.combat_log_writer.submit(log))
+                return True
+            return await self.combat_log_writer.submit(log)
         try:
-            import json
-            await self.conn.execute(
+            await self._write_combat_logs([log])
+            return True
+        except Exception as e:
+            print(f"添加战斗日志失败: {e}")
+            return False
+    
+    async def _write_combat_logs(self, logs: List[CombatLog]):
+        """批量写入战斗日志"""
+        import json
+        async with self._write():
+            await self.conn.executemany(
                 """
                 INSERT INTO combat_logs (
                     log_id, attacker_id, defender_id, result, damage, 
-                    spirit_stone_gained, timestamp, drop_items
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    spirit_stone_gained, timestamp, drop_items, replay
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
-                (
-                    log.log_id, log.attacker_id, log.defender_id, log.result,
-                    log.damage, log.spirit_stone_gained,
-                    log.timestamp, json.dumps(log.drop_items)
+                [
+                    (
+                        log.log_id, log.attacker_id, log.defender_id, log.result,
+                        log.damage, log.spirit_stone_gained,
+                        log.timestamp, json.dumps(log.drop_items), log.replay
+                    )
+                    for log in logs
+                ]
+            )
+            
+    async def get_combat_log(self, log_id: str) -> Optional[CombatLog]:
+        """根据日志ID获取战斗日志"""
+        await self.combat_log_writer.flush()
+        async with self._reader() as conn:
+            return await fetch_one(conn, "SELECT * FROM combat_logs WHERE log_id = ?", (log_id,), COMBAT_LOG_CODEC)
+    
+    async def get_latest_combat_log(self, attacker_id: str) -> Optional[CombatLog]:
+        """获取玩家最近一场主动发起的战斗日志"""
+        await self.combat_log_writer.flush()
+        async with self._reader() as conn:
+            return await fetch_one(
+                conn,
+                "SELECT * FROM combat_logs WHERE attacker_id = ? ORDER BY rowid DESC LIMIT 1",
+                (attacker_id,),
+                COMBAT_LOG_CODEC
+            )
+    
+    async def find_arena_opponent(self, player: Player, max_level_gap: int = 2) -> Optional[Player]:
+        """随机选取一名境界不高于 player.level_index + max_level_gap 的其他玩家
+        
+        优先使用内存中的匹配索引；索引不可用时用SQL按索引计数后 LIMIT 1 OFFSET 随机取一行。
+        """
+        max_level = player.level_index + max_level_gap
+        if self.matchmaking.ready:
+            opponent_id = self.matchmaking.pick(0, max_level, exclude=player.user_id)
+            if opponent_id is None:
+                return None
+            opponent = await self.get_player_by_id(opponent_id)
+            if opponent:
+                return opponent
+            # 索引中的玩家已不存在，移出索引后走SQL查询
+            self.matchmaking.remove(opponent_id)
+        
+        try:
+            async with self._reader() as conn:
+                async with conn.execute(
+                    "SELECT COUNT(*) FROM players WHERE level_index <= ? AND user_id != ?",
+                    (max_level, player.user_id)
+                ) as cursor:
+                    (total,) = await cursor.fetchone()
+                if not total:
+                    return None
+                opponent = await fetch_one(
+                    conn,
+                    """
+                    SELECT * FROM players WHERE level_index <= ? AND user_id != ?
+                    ORDER BY level_index, user_id LIMIT 1 OFFSET ?
+                    """,
+                    (max_level, player.user_id, random.randrange(total)),
+                    PLAYER_CODEC
+                )
+        except Exception as e:
+            print(f"匹配竞技场对手失败: {e}")
+            return None
+        return self.player_cache.load(opponent) if opponent else None
+    
+    # 世界Boss相关操作
+    async def create_world_boss(self, instance_id: str, boss_id: str, max_hp: int, spawn_time: str) -> bool:
+        """创建新的世界Boss实例"""
+        try:
+            async with self._write():
+                await self.conn.execute(
+                    """
+                    INSERT INTO world_bosses (instance_id, boss_id, max_hp, hp, status, spawn_time)
+                    VALUES (?, ?, ?, ?, 'active', ?)
+                    """,
+                    (instance_id, boss_id, max_hp, max_hp, spawn_time)
                 )
+            return True
+        except Exception as e:
+            print(f"创建世界Boss失败: {e}")
+            return False
+    
+    async def get_active_world_boss(self) -> Optional[Dict]:
+        """获取尚未被击败的世界Boss实例"""
+        async with self._reader() as conn:
+            return await fetch_one(
+                conn,
+                "SELECT * FROM world_bosses WHERE status = 'active' ORDER BY spawn_time DESC LIMIT 1"
             )
-            await self.conn.commit()
+    
+    async def get_world_boss_damage(self, instance_id: str) -> Dict[str, Tuple[int, int]]:
+        """获取世界Boss实例的伤害统计，返回 user_id: (伤害, 攻击次数)"""
+        async with self._reader() as conn:
+            rows = await fetch_all(
+                conn, "SELECT user_id, damage, hits FROM world_boss_damage WHERE instance_id = ?", (instance_id,)
+            )
+        return {row["user_id"]: (row["damage"], row["hits"]) for row in rows}
+    
+    async def save_world_boss_progress(
+        self, instance_id: str, hp: int, damages: Dict[str, Tuple[int, int]]
+    ) -> bool:
+        """在一个事务中写入Boss剩余血量和一批伤害增量 user_id: (伤害, 攻击次数)"""
+        try:
+            async with self._write():
+                # 血量只减不增，避免较早发起的写回覆盖较新的血量
+                await self.conn.execute(
+                    "UPDATE world_bosses SET hp = MIN(hp, ?) WHERE instance_id = ?", (hp, instance_id)
+                )
+                await self.conn.executemany(
+                    """
+                    INSERT INTO world_boss_damage (instance_id, user_id, damage, hits) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(instance_id, user_id) DO UPDATE SET
+                        damage = damage + excluded.damage, hits = hits + excluded.hits
+                    """,
+                    [(instance_id, user_id, damage, hits) for user_id, (damage, hits) in damages.items()]
+                )
             return True
         except Exception as e:
-            print(f"添加战斗日志失败: {e}")
+            print(f"保存世界Boss进度失败: {e}")
             return False
-            
+    
+    async def get_unsettled_world_bosses(self) -> List[Dict]:
+        """获取已被击败但奖励尚未发放完的世界Boss（结算中，或血量已写为0仍是未击败状态）"""
+        async with self._reader() as conn:
+            return await fetch_all(
+                conn,
+                """
+                SELECT * FROM world_bosses
+                WHERE status IN ('active', 'settling') AND (status = 'settling' OR hp <= 0)
+                """
+            )
+    
+    async def get_last_world_boss_defeat_time(self) -> Optional[str]:
+        """最近一次击败世界Boss的时间"""
+        async with self._reader() as conn:
+            row = await fetch_one(
+                conn,
+                """
+                SELECT defeat_time FROM world_bosses WHERE defeat_time IS NOT NULL
+                ORDER BY defeat_time DESC LIMIT 1
+                """
+            )
+        return row["defeat_time"] if row else None
+    
+    async def begin_world_boss_settlement(
+        self, instance_id: str, defeat_time: str, rewards: Dict[str, Tuple[int, List[str]]]
+    ) -> bool:
+        """在一个事务中把世界Boss标记为结算中并保存奖励 user_id: (灵石, 掉落物品ID列表)
+        
+        已保存过奖励的玩家保留原记录，重复调用不会改变已确定的奖励。
+        """
+        try:
+            async with self._write():
+                await self.conn.execute(
+                    """
+                    UPDATE world_bosses SET hp = 0, status = 'settling', defeat_time = COALESCE(defeat_time, ?)
+                    WHERE instance_id = ? AND status IN ('active', 'settling')
+                    """,
+                    (defeat_time, instance_id)
+                )
+                await self.conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO world_boss_rewards (instance_id, user_id, spirit_stone, drops)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    [
+                        (instance_id, user_id, spirit_stone, json.dumps(drops))
+                        for user_id, (spirit_stone, drops) in rewards.items()
+                    ]
+                )
+            return True
+        except Exception as e:
+            print(f"保存世界Boss奖励失败: {e}")
+            return False
+    
+    async def get_world_boss_rewards(self, instance_id: str) -> Dict[str, Tuple[int, List[str], bool]]:
+        """获取世界Boss实例的奖励，返回 user_id: (灵石, 掉落物品ID列表, 是否已发放)"""
+        async with self._reader() as conn:
+            rows = await fetch_all(
+                conn,
+                "SELECT user_id, spirit_stone, drops, paid FROM world_boss_rewards WHERE instance_id = ?",
+                (instance_id,)
+            )
+        return {
+            row["user_id"]: (row["spirit_stone"], json.loads(row["drops"]), bool(row["paid"]))
+            for row in rows
+        }
+    
+    async def pay_world_boss_reward(self, instance_id: str, user_id: str) -> bool:
+        """发放一名玩家的世界Boss奖励，与已发放标记在同一事务中提交
+        
+        已发放过时不做修改并返回False，重复调用不会重复发放。
+        """
+        async with self.transaction():
+            cursor = await self.conn.execute(
+                "UPDATE world_boss_rewards SET paid = 1 WHERE instance_id = ? AND user_id = ? AND paid = 0",
+                (instance_id, user_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            row = await fetch_one(
+                self.conn,
+                "SELECT spirit_stone, drops FROM world_boss_rewards WHERE instance_id = ? AND user_id = ?",
+                (instance_id, user_id)
+            )
+            if row["spirit_stone"]:
+                await self.adjust_currency(user_id, spirit_stone=row["spirit_stone"])
+            for item_id in json.loads(row["drops"]):
+                await self.add_item_to_inventory(user_id, item_id)
+        return True
+    
+    async def finish_world_boss(self, instance_id: str, defeat_time: str) -> bool:
+        """标记世界Boss已被击败（奖励已全部发放），保留结算开始时记录的击败时间"""
+        async with self._write():
+            await self.conn.execute(
+                """
+                UPDATE world_bosses SET hp = 0, status = 'defeated', defeat_time = COALESCE(defeat_time, ?)
+                WHERE instance_id = ?
+                """,
+                (defeat_time, instance_id)
+            )
+        return True
+    
     # 后台管理相关方法
     async def get_all_players(self) -> List[Player]:
         """获取所有玩家信息"""
+        await self.flush_players()
         try:
-            async with self.conn.execute("SELECT * FROM players") as cursor:
-                rows = await cursor.fetchall()
-                players = []
-                for row in rows:
-                    import json
-                    players.append(Player(
-                        user_id=row[0],
-                        name=row[1],
-                        level_index=row[2],
-                        spiritual_root=row[4],
-                        max_hp=row[5],
-                        current_hp=row[6],
-                        attack=row[7],
-                        defense=row[8],
-                        speed=row[9],
-                        spirit=row[10],
-                        spirit_stone=row[11],
-                        last_sign_in=row[12],
-                        create_time=row[13],
-                        update_time=row[14],
-                        sect_id=row[15],
-                        sect_position=row[16],
-                        gongfa_ids=json.loads(row[17]),  # 更新为gongfa_ids
-                        equipment_ids=json.loads(row[18])
-                    ))
-                return players
+            async with self._reader() as conn:
+                return await fetch_all(conn, "SELECT * FROM players", codec=PLAYER_CODEC)
         except Exception as e:
             print(f"获取所有玩家失败: {e}")
             return []
@@ -293,565 +750,292 @@ class DataBase:
     async def get_all_items(self) -> List[Item]:
         """获取所有物品信息"""
         try:
-            async with self.conn.execute("SELECT * FROM items") as cursor:
-                rows = await cursor.fetchall()
-                items = []
-                for row in rows:
-                    import json
-                    items.append(Item(
-                        item_id=row[0],
-                        name=row[1],
-                        description=row[2],
-                        item_type=row[3],
-                        quality=row[4],
-                        effect=row[5],
-                        price=row[6],
-                        max_stack=row[7],
-                        usage_requirements=json.loads(row[8])
-                    ))
-                return items
+            async with self._reader() as conn:
+                return await fetch_all(conn, "SELECT * FROM items", codec=ITEM_CODEC)
         except Exception as e:
             print(f"获取所有物品失败: {e}")
             return []
             
     async def get_gongfa_by_id(self, gongfa_id: str) -> Optional[Dict]:
         """根据功法ID获取功法信息"""
-        try:
-            async with self.conn.execute(
-                "SELECT * FROM gongfas WHERE id = ?", (gongfa_id,)
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return {
-                        "id": row[0],
-                        "name": row[1],
-                        "upgrade_exp": row[2],
-                        "attack_bonus": row[3],
-                        "hp_bonus": row[4],
-                        "defense_bonus": row[5],
-                        "speed_bonus": row[6],
-                        "cultivation_speed_bonus": row[7]
-                    }
-                return None
-        except Exception as e:
-            print(f"获取功法失败: {e}")
-            return None
+        gongfa = self.catalog.get_gongfa(gongfa_id)
+        return dict(gongfa) if gongfa else None
     
     async def get_gongfas_by_ids(self, gongfa_ids: List[str]) -> List[Dict]:
         """根据功法ID列表获取功法信息列表"""
         if not gongfa_ids:
             return []
         
-        placeholders = ','.join(['?' for _ in gongfa_ids])
-        try:
-            async with self.conn.execute(
-                f"SELECT * FROM gongfas WHERE id IN ({placeholders})", gongfa_ids
-            ) as cursor:
-                rows = await cursor.fetchall()
-                gongfas = []
-                for row in rows:
-                    gongfas.append({
-                        "id": row[0],
-                        "name": row[1],
-                        "upgrade_exp": row[2],
-                        "attack_bonus": row[3],
-                        "hp_bonus": row[4],
-                        "defense_bonus": row[5],
-                        "speed_bonus": row[6],
-                        "cultivation_speed_bonus": row[7]
-                    })
-                return gongfas
-        except Exception as e:
-            print(f"获取功法列表失败: {e}")
-            return []
+        gongfas = []
+        for gongfa_id in gongfa_ids:
+            gongfa = self.catalog.get_gongfa(gongfa_id)
+            if gongfa:
+                gongfas.append(dict(gongfa))
+        return gongfas
     
     async def get_all_gongfas(self) -> List:
         """获取所有功法信息"""
-        try:
-            async with self.conn.execute("SELECT * FROM gongfas") as cursor:
-                rows = await cursor.fetchall()
-                gongfas = []
-                for row in rows:
-                    import json
-                    gongfas.append({
-                        "id": row[0],
-                        "name": row[1],
-                        "upgrade_exp": row[2],
-                        "attack_bonus": row[3],
-                        "hp_bonus": row[4],
-                        "defense_bonus": row[5],
-                        "speed_bonus": row[6],
-                        "cultivation_speed_bonus": row[7]
-                    })
-                return gongfas
-        except Exception as e:
-            print(f"获取所有功法失败: {e}")
-            return []
+        return [dict(gongfa) for gongfa in self.catalog.all_gongfas()]
             
     async def get_item_by_id(self, item_id: str) -> Optional[Dict]:
-        """根据物品ID获取物品信息"""
+        """根据物品ID获取物品信息（装备优先，读取内存目录）"""
+        item = self.catalog.get_item(item_id)
+        return dict(item) if item else None
+    
+    async def get_items_by_ids(self, item_ids: List[str]) -> Dict[str, Dict]:
+        """批量获取物品信息，返回 物品ID: 物品信息，不存在的ID会被忽略"""
+        items = {}
+        for item_id in item_ids:
+            if item_id and item_id not in items:
+                item = self.catalog.get_item(item_id)
+                if item:
+                    items[item_id] = dict(item)
+        return items
+    
+    def get_combat_stats(self, player: Player) -> Dict:
+        """获取玩家的有效战斗属性（含装备和功法加成）
+        
+        结果按属性指纹缓存，基础属性、装备、功法或物品目录变化时重新计算；
+        灵气不参与指纹，缓存装备提供的灵气加成，返回时加上玩家当前的灵气。
+        """
+        fingerprint = stats_fingerprint(player, self.catalog.version)
+        stats = self.combat_stats.get(player.user_id, fingerprint)
+        if stats is None:
+            equipments = {}
+            for item_id in player.equipment_ids.values():
+                item = self.catalog.get_item(item_id) if item_id else None
+                if item:
+                    equipments[item_id] = item
+            gongfas = [gongfa for gongfa in map(self.catalog.get_gongfa, player.gongfa_ids) if gongfa]
+            stats = player.get_combat_stats(equipments, gongfas)
+            stats["spirit"] -= player.spirit
+            self.combat_stats.put(player.user_id, fingerprint, stats)
+        stats["spirit"] += player.spirit
+        return stats
+    
+    def get_combat_power(self, player: Player) -> int:
+        """玩家战力（由有效战斗属性折算）"""
+        return combat_power(self.get_combat_stats(player))
+    
+    async def get_power_ranking(self, limit: int = 10) -> List[Player]:
+        """按战力从高到低获取玩家（走 idx_players_power 索引）"""
+        await self.flush_players()
         try:
-            # 首先尝试从equipments表中获取
-            async with self.conn.execute(
-                "SELECT * FROM equipments WHERE id = ?", (item_id,)
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return {
-                        "item_id": row[0],
-                        "name": row[1],
-                        "description": row[2],
-                        "slot": row[3],
-                        "base_attack": row[4],
-                        "base_defense": row[5],
-                        "base_speed": row[6],
-                        "base_hp": row[7],
-                        "base_spirit": row[8],
-                        "upgrade_level": row[9],
-                        "quality": row[10],
-                        "price": row[11],
-                        "required_realm": row[12],
-                        "type": "equipment"
-                    }
-            # 如果在equipments表中没找到，尝试从items表中获取
-            async with self.conn.execute(
-                "SELECT * FROM items WHERE item_id = ?", (item_id,)
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    import json
-                    item_data = {
-                        "item_id": row[0],
-                        "name": row[1],
-                        "description": row[2],
-                        "type": row[3],
-                        "quality": row[4],
-                        "effect": row[5],
-                        "price": row[6],
-                        "max_stack": row[7],
-                        "usage_requirements": json.loads(row[8]),
-                        "upgrade_level": row[9] if len(row) > 9 else 0,
-                        "base_attack": row[10] if len(row) > 10 else 0,
-                        "base_defense": row[11] if len(row) > 11 else 0,
-                        "base_speed": row[12] if len(row) > 12 else 0,
-                        "base_hp": row[13] if len(row) > 13 else 0,
-                        "base_spirit": row[14] if len(row) > 14 else 0
-                    }
-                    
-                    # 如果是consumable类型的物品，尝试从danyao表获取效果
-                    if item_data["type"] == "consumable":
-                        danyao_data = await self.get_danyao_by_id(item_id)
-                        if danyao_data:
-                            # 使用danyao表中的效果，而不是items表中的效果
-                            item_data["effect"] = json.dumps(danyao_data["effect"])
-                    
-                    return item_data
-            return None
+            async with self._reader() as conn:
+                return await fetch_all(
+                    conn, "SELECT * FROM players ORDER BY combat_power DESC LIMIT ?", (limit,), PLAYER_CODEC
+                )
         except Exception as e:
-            print(f"获取物品失败: {e}")
+            print(f"获取战力排行失败: {e}")
+            return []
+    
+    async def get_profile_for_player(self, player: Player) -> PlayerProfile:
+        """为已加载的玩家组装装备和功法记录"""
+        equipments = await self.get_items_by_ids(list(player.equipment_ids.values()))
+        gongfas = await self.get_gongfas_by_ids(player.gongfa_ids)
+        return PlayerProfile(player=player, equipments=equipments, gongfas=gongfas)
+    
+    async def get_player_profile(self, user_id: str) -> Optional[PlayerProfile]:
+        """一次性加载玩家、装备记录和功法记录"""
+        player = await self.get_player_by_id(user_id)
+        if not player:
             return None
+        return await self.get_profile_for_player(player)
     
     async def update_item(self, item_id: str, item_data: Dict) -> bool:
         """更新物品信息"""
         try:
-            # 如果是装备，更新equipments表
-            if item_data.get("type") == "equipment":
-                await self.conn.execute("""
-                    UPDATE equipments SET 
-                        name = ?, description = ?, slot = ?, base_attack = ?, base_defense = ?, 
-                        base_speed = ?, base_hp = ?, base_spirit = ?, upgrade_level = ?, quality = ?, 
-                        price = ?, required_realm = ?
-                    WHERE id = ?
-                """, (
-                    item_data.get("name"), item_data.get("description"), 
-                    item_data.get("slot"), item_data.get("base_attack", 0),
-                    item_data.get("base_defense", 0), item_data.get("base_speed", 0),
-                    item_data.get("base_hp", 0), item_data.get("base_spirit", 0),
-                    item_data.get("upgrade_level", 0), item_data.get("quality"),
-                    item_data.get("price"), item_data.get("required_realm", 0),
-                    item_id
-                ))
-            else:
-                # 如果是普通物品，更新items表
-                import json
-                # 对于consumable类型的物品，effect存储在danyao表中，items表中effect字段设为空
-                effect_value = item_data.get("effect") if item_data.get("type") != "consumable" else ""
+            async with self._write():
+                # 如果是装备，更新equipments表
+                if item_data.get("type") == "equipment":
+                    await self.conn.execute("""
+                        UPDATE equipments SET 
+                            name = ?, description = ?, slot = ?, base_attack = ?, base_defense = ?, 
+                            base_speed = ?, base_hp = ?, base_spirit = ?, upgrade_level = ?, quality = ?, 
+                            price = ?, required_realm = ?
+                        WHERE id = ?
+                    """, (
+                        item_data.get("name"), item_data.get("description"), 
+                        item_data.get("slot"), item_data.get("base_attack", 0),
+                        item_data.get("base_defense", 0), item_data.get("base_speed", 0),
+                        item_data.get("base_hp", 0), item_data.get("base_spirit", 0),
+                        item_data.get("upgrade_level", 0), item_data.get("quality"),
+                        item_data.get("price"), item_data.get("required_realm", 0),
+                        item_id
+                    ))
+                else:
+                    # 如果是普通物品，更新items表
+                    import json
+                    # 对于consumable类型的物品，effect存储在danyao表中，items表中effect字段设为空
+                    effect_value = item_data.get("effect") if item_data.get("type") != "consumable" else ""
                 
-                await self.conn.execute("""
-                    UPDATE items SET 
-                        name = ?, description = ?, type = ?, quality = ?, 
-                        effect = ?, price = ?, max_stack = ?, usage_requirements = ?,
-                        upgrade_level = ?, base_attack = ?, base_defense = ?,
-                        base_speed = ?, base_hp = ?, base_spirit = ?
-                    WHERE item_id = ?
-                """, (
-                    item_data.get("name"), item_data.get("description"), 
-                    item_data.get("type"), item_data.get("quality"),
-                    effect_value,  # 对于consumable，这里会是空字符串，效果存储在danyao表中
-                    item_data.get("price"),
-                    item_data.get("max_stack"), json.dumps(item_data.get("usage_requirements", {})),
-                    item_data.get("upgrade_level", 0), item_data.get("base_attack", 0),
-                    item_data.get("base_defense", 0), item_data.get("base_speed", 0),
-                    item_data.get("base_hp", 0), item_data.get("base_spirit", 0),
-                    item_id
-                ))
+                    await self.conn.execute("""
+                        UPDATE items SET 
+                            name = ?, description = ?, type = ?, quality = ?, 
+                            effect = ?, price = ?, max_stack = ?, usage_requirements = ?,
+                            upgrade_level = ?, base_attack = ?, base_defense = ?,
+                            base_speed = ?, base_hp = ?, base_spirit = ?
+                        WHERE item_id = ?
+                    """, (
+                        item_data.get("name"), item_data.get("description"), 
+                        item_data.get("type"), item_data.get("quality"),
+                        effect_value,  # 对于consumable，这里会是空字符串，效果存储在danyao表中
+                        item_data.get("price"),
+                        item_data.get("max_stack"), json.dumps(item_data.get("usage_requirements", {})),
+                        item_data.get("upgrade_level", 0), item_data.get("base_attack", 0),
+                        item_data.get("base_defense", 0), item_data.get("base_speed", 0),
+                        item_data.get("base_hp", 0), item_data.get("base_spirit", 0),
+                        item_id
+                    ))
                 
-                # 如果是consumable类型的物品，同时更新danyao表
-                if item_data.get("type") == "consumable":
-                    # 检查danyao表中是否已存在该物品
-                    danyao_cursor = await self.conn.execute("SELECT id FROM danyao WHERE id = ?", (item_id,))
-                    danyao_existing = await danyao_cursor.fetchone()
+                    # 如果是consumable类型的物品，同时更新danyao表
+                    if item_data.get("type") == "consumable":
+                        # 检查danyao表中是否已存在该物品
+                        danyao_cursor = await self.conn.execute("SELECT id FROM danyao WHERE id = ?", (item_id,))
+                        danyao_existing = await danyao_cursor.fetchone()
                     
-                    if danyao_existing:
-                        # 更新danyao表
-                        effects = item_data.get("effects", {}) or json.loads(item_data.get("effect", "{}"))
-                        await self.conn.execute("""
-                        UPDATE danyao SET 
-                            name = ?, effect = ?
-                        WHERE id = ?
-                        """, (
-                            item_data.get("name", ""),
-                            json.dumps(effects),  # 将效果存储为JSON字符串
-                            item_id
-                        ))
-                    else:
-                        # 插入到danyao表
-                        effects = item_data.get("effects", {}) or json.loads(item_data.get("effect", "{}"))
-                        await self.conn.execute("""
-                        INSERT INTO danyao 
-                        (id, name, effect)
-                        VALUES (?, ?, ?)
-                        """, (
-                            item_id,
-                            item_data.get("name", ""),
-                            json.dumps(effects)  # 将效果存储为JSON字符串
-                        ))
-            await self.conn.commit()
+                        if danyao_existing:
+                            # 更新danyao表
+                            effects = item_data.get("effects", {}) or json.loads(item_data.get("effect", "{}"))
+                            await self.conn.execute("""
+                            UPDATE danyao SET 
+                                name = ?, effect = ?
+                            WHERE id = ?
+                            """, (
+                                item_data.get("name", ""),
+                                json.dumps(effects),  # 将效果存储为JSON字符串
+                                item_id
+                            ))
+                        else:
+                            # 插入到danyao表
+                            effects = item_data.get("effects", {}) or json.loads(item_data.get("effect", "{}"))
+                            await self.conn.execute("""
+                            INSERT INTO danyao 
+                            (id, name, effect)
+                            VALUES (?, ?, ?)
+                            """, (
+                                item_id,
+                                item_data.get("name", ""),
+                                json.dumps(effects)  # 将效果存储为JSON字符串
+                            ))
+            await self._after_commit(self.reload_catalog)
             return True
         except Exception as e:
             print(f"更新物品失败: {e}")
+            if self._current_transaction():
+                raise
             return False
             
     async def get_all_sects(self) -> List:
         """获取所有宗门信息"""
+        await self.flush_players()
         try:
-            async with self.conn.execute("SELECT * FROM sects") as cursor:
-                rows = await cursor.fetchall()
-                sects = []
-                for row in rows:
-                    # 获取宗主昵称
-                    master_nickname = ""
-                    if row[2]:
-                        async with self.conn.execute(
-                            "SELECT name FROM players WHERE user_id = ?", (row[2],)
-                        ) as cursor2:
-                            master_row = await cursor2.fetchone()
-                            if master_row:
-                                master_nickname = master_row[0]
-                    
-                    # 获取成员数量
-                    async with self.conn.execute(
-                        "SELECT COUNT(*) FROM players WHERE sect_id = ?", (row[0],)
-                    ) as cursor2:
-                        member_count_row = await cursor2.fetchone()
-                        member_count = member_count_row[0] if member_count_row else 0
-                    
-                    sects.append({
-                        "id": row[0],
-                        "name": row[1],
-                        "master_id": row[2],
-                        "master_nickname": master_nickname,
-                        "level": row[3],
-                        "experience": row[4],
-                        "member_count": member_count,
-                        "created_at": row[5]
-                    })
-                return sects
+            async with self._reader() as conn:
+                # 一次查询带出宗主昵称和成员数量
+                return await fetch_all(conn, """
+                    SELECT s.id, s.name, s.leader_id AS master_id,
+                           COALESCE(m.name, '') AS master_nickname,
+                           s.level, s.experience,
+                           (SELECT COUNT(*) FROM players p WHERE p.sect_id = s.id) AS member_count,
+                           s.created_at
+                    FROM sects s
+                    LEFT JOIN players m ON m.user_id = s.leader_id
+                """)
         except Exception as e:
             print(f"获取所有宗门失败: {e}")
             return []
     
-    async def sync_items_to_database(self, items_config: Dict[str, Dict]):
-        """将items.json中的物品配置同步到数据库中"""
+    async def sync_items_to_database(
+        self, items_config: Dict[str, Dict], realm_table=None
+    ) -> Optional[SyncReport]:
+        """将items.json中的物品配置同步到数据库中
+        
+        按内容指纹只写入新增、修改和删除的物品，配置未变化时不写数据库；
+        有变化时提交后重建物品目录。返回本次同步的统计，失败时返回None。
+        """
+        report = await self._sync_items(items_config, realm_table)
+        if report and report.changed:
+            await self._after_commit(self.reload_catalog)
+        return report
+    
+    async def _sync_items(self, items_config: Mapping[str, Dict], realm_table=None) -> Optional[SyncReport]:
+        start = time.perf_counter()
         try:
-            for item_id, item_data in items_config.items():
-                # 根据物品类型决定如何处理
-                item_type = item_data.get("type", "consumable")
-                
-                if item_type == "gongfa":
-                    # 对于功法类型，添加到gongfas表
-                    # 检查功法是否已存在
-                    cursor = await self.conn.execute("SELECT id FROM gongfas WHERE id = ?", (item_id,))
-                    existing = await cursor.fetchone()
-                    
-                    if not existing:
-                        # 如果不存在，则插入新的功法
-                        await self.conn.execute("""
-                        INSERT INTO gongfas 
-                        (id, name, upgrade_exp, attack_bonus, hp_bonus, defense_bonus, speed_bonus, cultivation_speed_bonus)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            item_id,
-                            item_data.get("name", ""),
-                            self._calculate_upgrade_exp_by_realm(item_data.get("required_realm", "练气一层")),  # 用required_realm计算升级经验
-                            item_data.get("attack_bonus", 0),
-                            item_data.get("hp_bonus", 0),
-                            item_data.get("defense_bonus", 0),
-                            item_data.get("speed_bonus", 0),
-                            item_data.get("cultivation_speed_bonus", 0.0)
-                        ))
-                
-                elif item_type == "gongfa_book":
-                    # 对于功法秘籍，添加到items表
-                    cursor = await self.conn.execute("SELECT item_id FROM items WHERE item_id = ?", (item_id,))
-                    existing = await cursor.fetchone()
-                    
-                    if not existing:
-                        # 如果不存在，则插入新的功法秘籍
-                        import json
-                        category = "功法"
-                        await self.conn.execute("""
-                        INSERT INTO items 
-                        (item_id, name, description, item_type, category, quality, effect, price, max_stack, usage_requirements) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            item_id,
-                            item_data.get("name", ""),
-                            item_data.get("description", ""),
-                            item_type,
-                            category,
-                            item_data.get("quality", "common"),
-                            str({}),  # 功法秘籍没有效果
-                            item_data.get("price", 0),
-                            item_data.get("max_stack", 99),
-                            json.dumps({"required_realm": item_data.get("required_realm", 0)})
-                        ))
-                
-                elif item_type in ["consumable", "equipment"]:
-                    # 对于消耗品和装备，添加到items表
-                    cursor = await self.conn.execute("SELECT item_id FROM items WHERE item_id = ?", (item_id,))
-                    existing = await cursor.fetchone()
-                    
-                    if not existing:
-                        import json
-                        category = "丹药" if item_type == "consumable" else "装备"
-                        
-                        # 对于consumable类型的物品，effect存储在danyao表中，items表中effect字段设为空
-                        effect = str(item_data.get("effects", {})) if item_type != "consumable" else ""
-                        
-                        await self.conn.execute("""
-                        INSERT INTO items 
-                        (item_id, name, description, item_type, category, quality, effect, price, max_stack, usage_requirements) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            item_id,
-                            item_data.get("name", ""),
-                            item_data.get("description", ""),
-                            item_type,
-                            category,
-                            item_data.get("quality", "common"),
-                            effect,  # 对于consumable，这里会是空字符串，效果存储在danyao表中
-                            item_data.get("price", 0),
-                            item_data.get("max_stack", 99),
-                            json.dumps(item_data.get("usage_requirements", {}))
-                        ))
-                        
-                        # 如果是consumable类型的物品，同时添加到danyao表
-                        if item_type == "consumable":
-                            # 检查danyao表中是否已存在该物品
-                            danyao_cursor = await self.conn.execute("SELECT id FROM danyao WHERE id = ?", (item_id,))
-                            danyao_existing = await danyao_cursor.fetchone()
-                            
-                            if not danyao_existing:
-                                # 添加到danyao表
-                                effects = item_data.get("effects", {})
-                                await self.conn.execute("""
-                                INSERT INTO danyao 
-                                (id, name, effect)
-                                VALUES (?, ?, ?)
-                                """, (
-                                    item_id,
-                                    item_data.get("name", ""),
-                                    json.dumps(effects)  # 将效果存储为JSON字符串
-                                ))
-                
-                # 对于其他类型的物品，也尝试添加到items表
-                else:
-                    cursor = await self.conn.execute("SELECT item_id FROM items WHERE item_id = ?", (item_id,))
-                    existing = await cursor.fetchone()
-                    
-                    if not existing:
-                        import json
-                        category = item_data.get("category", "")
-                        if not category:
-                            if item_type == "consumable":
-                                category = "丹药"
-                            elif item_type == "equipment":
-                                category = "装备"
-                            elif item_type == "gongfa_book":
-                                category = "功法"
-                            else:
-                                category = "其他"
-                        
-                        # 对于consumable类型的物品，effect存储在danyao表中，items表中effect字段设为空
-                        effect = str(item_data.get("effects", {})) if item_type != "consumable" else ""
-                        
-                        await self.conn.execute("""
-                        INSERT INTO items 
-                        (item_id, name, description, item_type, category, quality, effect, price, max_stack, usage_requirements) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            item_id,
-                            item_data.get("name", ""),
-                            item_data.get("description", ""),
-                            item_type,
-                            category,
-                            item_data.get("quality", "common"),
-                            effect,
-                            item_data.get("price", 0),
-                            item_data.get("max_stack", 99),
-                            json.dumps(item_data.get("usage_requirements", {}))
-                        ))
-                        
-                        # 如果是consumable类型的物品，同时添加到danyao表
-                        if item_type == "consumable":
-                            # 检查danyao表中是否已存在该物品
-                            danyao_cursor = await self.conn.execute("SELECT id FROM danyao WHERE id = ?", (item_id,))
-                            danyao_existing = await danyao_cursor.fetchone()
-                            
-                            if not danyao_existing:
-                                # 添加到danyao表
-                                effects = item_data.get("effects", {})
-                                await self.conn.execute("""
-                                INSERT INTO danyao 
-                                (id, name, effect)
-                                VALUES (?, ?, ?)
-                                """, (
-                                    item_id,
-                                    item_data.get("name", ""),
-                                    json.dumps(effects)  # 将效果存储为JSON字符串
-                                ))
-            
-            await self.conn.commit()
-            print("物品配置已同步到数据库")
-            return True
+            async with self._write():
+                report = await sync_items(
+                    self.conn, items_config, realm_table or self.config_manager.realm_table
+                )
+            report.ms = (time.perf_counter() - start) * 1000
+            self.last_item_sync = report
+            print(f"物品配置已同步到数据库：{report.summary()}")
+            return report
         except Exception as e:
             print(f"同步物品配置到数据库失败: {e}")
-            return False
+            if self._current_transaction():
+                raise
+            return None
     
     async def get_danyao_by_id(self, danyao_id: str) -> Optional[Dict]:
         """根据ID获取丹药信息"""
-        async with self.conn.execute(
-            "SELECT id, name, effect FROM danyao WHERE id = ?", (danyao_id,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                import json
-                return {
-                    "id": row[0],
-                    "name": row[1],
-                    "effect": json.loads(row[2]) if row[2] else {}
-                }
-            return None
+        danyao = self.catalog.get_danyao(danyao_id)
+        return dict(danyao) if danyao else None
     
     async def get_danyao_by_name(self, danyao_name: str) -> Optional[Dict]:
         """根据名称获取丹药信息"""
-        async with self.conn.execute(
-            "SELECT id, name, effect FROM danyao WHERE name = ?", (danyao_name,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                import json
-                return {
-                    "id": row[0],
-                    "name": row[1],
-                    "effect": json.loads(row[2]) if row[2] else {}
-                }
-            return None
+        danyao = self.catalog.get_danyao_by_name(danyao_name)
+        return dict(danyao) if danyao else None
     
     async def get_all_danyao(self) -> List[Dict]:
         """获取所有丹药信息"""
-        async with self.conn.execute(
-            "SELECT id, name, effect FROM danyao"
-        ) as cursor:
-            rows = await cursor.fetchall()
-            import json
-            result = []
-            for row in rows:
-                result.append({
-                    "id": row[0],
-                    "name": row[1],
-                    "effect": json.loads(row[2]) if row[2] else {}
-                })
-            return result
+        return [dict(danyao) for danyao in self.catalog.all_danyao()]
 
     async def get_sect_by_name(self, name: str) -> Optional[Dict]:
         """根据名称获取宗门信息"""
-        async with self.conn.execute(
-            "SELECT id, name, leader_id, level, experience, created_at FROM sects WHERE name = ?", (name,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                return {
-                    "id": row[0],
-                    "name": row[1],
-                    "leader_id": row[2],
-                    "level": row[3],
-                    "experience": row[4],
-                    "created_at": row[5]
-                }
-            return None
+        async with self._reader() as conn:
+            return await fetch_one(
+                conn,
+                "SELECT id, name, leader_id, level, experience, created_at FROM sects WHERE name = ?",
+                (name,)
+            )
 
     async def get_sect_by_id(self, sect_id: str) -> Optional[Dict]:
         """根据ID获取宗门信息"""
-        async with self.conn.execute(
-            "SELECT id, name, leader_id, level, experience, created_at FROM sects WHERE id = ?", (sect_id,)
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                return {
-                    "id": row[0],
-                    "name": row[1],
-                    "leader_id": row[2],
-                    "level": row[3],
-                    "experience": row[4],
-                    "created_at": row[5]
-                }
-            return None
+        async with self._reader() as conn:
+            return await fetch_one(
+                conn,
+                "SELECT id, name, leader_id, level, experience, created_at FROM sects WHERE id = ?",
+                (sect_id,)
+            )
 
     async def create_sect(self, name: str, leader_id: str) -> str:
         """创建宗门"""
         import uuid
         sect_id = str(uuid.uuid4())
         
-        await self.conn.execute("""
-        INSERT INTO sects (id, name, leader_id, level, experience)
-        VALUES (?, ?, ?, 1, 0)
-        """, (sect_id, name, leader_id))
+        async with self._write():
+            await self.conn.execute("""
+            INSERT INTO sects (id, name, leader_id, level, experience)
+            VALUES (?, ?, ?, 1, 0)
+            """, (sect_id, name, leader_id))
         
-        await self.conn.commit()
         return sect_id
 
     async def delete_sect(self, sect_id: str) -> bool:
         """删除宗门"""
         try:
-            await self.conn.execute("DELETE FROM sects WHERE id = ?", (sect_id,))
-            await self.conn.commit()
+            async with self._write():
+                await self.conn.execute("DELETE FROM sects WHERE id = ?", (sect_id,))
             return True
         except Exception as e:
             print(f"删除宗门失败: {e}")
+            if self._current_transaction():
+                raise
             return False
 
     async def get_sect_members(self, sect_id: str) -> List[Dict]:
         """获取宗门成员列表"""
-        async with self.conn.execute(
-            "SELECT user_id, name FROM players WHERE sect_id = ?", (sect_id,)
-        ) as cursor:
-            rows = await cursor.fetchall()
-            members = []
-            for row in rows:
-                members.append({
-                    "user_id": row[0],
-                    "name": row[1]
-                })
-            return members
\ No newline at end of file
+        await self.flush_players()
+        async with self._reader() as conn:
+            return await fetch_all(
+                conn, "SELECT user_id, name FROM players WHERE sect_id = ?", (sect_id,)
+            )
\ No newline at end of file
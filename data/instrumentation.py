@@ -0,0 +1,284 @@
+import functools
+import inspect
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from astrbot.api import logger
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """合并空白字符，使同一条语句的不同排版归为一类"""
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def redact_params(params: Any) -> Any:
+    """隐藏参数值，只保留类型和长度，避免日志中出现玩家数据"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: redact_params(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [_redact_value(value) for value in params]
+    return _redact_value(params)
+
+
+def _redact_value(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def _count_rows(result: Any) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, int):
+        # bool 按 0/1 计；整数视为影响的行数（如 flush_players）
+        return int(result)
+    if isinstance(result, (list, tuple, dict, set)):
+        return len(result)
+    return 1
+
+
+class LatencyStats:
+    """单个方法或SQL语句的调用统计，保留最近的样本用于计算分位数"""
+
+    def __init__(self, sample_size: int = 1024):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._samples: Deque[float] = deque(maxlen=sample_size)
+
+    def record(self, elapsed_ms: float, rows: int = 0, error: bool = False):
+        self.calls += 1
+        self.rows += rows
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if error:
+            self.errors += 1
+        self._samples.append(elapsed_ms)
+
+    def snapshot(self) -> Dict[str, float]:
+        samples = sorted(self._samples)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": round(_percentile(samples, 0.50), 3),
+            "p95_ms": round(_percentile(samples, 0.95), 3),
+            "p99_ms": round(_percentile(samples, 0.99), 3),
+            "max_ms": round(self.max_ms, 3)
+        }
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(q * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+
+class Instrumentation:
+    """DataBase 的查询统计：按方法和按SQL语句记录调用次数、行数和延迟
+
+    超过 slow_query_ms 的语句写入慢查询日志（参数已脱敏），
+    并保留最近 slow_log_size 条供后台查看。
+    """
+
+    def __init__(
+        self,
+        slow_query_ms: float = 100.0,
+        sample_size: int = 1024,
+        max_statements: int = 500,
+        slow_log_size: int = 100
+    ):
+        self.slow_query_ms = float(slow_query_ms)
+        self.sample_size = max(1, int(sample_size))
+        self.max_statements = max(1, int(max_statements))
+        self.methods: Dict[str, LatencyStats] = {}
+        self.statements: "OrderedDict[str, LatencyStats]" = OrderedDict()
+        self.slow_queries: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size)
+
+    @classmethod
+    def from_config(cls, db_config: Optional[Dict] = None) -> "Instrumentation":
+        """根据插件配置中的 DATABASE 配置段创建"""
+        db_config = db_config or {}
+        return cls(slow_query_ms=db_config.get("SLOW_QUERY_MS", 100))
+
+    def record_method(self, name: str, elapsed_ms: float, rows: int = 0, error: bool = False):
+        stats = self.methods.get(name)
+        if stats is None:
+            stats = self.methods[name] = LatencyStats(self.sample_size)
+        stats.record(elapsed_ms, rows, error)
+
+    def record_sql(self, sql: str, params: Any, elapsed_ms: float, rows: int = 0, error: bool = False):
+        key = normalize_sql(sql)
+        stats = self.statements.get(key)
+        if stats is None:
+            # 语句种类过多时淘汰最久未执行的一条
+            if len(self.statements) >= self.max_statements:
+                self.statements.popitem(last=False)
+            stats = self.statements[key] = LatencyStats(self.sample_size)
+        else:
+            self.statements.move_to_end(key)
+        stats.record(elapsed_ms, rows, error)
+
+        if elapsed_ms >= self.slow_query_ms:
+            entry = {
+                "sql": key,
+                "params": redact_params(params),
+                "elapsed_ms": round(elapsed_ms, 3),
+                "rows": rows,
+                "time": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            self.slow_queries.append(entry)
+            logger.warning(f"慢查询 {entry['elapsed_ms']}ms: {key} 参数: {entry['params']}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "slow_query_ms": self.slow_query_ms,
+            "methods": {name: stats.snapshot() for name, stats in sorted(self.methods.items())},
+            "statements": {sql: stats.snapshot() for sql, stats in self.statements.items()},
+            "slow_queries": list(self.slow_queries)
+        }
+
+    def reset(self):
+        self.methods.clear()
+        self.statements.clear()
+        self.slow_queries.clear()
+
+
+class _TracedCursor:
+    """包装游标，统计读取的行数"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.fetched = 0
+
+    async def fetchone(self):
+        row = await self._cursor.fetchone()
+        if row is not None:
+            self.fetched += 1
+        return row
+
+    async def fetchmany(self, size: Optional[int] = None):
+        rows = await (self._cursor.fetchmany() if size is None else self._cursor.fetchmany(size))
+        self.fetched += len(rows)
+        return rows
+
+    async def fetchall(self):
+        rows = await self._cursor.fetchall()
+        self.fetched += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _TracedExecute:
+    """conn.execute() 的返回值：既可以 await，也可以 async with
+
+    await 时统计语句执行时间；async with 时统计执行加读取结果的总时间。
+    """
+
+    def __init__(self, conn: "TracedConnection", method: str, sql: str, params: Any):
+        self._conn = conn
+        self._method = method
+        self._sql = sql
+        self._params = params
+        self._cursor: Optional[_TracedCursor] = None
+        self._start = 0.0
+
+    async def _execute(self):
+        raw = self._conn.raw
+        if self._params is None:
+            return await getattr(raw, self._method)(self._sql)
+        return await getattr(raw, self._method)(self._sql, self._params)
+
+    def __await__(self):
+        return self._run().__await__()
+
+    async def _run(self):
+        start = time.perf_counter()
+        try:
+            cursor = await self._execute()
+        except Exception:
+            self._conn.instrumentation.record_sql(
+                self._sql, self._params, (time.perf_counter() - start) * 1000, error=True
+            )
+            raise
+        self._conn.instrumentation.record_sql(
+            self._sql, self._params, (time.perf_counter() - start) * 1000, max(cursor.rowcount, 0)
+        )
+        return cursor
+
+    async def __aenter__(self):
+        self._start = time.perf_counter()
+        try:
+            self._cursor = _TracedCursor(await self._execute())
+        except Exception:
+            self._conn.instrumentation.record_sql(
+                self._sql, self._params, (time.perf_counter() - self._start) * 1000, error=True
+            )
+            raise
+        return self._cursor
+
+    async def __aexit__(self, exc_type, exc, tb):
+        cursor = self._cursor
+        await cursor.close()
+        rows = cursor.fetched if cursor.fetched else max(cursor.rowcount, 0)
+        self._conn.instrumentation.record_sql(
+            self._sql, self._params, (time.perf_counter() - self._start) * 1000, rows, exc_type is not None
+        )
+        return False
+
+
+class TracedConnection:
+    """aiosqlite 连接的代理：execute / executemany 经过统计，其余属性直接转发"""
+
+    def __init__(self, raw, instrumentation: Instrumentation):
+        self.raw = raw
+        self.instrumentation = instrumentation
+
+    def execute(self, sql: str, parameters: Optional[Sequence] = None) -> _TracedExecute:
+        return _TracedExecute(self, "execute", sql, parameters)
+
+    def executemany(self, sql: str, parameters) -> _TracedExecute:
+        return _TracedExecute(self, "executemany", sql, list(parameters))
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+def instrument_methods(cls):
+    """类装饰器：为所有公开的协程方法记录调用次数、返回行数和延迟
+
+    统计写入实例的 self.instrumentation。
+    """
+    for name, func in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(func):
+            continue
+        setattr(cls, name, _wrap_method(name, func))
+    return cls
+
+
+def _wrap_method(name: str, func):
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await func(self, *args, **kwargs)
+        except BaseException:
+            self.instrumentation.record_method(name, (time.perf_counter() - start) * 1000, error=True)
+            raise
+        self.instrumentation.record_method(name, (time.perf_counter() - start) * 1000, _count_rows(result))
+        return result
+    return wrapper
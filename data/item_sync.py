@@ -0,0 +1,193 @@
+# item_sync.py
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import aiosqlite
+
+# config_hashes 表中物品配置的作用域
+ITEMS_SCOPE = "items"
+
+# 同步写入的表: 表名 -> (主键列, 同步的列)
+# 只覆盖这些列，其余列（如强化等级、基础属性）保留数据库中的值
+SYNC_TABLES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "items": ("item_id", (
+        "item_id", "name", "description", "item_type", "category", "quality",
+        "effect", "price", "max_stack", "usage_requirements"
+    )),
+    "gongfas": ("id", (
+        "id", "name", "upgrade_exp", "attack_bonus", "hp_bonus", "defense_bonus",
+        "speed_bonus", "cultivation_speed_bonus"
+    )),
+    "danyao": ("id", ("id", "name", "effect")),
+}
+
+_CATEGORIES = {"consumable": "丹药", "equipment": "装备", "gongfa_book": "功法"}
+
+
+@dataclass
+class SyncReport:
+    """一次物品配置同步的结果"""
+    added: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    ms: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+    def summary(self) -> str:
+        return (f"新增 {len(self.added)}，更新 {len(self.updated)}，删除 {len(self.removed)}，"
+                f"未变 {self.unchanged}，耗时 {self.ms:.1f}ms")
+
+    def to_dict(self) -> Dict:
+        return {
+            "added": len(self.added),
+            "updated": len(self.updated),
+            "removed": len(self.removed),
+            "unchanged": self.unchanged,
+            "ms": round(self.ms, 2)
+        }
+
+
+def build_rows(item_id: str, item_data: Mapping, realm_table) -> Dict[str, tuple]:
+    """一个物品配置对应的各表记录: 表名 -> 按 SYNC_TABLES 列顺序的值"""
+    item_type = item_data.get("type", "consumable")
+
+    if item_type == "gongfa":
+        # 功法只写入gongfas表，升级经验由所需境界计算
+        return {"gongfas": (
+            item_id,
+            item_data.get("name", ""),
+            realm_table.upgrade_exp(item_data.get("required_realm", "练气一层")),
+            item_data.get("attack_bonus", 0),
+            item_data.get("hp_bonus", 0),
+            item_data.get("defense_bonus", 0),
+            item_data.get("speed_bonus", 0),
+            item_data.get("cultivation_speed_bonus", 0.0)
+        )}
+
+    if item_type == "gongfa_book":
+        # 功法秘籍没有效果，使用条件为所需境界
+        category = "功法"
+        effect = str({})
+        usage_requirements = json.dumps({"required_realm": item_data.get("required_realm", 0)})
+    else:
+        category = _CATEGORIES.get(item_type) or item_data.get("category") or "其他"
+        # consumable的效果存储在danyao表中，items表中effect字段为空
+        effect = "" if item_type == "consumable" else str(item_data.get("effects", {}))
+        usage_requirements = json.dumps(item_data.get("usage_requirements", {}))
+
+    rows = {"items": (
+        item_id,
+        item_data.get("name", ""),
+        item_data.get("description", ""),
+        item_type,
+        category,
+        item_data.get("quality", "common"),
+        effect,
+        item_data.get("price", 0),
+        item_data.get("max_stack", 99),
+        usage_requirements
+    )}
+    if item_type == "consumable":
+        rows["danyao"] = (item_id, item_data.get("name", ""), json.dumps(item_data.get("effects", {})))
+    return rows
+
+
+def rows_hash(rows: Dict[str, tuple]) -> str:
+    """各表记录的内容指纹（与配置中键的顺序、未同步的字段无关）"""
+    payload = json.dumps(rows, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+async def create_config_hashes_table(conn: aiosqlite.Connection):
+    """已同步配置记录的内容指纹"""
+    await conn.execute("""
+    CREATE TABLE IF NOT EXISTS config_hashes (
+        scope TEXT NOT NULL,
+        key TEXT NOT NULL,
+        hash TEXT NOT NULL,
+        PRIMARY KEY (scope, key)
+    ) WITHOUT ROWID
+    """)
+
+
+def _upsert_sql(table: str) -> str:
+    key, columns = SYNC_TABLES[table]
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != key)
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT({key}) DO UPDATE SET {updates}")
+
+
+_UPSERT_SQL = {table: _upsert_sql(table) for table in SYNC_TABLES}
+_DELETE_SQL = {table: f"DELETE FROM {table} WHERE {key} = ?" for table, (key, _) in SYNC_TABLES.items()}
+
+
+async def sync_items(
+    conn: aiosqlite.Connection,
+    items_config: Mapping[str, Mapping],
+    realm_table,
+    report: Optional[SyncReport] = None
+) -> SyncReport:
+    """按内容指纹比较 items.json 与上次同步的结果，只写入新增、修改和删除的物品
+
+    在调用方的事务中执行，每张表的写入各一次 executemany。
+    删除只针对此前由同步写入的物品，管理后台或迁移单独添加的记录不受影响。
+    """
+    report = report or SyncReport()
+    async with conn.execute("SELECT key, hash FROM config_hashes WHERE scope = ?", (ITEMS_SCOPE,)) as cursor:
+        stored = {key: value for key, value in await cursor.fetchall()}
+
+    upserts: Dict[str, List[tuple]] = {table: [] for table in SYNC_TABLES}
+    deletes: Dict[str, List[tuple]] = {table: [] for table in SYNC_TABLES}
+    new_hashes: List[tuple] = []
+
+    for item_id, item_data in items_config.items():
+        rows = build_rows(item_id, item_data, realm_table)
+        digest = rows_hash(rows)
+        old = stored.get(item_id)
+        if old == digest:
+            report.unchanged += 1
+            continue
+        if old is None:
+            report.added.append(item_id)
+        else:
+            report.updated.append(item_id)
+            # 类型变化后不再对应的表中的旧记录
+            for table in SYNC_TABLES:
+                if table not in rows:
+                    deletes[table].append((item_id,))
+        for table, row in rows.items():
+            upserts[table].append(row)
+        new_hashes.append((ITEMS_SCOPE, item_id, digest))
+
+    for item_id in stored.keys() - items_config.keys():
+        report.removed.append(item_id)
+        for table in SYNC_TABLES:
+            deletes[table].append((item_id,))
+    report.removed.sort()
+
+    if not report.changed:
+        return report
+
+    for table, params in deletes.items():
+        if params:
+            await conn.executemany(_DELETE_SQL[table], params)
+    for table, params in upserts.items():
+        if params:
+            await conn.executemany(_UPSERT_SQL[table], params)
+    if new_hashes:
+        await conn.executemany(
+            "INSERT OR REPLACE INTO config_hashes (scope, key, hash) VALUES (?, ?, ?)", new_hashes
+        )
+    if report.removed:
+        await conn.executemany(
+            "DELETE FROM config_hashes WHERE scope = ? AND key = ?",
+            [(ITEMS_SCOPE, item_id) for item_id in report.removed]
+        )
+    return report
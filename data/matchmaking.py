@@ -0,0 +1,85 @@
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class LevelIndex:
+    """按境界分桶的玩家索引，用于竞技场随机匹配对手
+
+    每个境界一个 user_id 列表，另记录每个玩家所在的 (境界, 下标)，
+    增删都是 O(1)（删除时与桶尾元素交换后弹出）。
+    随机选取时按桶大小定位，只与境界数量有关，与玩家总数无关。
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        self._buckets: Dict[int, List[str]] = {}
+        self._positions: Dict[str, Tuple[int, int]] = {}
+        self._rng = rng or random.Random()
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._positions
+
+    def rebuild(self, entries: Iterable[Tuple[str, int]]):
+        """用 (user_id, level_index) 全量重建索引"""
+        self._buckets.clear()
+        self._positions.clear()
+        for user_id, level_index in entries:
+            self.update(user_id, level_index)
+        self.ready = True
+
+    def update(self, user_id: str, level_index: int):
+        """新增玩家或更新玩家境界"""
+        position = self._positions.get(user_id)
+        if position is not None:
+            if position[0] == level_index:
+                return
+            self.remove(user_id)
+        bucket = self._buckets.setdefault(level_index, [])
+        self._positions[user_id] = (level_index, len(bucket))
+        bucket.append(user_id)
+
+    def remove(self, user_id: str):
+        position = self._positions.pop(user_id, None)
+        if position is None:
+            return
+        level_index, index = position
+        bucket = self._buckets[level_index]
+        last = bucket.pop()
+        if index < len(bucket):
+            bucket[index] = last
+            self._positions[last] = (level_index, index)
+        if not bucket:
+            del self._buckets[level_index]
+
+    def count(self, min_level: int, max_level: int) -> int:
+        return sum(len(bucket) for level, bucket in self._buckets.items() if min_level <= level <= max_level)
+
+    def pick(self, min_level: int, max_level: int, exclude: Optional[str] = None) -> Optional[str]:
+        """在 [min_level, max_level] 境界范围内等概率随机选取一名玩家（排除 exclude）"""
+        buckets = [bucket for level, bucket in self._buckets.items() if min_level <= level <= max_level]
+        total = sum(len(bucket) for bucket in buckets)
+        excluded = exclude is not None and exclude in self._positions \
+            and min_level <= self._positions[exclude][0] <= max_level
+        candidates = total - 1 if excluded else total
+        if candidates <= 0:
+            return None
+
+        # 选中被排除的玩家时改用范围内最后一名玩家，保持等概率
+        user_id = self._at(buckets, self._rng.randrange(candidates))
+        if excluded and user_id == exclude:
+            user_id = self._at(buckets, total - 1)
+        return user_id
+
+    @staticmethod
+    def _at(buckets: List[List[str]], offset: int) -> str:
+        for bucket in buckets:
+            if offset < len(bucket):
+                return bucket[offset]
+            offset -= len(bucket)
+        raise IndexError(offset)
+
+    def stats(self) -> Dict[str, int]:
+        return {"players": len(self._positions), "levels": len(self._buckets), "ready": self.ready}
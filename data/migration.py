@@ -5,8 +5,9 @@ import json
 from typing import Dict, Callable, Awaitable
 from astrbot.api import logger
 from ..core.config_manager import ConfigManager
+from .item_sync import create_config_hashes_table
 
-LATEST_DB_VERSION = 9  # 最新版本号
+LATEST_DB_VERSION = 15  # 最新版本号
 
 MIGRATION_TASKS: Dict[int, Callable[[aiosqlite.Connection, ConfigManager], Awaitable[None]]] = {}
 
@@ -18,46 +19,6 @@ def migration(version: int):
         return func
     return decorator
 
-def _calculate_upgrade_exp_by_realm(realm_name: str) -> int:
-    """根据境界名称计算升级经验"""
-    # 境界名称与经验值的映射
-    realm_exp_map = {
-        "练气一层": 0,
-        "练气二层": 50,
-        "练气三层": 100,
-        "练气四层": 200,
-        "练气五层": 350,
-        "练气六层": 500,
-        "练气七层": 700,
-        "练气八层": 1000,
-        "练气九层": 1400,
-        "练气十层": 2000,
-        "筑基初期": 3000,
-        "筑基中期": 4500,
-        "筑基后期": 6500,
-        "金丹初期": 9000,
-        "金丹中期": 12000,
-        "金丹后期": 16000,
-        "元婴初期": 21000,
-        "元婴中期": 27000,
-        "元婴后期": 35000,
-        "化神初期": 45000,
-        "化神中期": 57000,
-        "化神后期": 72000,
-        "炼虚初期": 90000,
-        "炼虚中期": 110000,
-        "炼虚后期": 135000,
-        "合体初期": 165000,
-        "合体中期": 200000,
-        "合体后期": 240000,
-        "大乘初期": 285000,
-        "大乘中期": 335000,
-        "大乘后期": 400000
-    }
-    
-    # 如果找不到对应的境界，默认使用练气一层
-    return realm_exp_map.get(realm_name, 0)
-
 
 class MigrationManager:
     """数据库迁移管理器"""
@@ -76,6 +37,13 @@ class MigrationManager:
                 await self.conn.execute("BEGIN")
                 # 使用最新的建表函数
                 await _create_all_tables_v1(self.conn)
+                await _create_gongfas_table(self.conn)
+                await _create_danyao_table(self.conn)
+                await _create_equipments_table(self.conn)
+                await _create_sects_table(self.conn)
+                await _create_world_boss_tables(self.conn)
+                await create_config_hashes_table(self.conn)
+                await _create_indexes(self.conn)
                 await self.conn.execute("INSERT INTO db_info (version) VALUES (?)", (LATEST_DB_VERSION,))
                 await self.conn.commit()
                 logger.info(f"数据库已初始化到最新版本: v{LATEST_DB_VERSION}")
@@ -111,6 +79,139 @@ class MigrationManager:
             logger.info("数据库结构已是最新。")
 
 
+# 热点查询使用的二级索引: (索引名, 表名, 列)
+SECONDARY_INDEXES = [
+    # 宗门成员列表和成员数量统计（覆盖 user_id, name）
+    ("idx_players_sect", "players", "sect_id, user_id, name"),
+    # 竞技场按境界筛选对手
+    ("idx_players_level", "players", "level_index, user_id"),
+    # 按名称查找丹药
+    ("idx_danyao_name", "danyao", "name"),
+    # 按攻击者和时间查询战斗日志
+    ("idx_combat_logs_attacker", "combat_logs", "attacker_id, timestamp"),
+    # 按名称查找宗门
+    ("idx_sects_name", "sects", "name"),
+    # 战力排行
+    ("idx_players_power", "players", "combat_power DESC"),
+    # 查找未击败的世界Boss
+    ("idx_world_bosses_status", "world_bosses", "status, spawn_time"),
+    # 重启时恢复世界Boss的刷新间隔
+    ("idx_world_bosses_defeat", "world_bosses", "defeat_time"),
+]
+
+
+async def _create_indexes(conn: aiosqlite.Connection):
+    """创建二级索引，跳过尚不存在的表或列（由之后版本的迁移补建）"""
+    async with conn.execute("SELECT name FROM sqlite_master WHERE type='table'") as cursor:
+        tables = {row[0] for row in await cursor.fetchall()}
+    table_columns: Dict[str, set] = {}
+    for index_name, table, columns in SECONDARY_INDEXES:
+        if table not in tables:
+            continue
+        if table not in table_columns:
+            async with conn.execute(f"PRAGMA table_info({table})") as cursor:
+                table_columns[table] = {row[1] for row in await cursor.fetchall()}
+        if all(column.split()[0] in table_columns[table] for column in columns.split(",")):
+            await conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})")
+
+
+async def _create_world_boss_tables(conn: aiosqlite.Connection):
+    """创建世界Boss实例表、伤害统计表和奖励表"""
+    await conn.execute("""
+    CREATE TABLE IF NOT EXISTS world_bosses (
+        instance_id TEXT PRIMARY KEY,
+        boss_id TEXT NOT NULL,
+        max_hp INTEGER NOT NULL,
+        hp INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'active',
+        spawn_time TEXT NOT NULL,
+        defeat_time TEXT
+    )
+    """)
+    await conn.execute("""
+    CREATE TABLE IF NOT EXISTS world_boss_damage (
+        instance_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        damage INTEGER NOT NULL DEFAULT 0,
+        hits INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (instance_id, user_id)
+    )
+    """)
+    # 结算开始时写入每名玩家的奖励，发放后标记 paid，重启后继续发放未完成的部分
+    await conn.execute("""
+    CREATE TABLE IF NOT EXISTS world_boss_rewards (
+        instance_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        spirit_stone INTEGER NOT NULL DEFAULT 0,
+        drops TEXT NOT NULL DEFAULT '[]',
+        paid INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (instance_id, user_id)
+    ) WITHOUT ROWID
+    """)
+
+
+async def _create_gongfas_table(conn: aiosqlite.Connection):
+    """创建功法表"""
+    await conn.execute("""
+    CREATE TABLE IF NOT EXISTS gongfas (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        upgrade_exp INTEGER NOT NULL DEFAULT 0,
+        attack_bonus INTEGER NOT NULL DEFAULT 0,
+        hp_bonus INTEGER NOT NULL DEFAULT 0,
+        defense_bonus INTEGER NOT NULL DEFAULT 0,
+        speed_bonus INTEGER NOT NULL DEFAULT 0,
+        cultivation_speed_bonus REAL NOT NULL DEFAULT 0.0
+    )
+    """)
+
+
+async def _create_danyao_table(conn: aiosqlite.Connection):
+    """创建丹药表"""
+    await conn.execute("""
+    CREATE TABLE IF NOT EXISTS danyao (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        effect TEXT NOT NULL
+    )
+    """)
+
+
+async def _create_equipments_table(conn: aiosqlite.Connection):
+    """创建装备表"""
+    await conn.execute("""
+    CREATE TABLE IF NOT EXISTS equipments (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT NOT NULL,
+        slot TEXT NOT NULL,
+        base_attack INTEGER NOT NULL DEFAULT 0,
+        base_defense INTEGER NOT NULL DEFAULT 0,
+        base_speed INTEGER NOT NULL DEFAULT 0,
+        base_hp INTEGER NOT NULL DEFAULT 0,
+        base_spirit INTEGER NOT NULL DEFAULT 0,
+        upgrade_level INTEGER NOT NULL DEFAULT 0,
+        quality TEXT NOT NULL,
+        price INTEGER NOT NULL,
+        required_realm INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
+
+async def _create_sects_table(conn: aiosqlite.Connection):
+    """创建宗门表"""
+    await conn.execute("""
+    CREATE TABLE IF NOT EXISTS sects (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        leader_id TEXT,
+        level INTEGER NOT NULL DEFAULT 1,
+        experience INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
 async def _create_all_tables_v1(conn: aiosqlite.Connection):
     """创建所有表结构（版本1）"""
     # 创建数据库版本表
@@ -136,7 +237,8 @@ async def _create_all_tables_v1(conn: aiosqlite.Connection):
             sect_id TEXT,
             sect_position TEXT NOT NULL,
             gongfa_ids TEXT NOT NULL,
-            equipment_ids TEXT NOT NULL
+            equipment_ids TEXT NOT NULL,
+            combat_power INTEGER NOT NULL DEFAULT 0
         )
     """)
     
@@ -160,7 +262,8 @@ async def _create_all_tables_v1(conn: aiosqlite.Connection):
             damage INTEGER NOT NULL,
             spirit_stone_gained INTEGER NOT NULL,
             timestamp TEXT NOT NULL,
-            drop_items TEXT NOT NULL
+            drop_items TEXT NOT NULL,
+            replay BLOB
         )
     """)
     
@@ -185,35 +288,7 @@ async def _create_all_tables_v1(conn: aiosqlite.Connection):
         base_spirit INTEGER NOT NULL DEFAULT 0
     )
     """)
-    
-    # 插入初始物品数据
-    items_config = config_manager.items if hasattr(config_manager, 'items') else {}
-    for item_id, item_data in items_config.items():
-        # 根据物品类型确定分类
-        category = "丹药" if item_data.get("type") == "consumable" else ""
-        if item_data.get("type") == "equipment":
-            category = "装备"
-        elif item_data.get("type") == "gongfa":
-            category = "功法"
-        elif item_data.get("type") == "consumable":
-            category = "丹药"
-        
-        await conn.execute("""
-        INSERT OR REPLACE INTO items 
-        (item_id, name, description, item_type, category, quality, effect, price, max_stack, usage_requirements) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            item_id,
-            item_data.get("name", ""),
-            item_data.get("description", ""),
-            item_data.get("type", "consumable"),
-            category,
-            item_data.get("quality", "common"),
-            str(item_data.get("effects", {})),
-            item_data.get("price", 0),
-            item_data.get("max_stack", 99),
-            "[]"
-        ))
+    # 物品数据由 DataBase.init 中的物品配置同步写入
 
 
 @migration(2)
@@ -229,18 +304,7 @@ async def _upgrade_v2_to_v3(conn: aiosqlite.Connection, config_manager: ConfigMa
     logger.info("开始执行 v2 -> v3 数据库迁移...")
     
     # 首先创建gongfas表（如果不存在）
-    await conn.execute("""
-    CREATE TABLE IF NOT EXISTS gongfas (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        upgrade_exp INTEGER NOT NULL DEFAULT 0,
-        attack_bonus INTEGER NOT NULL DEFAULT 0,
-        hp_bonus INTEGER NOT NULL DEFAULT 0,
-        defense_bonus INTEGER NOT NULL DEFAULT 0,
-        speed_bonus INTEGER NOT NULL DEFAULT 0,
-        cultivation_speed_bonus REAL NOT NULL DEFAULT 0.0
-    )
-    """)
+    await _create_gongfas_table(conn)
     
     # 将players表中的gongfa_id列改为gongfa_ids，支持存储多个功法
     # 由于SQLite不直接支持修改列名，我们需要创建新表并迁移数据
@@ -279,23 +343,7 @@ async def _upgrade_v3_to_v4(conn: aiosqlite.Connection, config_manager: ConfigMa
     logger.info("开始执行 v3 -> v4 数据库迁移...")
     
     # 创建装备表
-    await conn.execute("""
-    CREATE TABLE IF NOT EXISTS equipments (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        description TEXT NOT NULL,
-        slot TEXT NOT NULL,
-        base_attack INTEGER NOT NULL DEFAULT 0,
-        base_defense INTEGER NOT NULL DEFAULT 0,
-        base_speed INTEGER NOT NULL DEFAULT 0,
-        base_hp INTEGER NOT NULL DEFAULT 0,
-        base_spirit INTEGER NOT NULL DEFAULT 0,
-        upgrade_level INTEGER NOT NULL DEFAULT 0,
-        quality TEXT NOT NULL,
-        price INTEGER NOT NULL,
-        required_realm INTEGER NOT NULL DEFAULT 0
-    )
-    """)
+    await _create_equipments_table(conn)
     
     # 添加初始装备数据
     await conn.execute("""
@@ -334,24 +382,11 @@ async def _upgrade_v4_to_v5(conn: aiosqlite.Connection, config_manager: ConfigMa
     
     # 更新现有物品的分类
     items_config = config_manager.items if hasattr(config_manager, 'items') else {}
-    for item_id, item_data in items_config.items():
-        # 根据物品类型确定分类
-        category = "丹药" if item_data.get("type") == "consumable" else ""
-        if item_data.get("type") == "equipment":
-            category = "装备"
-        elif item_data.get("type") == "gongfa":
-            category = "功法"
-        elif item_data.get("type") == "consumable":
-            category = "丹药"
-        
-        await conn.execute("""
-        UPDATE items 
-        SET category = ? 
-        WHERE item_id = ?
-        """, (
-            category,
-            item_id
-        ))
+    categories = {"consumable": "丹药", "equipment": "装备", "gongfa": "功法"}
+    await conn.executemany(
+        "UPDATE items SET category = ? WHERE item_id = ?",
+        [(categories.get(item_data.get("type"), ""), item_id) for item_id, item_data in items_config.items()]
+    )
     
     logger.info("v4 -> v5 数据库迁移完成！")
 
@@ -360,31 +395,26 @@ async def _upgrade_v4_to_v5(conn: aiosqlite.Connection, config_manager: ConfigMa
 async def _upgrade_v5_to_v6(conn: aiosqlite.Connection, config_manager: ConfigManager):
     logger.info("开始执行 v5 -> v6 数据库迁移...")
     
-    # 从items配置中添加功法到gongfas表
+    # 从items配置中添加功法到gongfas表（已存在的功法保持不变）
     items_config = config_manager.items if hasattr(config_manager, 'items') else {}
-    for item_id, item_data in items_config.items():
-        # 只处理功法类型的物品
-        if item_data.get("type") == "gongfa":
-            # 检查功法是否已存在于gongfas表中
-            cursor = await conn.execute("SELECT id FROM gongfas WHERE id = ?", (item_id,))
-            existing = await cursor.fetchone()
-            
-            if not existing:
-                # 如果不存在，则插入新的功法
-                await conn.execute("""
-                INSERT INTO gongfas 
-                (id, name, upgrade_exp, attack_bonus, hp_bonus, defense_bonus, speed_bonus, cultivation_speed_bonus)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    item_id,
-                    item_data.get("name", ""),
-                    self._calculate_upgrade_exp_by_realm(item_data.get("required_realm", "练气一层")),  # 用required_realm计算升级经验
-                    item_data.get("attack_bonus", 0),
-                    item_data.get("hp_bonus", 0),
-                    item_data.get("defense_bonus", 0),
-                    item_data.get("speed_bonus", 0),
-                    item_data.get("cultivation_speed_bonus", 0.0)
-                ))
+    await conn.executemany("""
+    INSERT OR IGNORE INTO gongfas 
+    (id, name, upgrade_exp, attack_bonus, hp_bonus, defense_bonus, speed_bonus, cultivation_speed_bonus)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (
+            item_id,
+            item_data.get("name", ""),
+            config_manager.realm_table.upgrade_exp(item_data.get("required_realm", "练气一层")),  # 用required_realm计算升级经验
+            item_data.get("attack_bonus", 0),
+            item_data.get("hp_bonus", 0),
+            item_data.get("defense_bonus", 0),
+            item_data.get("speed_bonus", 0),
+            item_data.get("cultivation_speed_bonus", 0.0)
+        )
+        for item_id, item_data in items_config.items()
+        if item_data.get("type") == "gongfa"
+    ])
     
     logger.info("v5 -> v6 数据库迁移完成！")
 
@@ -394,36 +424,19 @@ async def _upgrade_v6_to_v7(conn: aiosqlite.Connection, config_manager: ConfigMa
     logger.info("开始执行 v6 -> v7 数据库迁移...")
     
     # 创建丹药表
-    await conn.execute("""
-    CREATE TABLE IF NOT EXISTS danyao (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        effect TEXT NOT NULL
-    )
-    """)
+    await _create_danyao_table(conn)
     
-    # 从items配置中迁移丹药数据到danyao表
+    # 从items配置中迁移丹药数据到danyao表（已存在的丹药保持不变）
     items_config = config_manager.items if hasattr(config_manager, 'items') else {}
-    for item_id, item_data in items_config.items():
-        # 只处理丹药类型的物品
-        if item_data.get("type") == "consumable":
-            # 检查丹药是否已存在于danyao表中
-            cursor = await conn.execute("SELECT id FROM danyao WHERE id = ?", (item_id,))
-            existing = await cursor.fetchone()
-            
-            if not existing:
-                # 如果不存在，则插入新的丹药
-                import json
-                effects = item_data.get("effects", {})
-                await conn.execute("""
-                INSERT INTO danyao 
-                (id, name, effect)
-                VALUES (?, ?, ?)
-                """, (
-                    item_id,
-                    item_data.get("name", ""),
-                    json.dumps(effects)  # 将效果存储为JSON字符串
-                ))
+    await conn.executemany("""
+    INSERT OR IGNORE INTO danyao 
+    (id, name, effect)
+    VALUES (?, ?, ?)
+    """, [
+        (item_id, item_data.get("name", ""), json.dumps(item_data.get("effects", {})))  # 将效果存储为JSON字符串
+        for item_id, item_data in items_config.items()
+        if item_data.get("type") == "consumable"
+    ])
     
     logger.info("v6 -> v7 数据库迁移完成！")
 
@@ -460,16 +473,7 @@ async def _upgrade_v8_to_v9(conn: aiosqlite.Connection, config_manager: ConfigMa
     logger.info("开始执行 v8 -> v9 数据库迁移...")
     
     # 创建宗门表
-    await conn.execute("""
-    CREATE TABLE IF NOT EXISTS sects (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        leader_id TEXT,
-        level INTEGER NOT NULL DEFAULT 1,
-        experience INTEGER NOT NULL DEFAULT 0,
-        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
+    await _create_sects_table(conn)
     
     # 从配置文件迁移宗门数据
     sects_config = config_manager.sects if hasattr(config_manager, 'sects') else {}
@@ -491,4 +495,67 @@ async def _upgrade_v8_to_v9(conn: aiosqlite.Connection, config_manager: ConfigMa
                 1  # 默认等级为1
             ))
     
-    logger.info("v8 -> v9 数据库迁移完成！")
\ No newline at end of file
+    logger.info("v8 -> v9 数据库迁移完成！")
+
+
+@migration(10)
+async def _upgrade_v9_to_v10(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    logger.info("开始执行 v9 -> v10 数据库迁移...")
+    
+    # 为热点查询路径添加二级索引
+    await _create_indexes(conn)
+    
+    logger.info("v9 -> v10 数据库迁移完成！")
+
+
+@migration(11)
+async def _upgrade_v10_to_v11(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    logger.info("开始执行 v10 -> v11 数据库迁移...")
+    
+    # 添加预计算的战力列（由DataBase在启动时补算已有玩家）
+    await conn.execute("ALTER TABLE players ADD COLUMN combat_power INTEGER NOT NULL DEFAULT 0")
+    await _create_indexes(conn)
+    
+    logger.info("v10 -> v11 数据库迁移完成！")
+
+
+@migration(12)
+async def _upgrade_v11_to_v12(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    logger.info("开始执行 v11 -> v12 数据库迁移...")
+    
+    # 世界Boss实例和伤害统计
+    await _create_world_boss_tables(conn)
+    await _create_indexes(conn)
+    
+    logger.info("v11 -> v12 数据库迁移完成！")
+
+
+@migration(13)
+async def _upgrade_v12_to_v13(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    logger.info("开始执行 v12 -> v13 数据库迁移...")
+    
+    # 战斗回放记录（随机种子和双方属性快照，约41字节）
+    await conn.execute("ALTER TABLE combat_logs ADD COLUMN replay BLOB")
+    
+    logger.info("v12 -> v13 数据库迁移完成！")
+
+
+@migration(14)
+async def _upgrade_v13_to_v14(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    logger.info("开始执行 v13 -> v14 数据库迁移...")
+    
+    # 物品配置同步的内容指纹（首次启动时全部视为新增并写入一次）
+    await create_config_hashes_table(conn)
+    
+    logger.info("v13 -> v14 数据库迁移完成！")
+
+
+@migration(15)
+async def _upgrade_v14_to_v15(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    logger.info("开始执行 v14 -> v15 数据库迁移...")
+    
+    # 世界Boss奖励表（结算状态持久化，重启后继续发放）和击败时间索引
+    await _create_world_boss_tables(conn)
+    await _create_indexes(conn)
+    
+    logger.info("v14 -> v15 数据库迁移完成！")
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from ..models import Player
+
+
+class PlayerCache:
+    """玩家状态写回缓存（write-behind）
+
+    热点玩家直接从内存读取；update_player 只标记脏数据，
+    由 DataBase 按时间间隔或脏数据数量批量写回数据库。
+    """
+
+    def __init__(self, max_size: int = 10000, flush_interval: float = 5.0, flush_size: int = 100):
+        self.max_size = max(1, int(max_size))
+        self.flush_interval = max(0.1, float(flush_interval))
+        self.flush_size = max(1, int(flush_size))
+        self._players: "OrderedDict[str, Player]" = OrderedDict()
+        self._dirty: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._players
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    @property
+    def needs_flush(self) -> bool:
+        """脏数据达到批量大小，或脏数据无法淘汰导致超出容量时需要写回"""
+        return len(self._dirty) >= self.flush_size or len(self._players) > self.max_size
+
+    def get(self, user_id: str) -> Optional[Player]:
+        """读取缓存中的玩家（返回副本，调用方修改后需 put 回来）"""
+        player = self._players.get(user_id)
+        if player is None:
+            return None
+        self._players.move_to_end(user_id)
+        return player.clone()
+
+    def put(self, player: Player, dirty: bool = False):
+        """写入缓存，dirty=True 表示尚未写回数据库
+
+        dirty=False 表示与数据库一致（如事务刚提交的数据），同时清除该玩家的脏标记，
+        避免之后把旧的脏数据再写回去。
+        """
+        self._players[player.user_id] = player.clone()
+        self._players.move_to_end(player.user_id)
+        if dirty:
+            self._dirty.add(player.user_id)
+        else:
+            self._dirty.discard(player.user_id)
+        self._evict()
+
+    def load(self, player: Player) -> Player:
+        """写入从数据库读取的玩家；已有缓存项时以缓存为准（可能含未写回的修改）"""
+        if player.user_id not in self._players:
+            self.put(player)
+        return self.get(player.user_id) or player
+
+    def adjust(self, user_id: str, **deltas: int) -> Optional[Player]:
+        """在缓存项上增减数值字段并标记为脏数据
+
+        任一字段结果为负时不做修改并返回None，成功时返回修改后的副本。
+        整个过程不涉及await，在事件循环内是原子的。
+        """
+        player = self._players.get(user_id)
+        if player is None:
+            return None
+        values = {field: getattr(player, field) + delta for field, delta in deltas.items()}
+        if any(value < 0 for value in values.values()):
+            return None
+        for field, value in values.items():
+            setattr(player, field, value)
+        self._players.move_to_end(user_id)
+        self._dirty.add(user_id)
+        return player.clone()
+
+    def discard(self, user_id: str):
+        """丢弃缓存项（包括脏数据）"""
+        self._players.pop(user_id, None)
+        self._dirty.discard(user_id)
+
+    def take_dirty(self) -> List[Player]:
+        """取出所有脏数据并清除脏标记（调用方须已持有写锁，取出后直接写入）"""
+        players = [self._players[user_id].clone() for user_id in self._dirty if user_id in self._players]
+        self._dirty.clear()
+        return players
+
+    def mark_dirty(self, user_ids: List[str]):
+        """写回失败时重新标记为脏数据"""
+        for user_id in user_ids:
+            if user_id in self._players:
+                self._dirty.add(user_id)
+
+    def trim(self):
+        """写回成功后淘汰超出容量的缓存项"""
+        self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._players), "dirty": len(self._dirty)}
+
+    def _evict(self):
+        """超出容量时按LRU淘汰干净的缓存项，脏数据必须先写回"""
+        if len(self._players) <= self.max_size:
+            return
+        for user_id in list(self._players.keys()):
+            if len(self._players) <= self.max_size:
+                break
+            if user_id not in self._dirty:
+                del self._players[user_id]
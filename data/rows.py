@@ -0,0 +1,116 @@
+import json
+from dataclasses import fields
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import aiosqlite
+
+from ..models import Player, Item, InventoryItem, CombatLog
+
+
+@lru_cache(maxsize=4096)
+def _parse_json(value: str) -> Any:
+    return json.loads(value)
+
+
+def _json_list(value) -> List:
+    """解析JSON数组；相同的原始字符串只解析一次，返回独立的副本"""
+    if not value:
+        return []
+    try:
+        parsed = _parse_json(value)
+    except (TypeError, ValueError):
+        return []
+    return list(parsed) if isinstance(parsed, list) else []
+
+
+def _json_dict(value) -> Dict:
+    """解析JSON对象；相同的原始字符串只解析一次，返回独立的副本"""
+    if not value:
+        return {}
+    try:
+        parsed = _parse_json(value)
+    except (TypeError, ValueError):
+        return {}
+    return dict(parsed) if isinstance(parsed, dict) else {}
+
+
+class RowCodec:
+    """按列名把查询结果解码为模型对象
+
+    compile() 根据 cursor.description 计算一次 列名 -> 字段 的对应关系，
+    之后每行只做按下标取值，不依赖表中列的物理顺序。
+    """
+
+    def __init__(
+        self,
+        factory: Callable[..., Any],
+        json_fields: Optional[Dict[str, Callable[[Any], Any]]] = None,
+        rename: Optional[Dict[str, str]] = None
+    ):
+        self.factory = factory
+        self.field_names = {f.name for f in fields(factory)}
+        self.json_fields = json_fields or {}
+        self.rename = rename or {}
+
+    def compile(self, description: Sequence[Tuple]) -> Callable[[Sequence], Any]:
+        plain: List[Tuple[str, int]] = []
+        decoded: List[Tuple[str, int, Callable[[Any], Any]]] = []
+        for index, column in enumerate(description):
+            name = self.rename.get(column[0], column[0])
+            if name not in self.field_names:
+                continue
+            if name in self.json_fields:
+                decoded.append((name, index, self.json_fields[name]))
+            else:
+                plain.append((name, index))
+
+        factory = self.factory
+
+        def decode(row: Sequence) -> Any:
+            kwargs = {name: row[index] for name, index in plain}
+            for name, index, parse in decoded:
+                kwargs[name] = parse(row[index])
+            return factory(**kwargs)
+
+        return decode
+
+
+PLAYER_CODEC = RowCodec(Player, json_fields={"gongfa_ids": _json_list, "equipment_ids": _json_dict})
+ITEM_CODEC = RowCodec(Item, json_fields={"effects": _json_dict}, rename={"item_type": "type", "effect": "effects"})
+INVENTORY_CODEC = RowCodec(InventoryItem)
+COMBAT_LOG_CODEC = RowCodec(CombatLog, json_fields={"drop_items": _json_list})
+
+
+def _compile(description: Sequence[Tuple], codec: Optional[RowCodec]) -> Callable[[Sequence], Any]:
+    if codec is not None:
+        return codec.compile(description)
+    columns = [column[0] for column in description]
+    return lambda row: dict(zip(columns, row))
+
+
+async def fetch_all(
+    conn: aiosqlite.Connection,
+    sql: str,
+    params: Sequence = (),
+    codec: Optional[RowCodec] = None
+) -> List:
+    """执行查询并解码所有行；未指定codec时按列名返回字典"""
+    async with conn.execute(sql, params) as cursor:
+        rows = await cursor.fetchall()
+        decode = _compile(cursor.description, codec)
+    return [decode(row) for row in rows]
+
+
+async def fetch_one(
+    conn: aiosqlite.Connection,
+    sql: str,
+    params: Sequence = (),
+    codec: Optional[RowCodec] = None
+) -> Optional[Any]:
+    """执行查询并解码第一行，没有结果时返回None"""
+    async with conn.execute(sql, params) as cursor:
+        row = await cursor.fetchone()
+        if row is None:
+            return None
+        return _compile(cursor.description, codec)(row)
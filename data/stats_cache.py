@@ -0,0 +1,56 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from ..models import Player
+
+
+def stats_fingerprint(player: Player, catalog_version: int) -> Tuple:
+    """决定战斗属性的输入：基础属性、装备、功法和物品目录版本
+
+    不包含灵气：灵气在每次闭关、战斗后都会变化，放进指纹会让缓存几乎不命中；
+    缓存中只保存装备提供的灵气加成，读取时再加上玩家当前的灵气。
+    """
+    return (
+        player.max_hp, player.attack, player.defense, player.speed,
+        tuple(player.equipment_ids.items()), tuple(player.gongfa_ids), catalog_version
+    )
+
+
+class CombatStatsCache:
+    """玩家有效战斗属性缓存
+
+    按 user_id 保存 (指纹, 属性)，属性中的 spirit 为装备加成部分。
+    指纹包含基础属性、装备、功法和物品目录版本，
+    任一项变化时指纹不同即视为失效，无需在各处写入点手动清除。
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max(1, int(max_size))
+        self._entries: "OrderedDict[str, Tuple[Tuple, Dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str, fingerprint: Tuple) -> Optional[Dict]:
+        """指纹一致时返回属性副本，否则返回None"""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] != fingerprint:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(user_id)
+        return dict(entry[1])
+
+    def put(self, user_id: str, fingerprint: Tuple, stats: Dict):
+        self._entries[user_id] = (fingerprint, dict(stats))
+        self._entries.move_to_end(user_id)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
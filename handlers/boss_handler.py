@@ -0,0 +1,83 @@
+from typing import List, Tuple
+from astrbot.api import AstrBotConfig
+from astrbot.api.event import AstrMessageEvent
+from ..data.data_manager import DataBase
+from ..core.config_manager import ConfigManager
+from ..core.world_boss import WorldBossManager
+
+
+class BossHandler:
+    def __init__(self, db: DataBase, config: AstrBotConfig, config_manager: ConfigManager, world_boss: WorldBossManager):
+        self.db = db
+        self.config = config
+        self.config_manager = config_manager
+        self.world_boss = world_boss
+
+    async def _format_ranking(self, ranking: List[Tuple[str, int]]) -> List[str]:
+        lines = []
+        for rank, (user_id, damage) in enumerate(ranking, start=1):
+            player = await self.db.get_player_by_id(user_id)
+            lines.append(f"{rank}. {player.name if player else user_id}：{damage}点伤害")
+        return lines
+
+    async def handle_world_boss(self, event: AstrMessageEvent):
+        """查看世界Boss状态和伤害排行"""
+        boss = await self.world_boss.ensure_boss()
+        settlement = self.world_boss.last_settlement
+
+        if not boss:
+            if settlement:
+                yield f"{settlement.boss_name}已被击败，新的世界Boss尚未出现。"
+                for line in await self._format_ranking(settlement.ranking[:10]):
+                    yield line
+            else:
+                yield "当前没有世界Boss。"
+            return
+
+        yield f"【世界Boss】{boss.name}\nHP: {boss.hp}/{boss.max_hp}\n攻击: {boss.attack} 防御: {boss.defense} 速度: {boss.speed}"
+        ranking = self.world_boss.ranking(10)
+        if ranking:
+            yield "\n【伤害排行】"
+            for line in await self._format_ranking(ranking):
+                yield line
+
+    async def handle_attack_boss(self, event: AstrMessageEvent):
+        """攻击世界Boss"""
+        user_id = str(event.get_author_id())
+        player = await self.db.get_player_by_id(user_id)
+
+        if not player:
+            yield "您还没有开始修仙，请先输入'我要修仙'注册。"
+            return
+
+        boss = await self.world_boss.ensure_boss()
+        if not boss:
+            yield "当前没有世界Boss。"
+            return
+
+        remaining = self.world_boss.cooldown_remaining(user_id)
+        if remaining > 0:
+            yield f"道友气息未稳，请{int(remaining) + 1}秒后再战。"
+            return
+
+        if player.current_hp <= 0:
+            yield "你的气血已经耗尽，请先恢复后再挑战世界Boss。"
+            return
+
+        player_stats = self.db.get_combat_stats(player)
+        result = self.world_boss.attack(player, player_stats)
+        if result is None:
+            yield f"{boss.name}已被其他道友击败。"
+            return
+
+        # 玩家血量走写回缓存，不单独提交
+        player.current_hp = max(0, result.outcome.a_hp)
+        await self.db.update_player(player)
+
+        yield f"你对{boss.name}发起攻击，激战{result.outcome.rounds}回合，造成{result.damage}点伤害！"
+        yield f"你承受了{result.outcome.b_damage_dealt}点伤害，剩余HP: {player.current_hp}"
+        if result.killed:
+            yield f"\n{boss.name}被击败了！奖励将按伤害排行发放给所有参战的道友。"
+        else:
+            yield f"{boss.name}剩余HP: {result.boss_hp}/{boss.max_hp}"
+            yield f"你的累计伤害：{self.world_boss.damage.get(user_id, 0)}"
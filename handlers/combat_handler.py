@@ -1,16 +1,59 @@
-import random
 import asyncio
-from typing import Dict, List, Optional
-from astrbot.api.event import AstrMessageEvent
-from ..models import Player, Monster, CombatLog
+import struct
+import uuid
+from typing import List
+from astrbot.api import AstrBotConfig, logger
+from astrbot.api.event import AstrMessageEvent, MessageChain
+from ..models import CombatLog
 from ..data.data_manager import DataBase
 from ..core.config_manager import ConfigManager
+from ..core.combat_engine import CombatResult, iter_rounds, iter_round_blocks, summarize
+from ..core.replay import Replay, new_seed, battle_rng, record
 
 
 class CombatHandler:
-    def __init__(self, db: DataBase, config_manager: ConfigManager):
+    def __init__(self, db: DataBase, config: AstrBotConfig, config_manager: ConfigManager, context=None):
         self.db = db
+        self.config = config
         self.config_manager = config_manager
+        self.context = context
+        
+        # 战斗节奏：instant 直接给出结果；stream 逐回合单独发送；capped 逐回合发送但限制总时长
+        combat_config = self.config.get("COMBAT", {}) if self.config else {}
+        self.pacing = str(combat_config.get("PACING", "instant")).lower()
+        self.round_interval = max(0.0, float(combat_config.get("ROUND_INTERVAL", 1.0)))
+        self.max_duration = max(0.0, float(combat_config.get("MAX_DURATION", 10.0)))
+
+    @staticmethod
+    def _wants_detail(event: AstrMessageEvent) -> bool:
+        """命令参数中带"详细"时输出逐回合战报"""
+        return "详细" in event.get_event_message().strip().split()[1:]
+
+    async def _battle_report(
+        self, event: AstrMessageEvent, intro: List[str], outcome: CombatResult, b_name: str
+    ) -> List[str]:
+        """按配置的节奏输出开场信息和战斗过程，返回需要并入最终回复的文本
+        
+        stream/capped 模式下开场信息和每回合战报通过 context.send_message 单独发送，
+        两回合之间的等待只发生在真正逐条发送时；其余情况不做任何等待。
+        """
+        if self.pacing in ("stream", "capped") and self.context is not None and outcome.rounds > 0:
+            delay = self.round_interval
+            if self.pacing == "capped":
+                delay = min(delay, self.max_duration / outcome.rounds)
+            try:
+                await self.context.send_message(event.unified_msg_origin, MessageChain().message("\n".join(intro)))
+                for block in iter_round_blocks(outcome, b_name):
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    await self.context.send_message(event.unified_msg_origin, MessageChain().message(block))
+                return []
+            except Exception as e:
+                logger.error(f"逐回合发送战报失败，改为一次性输出: {e}")
+        
+        if self._wants_detail(event):
+            return intro + list(iter_rounds(outcome, b_name))
+        return intro + [summarize(outcome, b_name)]
 
     async def handle_challenge(self, event: AstrMessageEvent):
         """处理挑战怪物命令"""
@@ -21,123 +64,45 @@ class CombatHandler:
             yield "您还没有开始修仙，请先输入'我要修仙'注册。"
             return
         
-        # 获取怪物配置
-        monsters = self.config_manager.monsters
-        if not monsters:
-            yield "暂无可用怪物。"
-            return
-        
-        # 随机选择一个怪物
-        monster_id = random.choice(list(monsters.keys()))
-        monster_data = monsters[monster_id]
-        
-        # 获取玩家装备和功法
-        items = {}
-        equipment_ids = player.equipment_ids
-        for pos, item_id in equipment_ids.items():
-            if item_id:
-                item_data = await self.db.get_item_by_id(item_id)
-                if item_data:
-                    items[item_id] = item_data
+        # 按境界编译好的怪物表（重新加载配置时整体替换，这里只取一次引用）
+        monster_table = self.config_manager.monster_table
         
-        gongfas = await self.db.get_gongfas_by_ids(player.gongfa_ids)
+        # 本场战斗的随机数都来自同一个种子，可通过回放复现
+        seed = new_seed()
+        rng = battle_rng(seed)
         
-        # 获取玩家战斗属性
-        player_stats = player.get_combat_stats(items, gongfas)
-        
-        # 根据玩家属性计算怪物属性（为玩家属性的50%）
-        monster_max_hp = int(player_stats["hp"] * 0.5)
-        monster_attack = int(player_stats["attack"] * 0.5)
-        monster_defense = int(player_stats["defense"] * 0.5)
-        monster_speed = int(player_stats["speed"] * 0.5)
+        # 按权重从当前境界的怪物池中随机选择一个怪物
+        template = monster_table.pick(player.level_index, rng)
+        if template is None:
+            yield "暂无可用怪物。"
+            return
         
-        # 使用配置中的基础值作为最小值，避免玩家属性太低导致怪物属性为0
-        monster_max_hp = max(monster_data["max_hp_base"], monster_max_hp)
-        monster_attack = max(monster_data["attack_base"], monster_attack)
-        monster_defense = max(monster_data["defense_base"], monster_defense)
-        monster_speed = max(monster_data["speed_base"], monster_speed)
+        # 获取玩家战斗属性（按属性指纹缓存）
+        player_stats = self.db.get_combat_stats(player)
         
-        monster = Monster(
-            monster_id=monster_id,
-            name=monster_data["name"],
-            max_hp=monster_max_hp,
-            attack=monster_attack,
-            defense=monster_defense,
-            speed=monster_speed,
-            spirit_stone=monster_data["spirit_stone"],
-            drop_items=monster_data.get("drop_items", [])
-        )
+        # 怪物属性为玩家属性的50%，且不低于配置中的基础值
+        monster = monster_table.spawn(template, player_stats)
         
         # 开始战斗
-        yield f"开始挑战 {monster.name}！"
-        yield f"战斗开始！\n玩家: HP {player.current_hp}/{player_stats['hp']}\n怪物: HP {monster.max_hp}/{monster.max_hp}"
-        
-        # 战斗循环
-        player_hp = player.current_hp
-        monster_hp = monster.max_hp
-        
-        # 获取玩家装备的物品信息
-        all_items = {}
-        for pos, item_id in player.equipment_ids.items():
-            if item_id:
-                item_data = await self.db.get_item_by_id(item_id)
-                if item_data:
-                    all_items[item_id] = item_data
-        
-        player_gongfas = await self.db.get_gongfas_by_ids(player.gongfa_ids)
-        player_combat_stats = player.get_combat_stats(all_items, player_gongfas)
+        intro = [f"开始挑战 {monster.name}！"]
+        intro.append(f"战斗开始！\n玩家: HP {player.current_hp}/{player_stats['hp']}\n怪物: HP {monster.max_hp}/{monster.max_hp}")
         
         # 比较玩家和怪物速度，速度快的先出手
-        if player_combat_stats["speed"] >= monster.speed:
-            player_first = True
-            yield f"速度对比：你的速度({player_combat_stats['speed']}) vs {monster.name}的速度({monster.speed})，你先出手！"
+        replay = record(
+            seed, player.current_hp, player_stats,
+            monster.max_hp, {"attack": monster.attack, "defense": monster.defense, "speed": monster.speed}
+        )
+        outcome = replay.resolve()
+        if outcome.a_first:
+            intro.append(f"速度对比：你的速度({player_stats['speed']}) vs {monster.name}的速度({monster.speed})，你先出手！")
         else:
-            player_first = False
-            yield f"速度对比：你的速度({player_combat_stats['speed']}) vs {monster.name}的速度({monster.speed})，{monster.name}先出手！"
+            intro.append(f"速度对比：你的速度({player_stats['speed']}) vs {monster.name}的速度({monster.speed})，{monster.name}先出手！")
         
-        round_num = 1
-        while player_hp > 0 and monster_hp > 0:
-            yield f"\n第{round_num}回合："
-            
-            if player_first:
-                # 玩家先攻击
-                player_damage = max(1, player_combat_stats["attack"] - monster.defense)
-                monster_hp -= player_damage
-                yield f"你对{monster.name}造成了{player_damage}点伤害！"
-                
-                if monster_hp <= 0:
-                    yield f"{monster.name}被击败了！"
-                    break
-                
-                # 怪物后攻击
-                monster_damage = max(1, monster.attack - player_combat_stats["defense"])
-                player_hp -= monster_damage
-                yield f"{monster.name}对你造成了{monster_damage}点伤害！"
-            else:
-                # 怪物先攻击
-                monster_damage = max(1, monster.attack - player_combat_stats["defense"])
-                player_hp -= monster_damage
-                yield f"{monster.name}对你造成了{monster_damage}点伤害！"
-                
-                if player_hp <= 0:
-                    yield "你被击败了！"
-                    break
-                
-                # 玩家后攻击
-                player_damage = max(1, player_combat_stats["attack"] - monster.defense)
-                monster_hp -= player_damage
-                yield f"你对{monster.name}造成了{player_damage}点伤害！"
-                
-                if monster_hp <= 0:
-                    yield f"{monster.name}被击败了！"
-                    break
-            
-            if player_hp <= 0:
-                yield "你被击败了！"
-                break
-            
-            round_num += 1
-            await asyncio.sleep(0.5)  # 战斗延迟
+        # 战斗过程直接结算，战报按配置的节奏输出
+        for line in await self._battle_report(event, intro, outcome, monster.name):
+            yield line
+        player_hp = outcome.a_hp
+        monster_hp = outcome.b_hp
         
         # 战斗结果处理
         if player_hp > 0:
@@ -145,13 +110,8 @@ class CombatHandler:
             result = "win"
             spirit_stone_gained = monster.spirit_stone
             
-            # 随机掉落物品
-            drop_items = []
-            for drop_item in monster.drop_items:
-                if random.random() < drop_item["probability"]:
-                    drop_items.append(drop_item["item_id"])
-                    # 添加物品到背包
-                    await self.db.add_item_to_inventory(user_id, drop_item["item_id"])
+            # 随机掉落物品（掉落表随怪物表编译）
+            drop_items = template.loot.roll(rng)
             
             # 战斗胜利获得灵气奖励（用于突破）
             spirit_gained = max(1, monster.max_hp // 10)  # 根据怪物血量给予灵气奖励
@@ -160,30 +120,36 @@ class CombatHandler:
             player.spirit_stone += spirit_stone_gained
             player.spirit += spirit_gained
             player.current_hp = player_hp  # 更新当前血量
-            await self.db.update_player(player)
-            
-            yield f"\n战斗胜利！获得{spirit_stone_gained}灵石，获得{spirit_gained}灵气！"
-            
-            if drop_items:
-                item_names = []
-                for item_id in drop_items:
-                    item_data = await self.db.get_item_by_id(item_id)
-                    if item_data:
-                        item_names.append(item_data.get("name", item_id))
-                yield f"获得物品：{', '.join(item_names)}"
             
             # 记录战斗日志
             combat_log = CombatLog(
-                log_id=f"combat_{user_id}_{int(asyncio.get_event_loop().time())}",
+                log_id=f"combat_{user_id}_{uuid.uuid4().hex}",
                 attacker_id=user_id,
                 defender_id=monster.monster_id,
                 result=result,
                 damage=monster.max_hp - monster_hp,
                 spirit_stone_gained=spirit_stone_gained,
                 timestamp=asyncio.get_event_loop().time(),
-                drop_items=drop_items
+                drop_items=drop_items,
+                replay=replay.pack()
             )
-            await self.db.add_combat_log(combat_log)
+            
+            # 掉落、玩家数据和战斗日志在同一事务中提交
+            async with self.db.transaction():
+                for item_id in drop_items:
+                    await self.db.add_item_to_inventory(user_id, item_id)
+                await self.db.update_player(player)
+                await self.db.add_combat_log(combat_log)
+            
+            yield f"\n战斗胜利！获得{spirit_stone_gained}灵石，获得{spirit_gained}灵气！"
+            
+            if drop_items:
+                drop_item_data = await self.db.get_items_by_ids(drop_items)
+                item_names = [
+                    drop_item_data[item_id].get("name", item_id)
+                    for item_id in drop_items if item_id in drop_item_data
+                ]
+                yield f"获得物品：{', '.join(item_names)}"
         else:
             # 玩家失败
             result = "lose"
@@ -191,14 +157,15 @@ class CombatHandler:
             
             # 记录战斗日志
             combat_log = CombatLog(
-                log_id=f"combat_{user_id}_{int(asyncio.get_event_loop().time())}",
+                log_id=f"combat_{user_id}_{uuid.uuid4().hex}",
                 attacker_id=user_id,
                 defender_id=monster.monster_id,
                 result=result,
                 damage=player.max_hp - player_hp,
                 spirit_stone_gained=0,
                 timestamp=asyncio.get_event_loop().time(),
-                drop_items=[]
+                drop_items=[],
+                replay=replay.pack()
             )
             await self.db.add_combat_log(combat_log)
 
@@ -211,113 +178,29 @@ class CombatHandler:
             yield "您还没有开始修仙，请先输入'我要修仙'注册。"
             return
         
-        # 获取所有玩家（排除自己）
-        all_players = await self.db.get_all_players()
-        other_players = [p for p in all_players if p.user_id != user_id and p.level_index <= player.level_index + 2]
+        # 从匹配索引中随机选择一个境界不高于自己两个小境界的对手
+        opponent = await self.db.find_arena_opponent(player, max_level_gap=2)
         
-        if not other_players:
+        if not opponent:
             yield "竞技场暂无合适的对手。"
             return
         
-        # 随机选择一个对手
-        opponent = random.choice(other_players)
+        # 获取双方的战斗属性（按属性指纹缓存）
+        player_stats = self.db.get_combat_stats(player)
+        opponent_stats = self.db.get_combat_stats(opponent)
         
-        # 获取双方的装备和功法
-        player_items = {}
-        for pos, item_id in player.equipment_ids.items():
-            if item_id:
-                item_data = await self.db.get_item_by_id(item_id)
-                if item_data:
-                    player_items[item_id] = item_data
+        intro = [f"竞技场战斗：你 VS {opponent.name}"]
+        intro.append(f"战斗开始！\n你的HP: {player.current_hp}/{player_stats['hp']}\n对手HP: {opponent.current_hp}/{opponent_stats['hp']}")
         
-        opponent_items = {}
-        for pos, item_id in opponent.equipment_ids.items():
-            if item_id:
-                item_data = await self.db.get_item_by_id(item_id)
-                if item_data:
-                    opponent_items[item_id] = item_data
+        intro.append(f"速度对比：你的速度({player_stats['speed']}) vs {opponent.name}的速度({opponent_stats['speed']})")
         
-        player_gongfas = await self.db.get_gongfas_by_ids(player.gongfa_ids)
-        opponent_gongfas = await self.db.get_gongfas_by_ids(opponent.gongfa_ids)
-        
-        # 获取战斗属性
-        player_stats = player.get_combat_stats(player_items, player_gongfas)
-        opponent_stats = opponent.get_combat_stats(opponent_items, opponent_gongfas)
-        
-        yield f"竞技场战斗：你 VS {opponent.name}"
-        yield f"战斗开始！\n你的HP: {player.current_hp}/{player_stats['hp']}\n对手HP: {opponent.current_hp}/{opponent_stats['hp']}"
-        
-        # 战斗循环
-        player_hp = player.current_hp
-        opponent_hp = opponent.current_hp
-        
-        # 比较双方速度，速度快的先出手
-        if player_stats["speed"] >= opponent_stats["speed"]:
-            first_attacker = "player"
-            first_stats = player_stats
-            second_attacker = "opponent"
-            second_stats = opponent_stats
-            first_hp = player_hp
-            second_hp = opponent_hp
-        else:
-            first_attacker = "opponent"
-            first_stats = opponent_stats
-            second_attacker = "player"
-            second_stats = player_stats
-            first_hp = opponent_hp
-            second_hp = player_hp
-        
-        yield f"速度对比：你的速度({player_stats['speed']}) vs {opponent.name}的速度({opponent_stats['speed']})"
-        
-        round_num = 1
-        while player_hp > 0 and opponent_hp > 0:
-            yield f"\n第{round_num}回合："
-            
-            # 速度快的先攻击
-            if first_attacker == "player":
-                first_damage = max(1, first_stats["attack"] - second_stats["defense"])
-                second_hp -= first_damage
-                yield f"你对{opponent.name}造成了{first_damage}点伤害！"
-                
-                if second_hp <= 0:
-                    yield f"{opponent.name}被击败了！"
-                    break
-            else:
-                first_damage = max(1, first_stats["attack"] - second_stats["defense"])
-                second_hp -= first_damage
-                yield f"{opponent.name}对你造成了{first_damage}点伤害！"
-                
-                if second_hp <= 0:
-                    yield "你被击败了！"
-                    break
-            
-            # 速度慢的后攻击
-            if second_attacker == "player":
-                second_damage = max(1, second_stats["attack"] - first_stats["defense"])
-                first_hp -= second_damage
-                yield f"你对{opponent.name}造成了{second_damage}点伤害！"
-            else:
-                second_damage = max(1, second_stats["attack"] - first_stats["defense"])
-                first_hp -= second_damage
-                yield f"{opponent.name}对你造成了{second_damage}点伤害！"
-            
-            if first_hp <= 0:
-                if second_attacker == "player":
-                    yield "你被击败了！"
-                else:
-                    yield f"{opponent.name}被击败了！"
-                break
-            
-            # 更新血量
-            if player_stats["speed"] >= opponent_stats["speed"]:
-                player_hp = first_hp
-                opponent_hp = second_hp
-            else:
-                player_hp = second_hp
-                opponent_hp = first_hp
-            
-            round_num += 1
-            await asyncio.sleep(0.5)  # 战斗延迟
+        # 速度快的先出手，战斗过程直接结算
+        replay = record(new_seed(), player.current_hp, player_stats, opponent.current_hp, opponent_stats)
+        outcome = replay.resolve()
+        for line in await self._battle_report(event, intro, outcome, opponent.name):
+            yield line
+        player_hp = outcome.a_hp
+        opponent_hp = outcome.b_hp
         
         # 战斗结果处理
         if player_hp > 0:
@@ -330,41 +213,84 @@ class CombatHandler:
             player.spirit_stone += spirit_stone_gained
             player.spirit += spirit_gained
             player.current_hp = player_hp  # 更新当前血量
-            await self.db.update_player(player)
-            
-            yield f"\n竞技场胜利！获得{spirit_stone_gained}灵石，获得{spirit_gained}灵气！"
             
             # 记录战斗日志
             combat_log = CombatLog(
-                log_id=f"arena_{user_id}_{int(asyncio.get_event_loop().time())}",
+                log_id=f"arena_{user_id}_{uuid.uuid4().hex}",
                 attacker_id=user_id,
                 defender_id=opponent.user_id,
                 result=result,
                 damage=opponent_stats['hp'] - opponent_hp,
                 spirit_stone_gained=spirit_stone_gained,
                 timestamp=asyncio.get_event_loop().time(),
-                drop_items=[]
+                drop_items=[],
+                replay=replay.pack()
             )
-            await self.db.add_combat_log(combat_log)
+            async with self.db.transaction():
+                await self.db.update_player(player)
+                await self.db.add_combat_log(combat_log)
+            
+            yield f"\n竞技场胜利！获得{spirit_stone_gained}灵石，获得{spirit_gained}灵气！"
         else:
             # 玩家失败
             result = "lose"
             spirit_stone_lost = player.spirit_stone // 10  # 失去部分灵石
             player.spirit_stone = max(0, player.spirit_stone - spirit_stone_lost)
             player.current_hp = player_hp  # 更新当前血量
-            await self.db.update_player(player)
-            
-            yield f"\n竞技场失败！失去{spirit_stone_lost}灵石。"
             
             # 记录战斗日志
             combat_log = CombatLog(
-                log_id=f"arena_{user_id}_{int(asyncio.get_event_loop().time())}",
+                log_id=f"arena_{user_id}_{uuid.uuid4().hex}",
                 attacker_id=user_id,
                 defender_id=opponent.user_id,
                 result=result,
                 damage=player_stats['hp'] - player_hp,
                 spirit_stone_gained=-spirit_stone_lost,  # 负数表示失去
                 timestamp=asyncio.get_event_loop().time(),
-                drop_items=[]
+                drop_items=[],
+                replay=replay.pack()
             )
-            await self.db.add_combat_log(combat_log)
\ No newline at end of file
+            async with self.db.transaction():
+                await self.db.update_player(player)
+                await self.db.add_combat_log(combat_log)
+            
+            yield f"\n竞技场失败！失去{spirit_stone_lost}灵石。"
+
+    async def handle_replay(self, event: AstrMessageEvent):
+        """处理战斗回放命令：不带参数时回放自己最近一场战斗"""
+        user_id = str(event.get_author_id())
+        args = event.get_event_message().strip().split()[1:]
+        
+        if args:
+            log = await self.db.get_combat_log(args[0])
+            if log and user_id not in (log.attacker_id, log.defender_id):
+                log = None
+        else:
+            log = await self.db.get_latest_combat_log(user_id)
+        
+        if not log:
+            yield "没有找到可以回放的战斗。"
+            return
+        if not log.replay:
+            yield "这场战斗没有回放记录。"
+            return
+        
+        # 对手名称：怪物取配置中的名称，玩家取道号
+        monster = self.config_manager.monster_table.get(log.defender_id)
+        if monster:
+            b_name = monster.name
+        else:
+            defender = await self.db.get_player_by_id(log.defender_id)
+            b_name = defender.name if defender else log.defender_id
+        
+        try:
+            replay = Replay.unpack(log.replay)
+            transcript = replay.transcript(b_name)
+        except (ValueError, struct.error) as e:
+            yield f"回放记录无法解析：{e}"
+            return
+        
+        yield f"【战斗回放】{log.log_id}\n引擎版本: v{replay.engine_version}  随机种子: {replay.seed}"
+        yield f"你的HP: {replay.a_hp}  {b_name}的HP: {replay.b_hp}"
+        for line in transcript:
+            yield line
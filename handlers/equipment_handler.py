@@ -82,18 +82,22 @@ class EquipmentHandler:
         
         # 检查是否已有装备在该位置
         old_equipment_id = player.equipment_ids.get(equipment_slot)
-        if old_equipment_id:
-            # 先将旧装备放回背包
-            await self.db.add_item_to_inventory(user_id, old_equipment_id, 1)
         
         # 穿戴新装备
         player.equipment_ids[equipment_slot] = equipment_id
         
-        # 从背包中移除装备
-        await self.db.remove_item_from_inventory(user_id, equipment_id, 1)
+        # 换下旧装备、移除新装备和保存玩家信息在同一事务中完成
+        async with self.db.transaction():
+            removed = await self.db.remove_item_from_inventory(user_id, equipment_id, 1)
+            if removed:
+                if old_equipment_id:
+                    # 将旧装备放回背包
+                    await self.db.add_item_to_inventory(user_id, old_equipment_id, 1)
+                await self.db.update_player(player)
         
-        # 保存玩家信息
-        await self.db.update_player(player)
+        if not removed:
+            yield f"背包中没有找到ID为 {equipment_id} 的装备。"
+            return
         
         yield f"成功穿戴装备 {equipment.get('name', equipment_id)} 到 {self.get_slot_name(equipment_slot)} 位置。"
 
@@ -226,9 +230,6 @@ class EquipmentHandler:
         # 将原装备从穿戴中移除
         player.equipment_ids[old_equipment_slot] = ""
         
-        # 从背包中移除新装备
-        await self.db.remove_item_from_inventory(user_id, new_equipment_id, 1)
-        
         # 将新装备设置到相同位置，并应用原装备的强化等级
         new_equipment["upgrade_level"] = old_upgrade_level
         # 重新计算属性加成
@@ -238,24 +239,30 @@ class EquipmentHandler:
         new_equipment["hp"] = new_equipment.get("base_hp", 0) + int(new_equipment.get("base_hp", 0) * old_upgrade_level * 0.1)
         new_equipment["spirit"] = new_equipment.get("base_spirit", 0) + int(new_equipment.get("base_spirit", 0) * old_upgrade_level * 0.01)
         
-        # 更新新装备信息
-        await self.db.update_item(new_equipment_id, new_equipment)
-        
         # 将新装备穿戴到原位置
         player.equipment_ids[old_equipment_slot] = new_equipment_id
         
-        # 保存玩家信息
-        await self.db.update_player(player)
+        # 移除背包中的新装备、更新装备信息和保存玩家信息在同一事务中完成
+        async with self.db.transaction():
+            removed = await self.db.remove_item_from_inventory(user_id, new_equipment_id, 1)
+            if removed:
+                await self.db.update_item(new_equipment_id, new_equipment)
+                await self.db.update_player(player)
+        
+        if not removed:
+            yield f"背包中没有找到ID为 {new_equipment_id} 的新装备。"
+            return
         
         yield f"成功替换装备！原装备 {old_equipment_id} 的强化等级 +{old_upgrade_level} 已转移到新装备 {new_equipment.get('name', new_equipment_id)}，原装备已消耗。"
 
     async def get_equipment_info(self, player: Player) -> Dict[str, str]:
         """获取装备信息"""
         equipment_info = {}
+        equipments = await self.db.get_items_by_ids(list(player.equipment_ids.values()))
         
         for slot, equipment_id in player.equipment_ids.items():
             if equipment_id:
-                equipment = await self.db.get_item_by_id(equipment_id)
+                equipment = equipments.get(equipment_id)
                 if equipment:
                     name = equipment.get('name', equipment_id)
                     upgrade_level = equipment.get('upgrade_level', 0)
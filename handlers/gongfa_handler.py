@@ -61,17 +61,12 @@ class GongfaHandler:
         
         gongfa_name = parts[1].strip()
         
-        # 从配置中获取所有功法
-        all_gongfas = self.config_manager.items  # 功法信息可能存储在items中
-        
-        # 查找指定功法
-        target_gongfa = None
-        target_gongfa_id = None
-        for item_id, item_data in all_gongfas.items():
-            if item_data.get('name') == gongfa_name and item_data.get('type') == 'gongfa':
-                target_gongfa = item_data
-                target_gongfa_id = item_id
-                break
+        # 从物品配置中查找指定功法
+        target_gongfa = next(
+            (item for item in self.config_manager.item_configs.values()
+             if item.name == gongfa_name and item.type == 'gongfa'),
+            None
+        )
         
         if not target_gongfa:
             # 如果在items中没找到，尝试从其他可能的配置中查找
@@ -79,31 +74,25 @@ class GongfaHandler:
             return
         
         # 检查玩家是否已经学习了该功法
+        target_gongfa_id = target_gongfa.item_id
         if target_gongfa_id in player.gongfa_ids:
             yield f"您已经学会了功法：{gongfa_name}，无需重复学习。"
             return
         
         # 检查玩家的境界是否满足学习条件
-        required_realm_name = target_gongfa.get('required_realm', "练气一层")
-        realm_config = self.config_manager.realm_config
+        required_realm_name = target_gongfa.required_realm
+        realm_table = self.config_manager.realm_table
         
         # 获取玩家当前境界
-        player_realm = player.get_realm(realm_config)
-        player_realm_name = player_realm["name"]
-        
-        # 查找要求境界在配置中的索引
-        required_realm_index = -1
-        for i, realm in enumerate(realm_config):
-            if realm["name"] == required_realm_name:
-                required_realm_index = i
-                break
+        player_realm_name = realm_table.get(player.level_index).name
         
-        # 如果找不到要求境界，默认为练气一层
-        if required_realm_index == -1:
+        # 查找要求境界的索引，找不到时默认为练气一层
+        required_realm_index = realm_table.index_of(required_realm_name)
+        if required_realm_index is None:
             required_realm_index = 0
             required_realm_name = "练气一层"
         
-        if player.realm_index < required_realm_index:
+        if player.level_index < required_realm_index:
             yield f"您的境界不足以学习此功法！\n需要境界：{required_realm_name}\n当前境界：{player_realm_name}"
             return
         
@@ -112,8 +101,8 @@ class GongfaHandler:
         has_gongfa_book = False
         gongfa_book_id = None
         
-        for item_id, count in inventory.items():
-            item_data = await self.db.get_item_by_id(item_id)
+        inventory_items = await self.db.get_items_by_ids([inv_item.item_id for inv_item in inventory])
+        for item_id, item_data in inventory_items.items():
             if item_data and item_data.get('name') == gongfa_name and item_data.get('type') == 'gongfa_book':
                 has_gongfa_book = True
                 gongfa_book_id = item_id
@@ -126,11 +115,14 @@ class GongfaHandler:
         # 学习功法成功
         player.gongfa_ids.append(target_gongfa_id)
         
-        # 从背包中移除功法秘籍
-        if gongfa_book_id:
-            await self.db.remove_item_from_inventory(user_id, gongfa_book_id, 1)
+        # 从背包中移除功法秘籍并更新玩家信息（同一事务）
+        async with self.db.transaction():
+            removed = await self.db.remove_item_from_inventory(user_id, gongfa_book_id, 1)
+            if removed:
+                await self.db.update_player(player)
         
-        # 更新玩家信息
-        await self.db.update_player(player)
+        if not removed:
+            yield f"您没有功法秘籍《{gongfa_name}》，无法学习该功法。"
+            return
         
         yield f"恭喜您成功学习功法《{gongfa_name}》！\n该功法将为您提供永久属性加成。"
\ No newline at end of file
@@ -1,6 +1,7 @@
 import random
 import asyncio
 from typing import Dict, List, Optional
+from astrbot.api import AstrBotConfig
 from astrbot.api.event import AstrMessageEvent
 from ..models import Player
 from ..data.data_manager import DataBase
@@ -8,8 +9,9 @@ from ..core.config_manager import ConfigManager
 
 
 class PlayerHandler:
-    def __init__(self, db: DataBase, config_manager: ConfigManager):
+    def __init__(self, db: DataBase, config: AstrBotConfig, config_manager: ConfigManager):
         self.db = db
+        self.config = config
         self.config_manager = config_manager
 
     async def handle_start_xiuxian(self, event: AstrMessageEvent):
@@ -19,28 +21,11 @@ class PlayerHandler:
         
         if existing_player:
             yield "您已经注册过修仙了，无需重复注册。"
-            yield f"当前境界: {existing_player.get_level(self.config_manager.level_config)['name']}\n当前灵气: {existing_player.spirit}"
+            yield f"当前境界: {self.config_manager.realm_table.get(existing_player.level_index).name}\n当前灵气: {existing_player.spirit}"
             return
         
-        # 随机分配灵根
-        spiritual_roots = [
-            ("天灵根", 0.02),      # 2% 概率
-            ("变异灵根", 0.03),    # 3% 概率
-            ("上品灵根", 0.08),    # 8% 概率
-            ("中品灵根", 0.15),    # 15% 概率
-            ("下品灵根", 0.35),    # 35% 概率
-            ("伪灵根", 0.37)       # 37% 概率
-        ]
-        
-        # 根据概率随机选择灵根
-        rand = random.random()
-        cumulative = 0
-        selected_root = "未知"
-        for root, probability in spiritual_roots:
-            cumulative += probability
-            if rand <= cumulative:
-                selected_root = root
-                break
+        # 按 random_tables.json 中的权重随机分配灵根
+        selected_root = self.config_manager.random_tables.roll_spiritual_root()
         
         # 创建新玩家
         from ..models import Player
@@ -66,37 +51,35 @@ class PlayerHandler:
         # 保存新玩家
         await self.db.create_player(new_player)
         
-        yield f"恭喜您踏上修仙之路！\n您的灵根为：{selected_root}\n当前境界：{new_player.get_level(self.config_manager.level_config)['name']}\n\n修仙之路漫漫，祝您早日得道！"
+        yield f"恭喜您踏上修仙之路！\n您的灵根为：{selected_root}\n当前境界：{self.config_manager.realm_table.get(new_player.level_index).name}\n\n修仙之路漫漫，祝您早日得道！"
 
     async def handle_player_info(self, event: AstrMessageEvent):
         """处理查看玩家信息命令"""
         user_id = str(event.get_author_id())
-        player = await self.db.get_player_by_id(user_id)
+        profile = await self.db.get_player_profile(user_id)
         
-        if not player:
+        if not profile:
             yield "您还没有开始修仙，请先输入'我要修仙'注册。"
             return
+        player = profile.player
         
-        level_config = self.config_manager.level_config
-        current_level = player.get_level(level_config)
-        level_name = current_level["name"]
+        level_name = self.config_manager.realm_table.get(player.level_index).name
         
         # 获取玩家装备信息
         equipment_info = []
         for pos, item_id in player.equipment_ids.items():
-            if item_id:
-                item_data = await self.db.get_item_by_id(item_id)
-                if item_data:
-                    equipment_info.append(f"{pos}:{item_data['name']}")
+            item_data = profile.equipments.get(item_id)
+            if item_data:
+                equipment_info.append(f"{pos}:{item_data['name']}")
         
         equipment_str = "、".join(equipment_info) if equipment_info else "无"
         
         # 获取玩家功法信息
-        gongfas = await self.db.get_gongfas_by_ids(player.gongfa_ids)
+        gongfas = profile.gongfas
         gongfa_names = [g['name'] for g in gongfas] if gongfas else []
         gongfa_str = "、".join(gongfa_names) if gongfa_names else "无"
         
-        yield f"【玩家信息】\n道号: {player.name}\n灵根: {player.spiritual_root}\n境界: {level_name}\n生命值: {player.current_hp}/{player.max_hp}\n攻击力: {player.attack}\n防御力: {player.defense}\n速度: {player.speed}\n灵气: {player.spirit}\n灵石: {player.spirit_stone}\n装备: {equipment_str}\n功法: {gongfa_str}"
+        yield f"【玩家信息】\n道号: {player.name}\n灵根: {player.spiritual_root}\n境界: {level_name}\n生命值: {player.current_hp}/{player.max_hp}\n攻击力: {player.attack}\n防御力: {player.defense}\n速度: {player.speed}\n战力: {self.db.get_combat_power(player)}\n灵气: {player.spirit}\n灵石: {player.spirit_stone}\n装备: {equipment_str}\n功法: {gongfa_str}"
 
     async def handle_sign_in(self, event: AstrMessageEvent):
         """处理签到命令"""
@@ -143,49 +126,24 @@ class PlayerHandler:
     async def handle_meditate(self, event: AstrMessageEvent):
         """处理闭关命令"""
         user_id = str(event.get_author_id())
-        player = await self.db.get_player_by_id(user_id)
+        profile = await self.db.get_player_profile(user_id)
         
-        if not player:
+        if not profile:
             yield "您还没有开始修仙，请先输入'我要修仙'注册。"
             return
+        player = profile.player
         
         # 闭关获取灵气奖励（随机范围）
         base_spirit_gain = random.randint(10, 30)  # 基础灵气获取
         
-        # 根据玩家当前境界调整获取量
-        level_config = self.config_manager.level_config
-        current_level = player.get_level(level_config)
-        level_name = current_level["name"]
-        
-        # 不同境界获取灵气的倍率
-        if "练气" in level_name:
-            multiplier = 1.0
-        elif "筑基" in level_name:
-            multiplier = 1.2
-        elif "金丹" in level_name:
-            multiplier = 1.5
-        elif "元婴" in level_name:
-            multiplier = 1.8
-        elif "化神" in level_name:
-            multiplier = 2.2
-        elif "炼虚" in level_name:
-            multiplier = 2.5
-        elif "合体" in level_name:
-            multiplier = 2.8
-        elif "大乘" in level_name:
-            multiplier = 3.0
-        else:
-            multiplier = 1.0
+        # 根据玩家当前境界调整获取量（不同大境界的倍率见境界表）
+        realm = self.config_manager.realm_table.get(player.level_index)
+        level_name = realm.name
+        multiplier = realm.meditate_multiplier
         
         # 获取玩家装备和功法信息
-        items = {}
-        for pos, item_id in player.equipment_ids.items():
-            if item_id:
-                item_data = await self.db.get_item_by_id(item_id)
-                if item_data:
-                    items[item_id] = item_data
-        
-        gongfas = await self.db.get_gongfas_by_ids(player.gongfa_ids)
+        items = profile.equipments
+        gongfas = profile.gongfas
         
         # 计算功法加成（灵气获取加成）
         gongfa_spirit_bonus = 0
@@ -223,8 +181,7 @@ class PlayerHandler:
         spirit_gained = int(base_spirit_gain * total_multiplier)
         
         # 更新玩家灵气
-        player.spirit += spirit_gained
-        await self.db.update_player(player)
+        player = await self.db.adjust_currency(user_id, spirit=spirit_gained) or player
         
         # 准备输出信息
         gongfa_bonus_text = f"功法加成: {gongfa_spirit_bonus:.1f}%"
@@ -233,12 +190,7 @@ class PlayerHandler:
         
         yield f"闭关修炼结束！\n当前境界: {level_name}\n{gongfa_bonus_text}\n{equipment_bonus_text}\n{root_bonus_text}\n获得灵气: {spirit_gained}\n总灵气: {player.spirit}\n\n静心凝神，感悟天地灵气，修为有所精进。"
         
-        # 随机事件（可选，增加趣味性）
-        if random.random() < 0.1:  # 10%几率触发特殊事件
-            special_events = [
-                "在闭关中感悟到一丝天道玄机，灵气运转更加顺畅。",
-                "闭关时偶得灵光一闪，对功法有了新的理解。",
-                "冥冥之中似有仙缘相助，修为进展神速。",
-                "闭关期间心境提升，对修仙之路有了更深的领悟。"
-            ]
-            yield f"【特殊感悟】{random.choice(special_events)}"
\ No newline at end of file
+        # 随机事件（可选，增加趣味性），触发概率和事件在 random_tables.json 中配置
+        special_event = self.config_manager.random_tables.roll_meditate_event()
+        if special_event:
+            yield f"【特殊感悟】{special_event}"
\ No newline at end of file
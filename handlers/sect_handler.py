@@ -105,14 +105,14 @@ class SectHandler:
             return
 
         # 使用sect_manager处理创建宗门逻辑
-        success, msg, updated_player = await self.sect_manager.handle_create_sect(player, sect_name)
+        # 宗门变更与玩家信息在同一事务中提交
+        async with self.db.transaction():
+            success, msg, updated_player = await self.sect_manager.handle_create_sect(player, sect_name)
+            if success and updated_player:
+                # 更新玩家信息
+                await self.db.update_player(updated_player)
         
-        if success and updated_player:
-            # 更新玩家信息
-            await self.db.update_player(updated_player)
-            yield msg
-        else:
-            yield msg
+        yield msg
 
     async def handle_leave_sect(self, event: AstrMessageEvent):
         """处理离开宗门指令"""
@@ -125,11 +125,11 @@ class SectHandler:
             return
 
         # 使用sect_manager处理离开宗门逻辑
-        success, msg, updated_player = await self.sect_manager.handle_leave_sect(player)
+        # 宗门变更与玩家信息在同一事务中提交
+        async with self.db.transaction():
+            success, msg, updated_player = await self.sect_manager.handle_leave_sect(player)
+            if success and updated_player:
+                # 更新玩家信息
+                await self.db.update_player(updated_player)
         
-        if success and updated_player:
-            # 更新玩家信息
-            await self.db.update_player(updated_player)
-            yield msg
-        else:
-            yield msg
\ No newline at end of file
+        yield msg
\ No newline at end of file
@@ -47,17 +47,16 @@ class ShopHandler:
             yield "您的背包是空的。"
             return
         
-        backpack_message = "【我的背包】\n"
-        backpack_message += "您当前拥有的物品：\n"
+        # 一次性批量获取背包中所有物品信息
+        items = await self.db.get_items_by_ids([inv_item.item_id for inv_item in inventory])
         
-        for item_id, count in inventory.items():
-            item_data = await self.db.get_item_by_id(item_id)
-            if item_data:
-                backpack_message += f"{item_data['name']} x{count}\n"
-            else:
-                backpack_message += f"{item_id} x{count}\n"
+        lines = ["【我的背包】", "您当前拥有的物品："]
+        for inv_item in inventory:
+            item_data = items.get(inv_item.item_id)
+            item_name = item_data['name'] if item_data else inv_item.item_id
+            lines.append(f"{item_name} x{inv_item.quantity}")
         
-        yield backpack_message
+        yield "\n".join(lines) + "\n"
 
     async def handle_buy(self, event: AstrMessageEvent):
         """处理购买命令"""
@@ -104,10 +103,15 @@ class ShopHandler:
             yield f"您的灵石不足，需要{total_price}灵石，您当前有{player.spirit_stone}灵石。"
             return
         
-        # 扣除灵石并添加物品到背包
-        player.spirit_stone -= total_price
-        await self.db.add_item_to_inventory(user_id, item_id, quantity)
-        await self.db.update_player(player)
+        # 扣除灵石并添加物品到背包（扣款带余额检查，防止并发购买透支）
+        async with self.db.transaction():
+            updated_player = await self.db.adjust_currency(user_id, spirit_stone=-total_price)
+            if updated_player:
+                await self.db.add_item_to_inventory(user_id, item_id, quantity)
+        
+        if not updated_player:
+            yield f"您的灵石不足，需要{total_price}灵石。"
+            return
         
         yield f"购买成功！花费{total_price}灵石购买了{quantity}个{target_item['name']}。"
 
@@ -144,15 +148,16 @@ class ShopHandler:
                 return
         
         # 检查背包中是否有该物品ID
-        inventory = await self.db.get_player_inventory(user_id)
+        inventory = {inv_item.item_id: inv_item.quantity for inv_item in await self.db.get_player_inventory(user_id)}
         if item_id not in inventory or inventory[item_id] < quantity:
             # 为了更好的用户体验，尝试通过名称查找物品
             target_item_id = None
             target_item = None
             item_name = item_id  # 将输入当作名称处理
             
+            items = await self.db.get_items_by_ids(list(inventory.keys()))
             for inv_item_id, count in inventory.items():
-                item = await self.db.get_item_by_id(inv_item_id)
+                item = items.get(inv_item_id)
                 if item and item["name"] == item_name and count >= quantity:
                     target_item_id = inv_item_id
                     target_item = item
@@ -216,11 +221,15 @@ class ShopHandler:
                 player.exp += value * quantity
                 effect_messages.append(f"获得{value * quantity}点经验值")
         
-        # 从背包中移除使用过的物品
-        await self.db.remove_item_from_inventory(user_id, item_id, quantity)
+        # 从背包中移除使用过的物品并更新玩家信息（同一事务）
+        async with self.db.transaction():
+            removed = await self.db.remove_item_from_inventory(user_id, item_id, quantity)
+            if removed:
+                await self.db.update_player(player)
         
-        # 更新玩家信息
-        await self.db.update_player(player)
+        if not removed:
+            yield f"背包中没有足够的物品：{item_name}"
+            return
         
         if effect_messages:
             yield f"使用成功！{quantity}个{item_name}，{', '.join(effect_messages)}。"
@@ -6,6 +6,8 @@ from astrbot.api import AstrBotConfig, logger
 from astrbot.api.event import AstrMessageEvent, filter
 
 from .core.config_manager import ConfigManager
+from .core.world_boss import WorldBossManager
+from .core.user_lock import UserLocks, UserLockTimeout
 from .data.data_manager import DataBase
 from .handlers.player_handler import PlayerHandler
 from .handlers.shop_handler import ShopHandler
@@ -15,6 +17,7 @@ from .handlers.sect_handler import SectHandler
 from .handlers.equipment_handler import EquipmentHandler
 from .handlers.gongfa_handler import GongfaHandler
 from .handlers.misc_handler import MiscHandler
+from .handlers.boss_handler import BossHandler
 from .manager.server import create_app
 
 
@@ -31,29 +34,48 @@ class XiuXianZhuangPlugin(Star):
         self.config = config
         _current_dir = Path(__file__).parent
         
-        # 初始化配置管理器
+        # 初始化配置管理器（配置文件修改后自动重新加载；插件内只创建这一个实例）
         self.config_manager = ConfigManager(_current_dir)
+        self.config_manager.add_preparer(self._prepare_config)
+        logger.info(f"配置加载完成（{self.config_manager.load_stats.get('source', 'default')}），"
+                    f"耗时 {self.config_manager.load_stats.get('ms', 0)}ms")
+        if self.config_manager.last_error:
+            logger.error(f"配置文件校验失败，已使用上次成功加载的配置，请修正后保存:\n{self.config_manager.last_error}")
         
         # 初始化数据库
         files_config = self.config.get("FILES", {})
         db_file = files_config.get("DATABASE_FILE", "xiuxian_data.db")
-        self.db = DataBase(db_file)
+        self.db = DataBase(
+            db_file,
+            cache_config=self.config.get("CACHE", {}),
+            db_config=self.config.get("DATABASE", {}),
+            log_config=self.config.get("COMBAT_LOG", {})
+        )
+        
+        # 按用户串行执行命令，避免同一玩家的并发命令互相覆盖
+        self.user_locks = UserLocks.from_config(self.config)
+        
+        # 世界Boss（全服共享血量，伤害定时批量写入）
+        self.world_boss = WorldBossManager(self.db, self.config_manager, self.config, self.user_locks)
         
         # 初始化各个处理器
         self.player_handler = PlayerHandler(self.db, self.config, self.config_manager)
         self.shop_handler = ShopHandler(self.db, self.config_manager, self.config)
-        self.combat_handler = CombatHandler(self.db, self.config, self.config_manager)
+        self.combat_handler = CombatHandler(self.db, self.config, self.config_manager, context=context)
         self.realm_handler = RealmHandler(self.db, self.config, self.config_manager)
         self.sect_handler = SectHandler(self.db, self.config, self.config_manager)
         self.equipment_handler = EquipmentHandler(self.db, self.config_manager)
         self.gongfa_handler = GongfaHandler(self.db, self.config_manager)
         self.misc_handler = MiscHandler(self.db)
+        self.boss_handler = BossHandler(self.db, self.config, self.config_manager, self.world_boss)
         
         # 注册命令
         self._register_commands()
     
     async def on_enable(self):
-        await self.db.init()
+        await self.db.init(self.config_manager)
+        await self.world_boss.start()
+        await self.config_manager.start_watching(self.config.get("CONFIG", {}).get("RELOAD_INTERVAL", 5))
         
         # 启动后台管理服务器
         try:
@@ -63,7 +85,8 @@ class XiuXianZhuangPlugin(Star):
             # 准备服务实例
             services = {
                 "database": self.db,
-                "config_manager": self.config_manager
+                "config_manager": self.config_manager,
+                "user_locks": self.user_locks
             }
             
             # 创建应用
@@ -86,9 +109,22 @@ class XiuXianZhuangPlugin(Star):
         self.logger.info("修仙转插件已启用")
     
     async def on_disable(self):
-        await self.db.close()
+        # 确保玩家缓存中的脏数据全部写回后再关闭数据库
+        try:
+            await self.config_manager.stop_watching()
+            await self.world_boss.stop()
+            await self.db.flush_players()
+        finally:
+            await self.db.close()
         self.logger.info("修仙转插件已禁用")
     
+    async def _prepare_config(self, old, new):
+        """items.json 或境界配置（功法升级经验由其计算）变化时按差异同步到数据库，
+        新的物品目录与新快照一起发布"""
+        if any(old.file_states.get(name) != new.file_states.get(name) for name in ("items.json", "level_config.json")):
+            return await self.db.prepare_snapshot(new)
+        return new
+    
     def _register_commands(self):
         # 玩家相关命令
         self.register_command("我要修仙", self.handle_start_xiuxian)
@@ -105,6 +141,11 @@ class XiuXianZhuangPlugin(Star):
         # 秘境相关命令
         self.register_command("秘境", self.handle_mijing)
         self.register_command("切磋", self.handle_qiecuo)
+        self.register_command("战斗回放", self.handle_replay)
+        
+        # 世界Boss相关命令
+        self.register_command("世界boss", self.handle_world_boss)
+        self.register_command("攻击boss", self.handle_attack_boss)
         
         # 境界相关命令
         self.register_command("突破", self.handle_breakthrough)
@@ -124,125 +165,98 @@ class XiuXianZhuangPlugin(Star):
         # 帮助相关命令
         self.register_command("修仙帮助", self.handle_help)
     
-    # 玩家相关命令处理
-    async def handle_start_xiuxian(self, event: AstrMessageEvent) -> str:
+    async def _run_serialized(self, event: AstrMessageEvent, handler) -> str:
+        """执行命令处理器并拼接输出
+        
+        同一用户的命令依次执行，避免读-改-写在await处交错导致更新丢失；不同用户互不影响。
+        """
         result = []
-        async for msg in self.player_handler.handle_start_xiuxian(event):
-            result.append(msg)
+        try:
+            async with self.user_locks.hold(str(event.get_author_id())):
+                async for msg in handler(event):
+                    result.append(msg)
+        except UserLockTimeout:
+            return "您的上一条指令仍在处理中，请稍后再试。"
         return "\n".join(result)
     
+    # 玩家相关命令处理
+    async def handle_start_xiuxian(self, event: AstrMessageEvent) -> str:
+        return await self._run_serialized(event, self.player_handler.handle_start_xiuxian)
+    
     async def handle_player_info(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.player_handler.handle_player_info(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.player_handler.handle_player_info)
     
     async def handle_sign_in(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.player_handler.handle_sign_in(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.player_handler.handle_sign_in)
     
     async def handle_meditate(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.player_handler.handle_meditate(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.player_handler.handle_meditate)
     
     # 坊市相关命令处理
     async def handle_shop(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.shop_handler.handle_shop(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.shop_handler.handle_shop)
     
     async def handle_backpack(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.shop_handler.handle_backpack(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.shop_handler.handle_backpack)
     
     async def handle_buy(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.shop_handler.handle_buy(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.shop_handler.handle_buy)
     
     async def handle_use_item(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.shop_handler.handle_use_item(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.shop_handler.handle_use_item)
     
     # 秘境相关命令处理
     async def handle_mijing(self, event: AstrMessageEvent) -> str:
         # 由于秘境功能可能需要特定的处理逻辑，这里暂时调用战斗处理器
         # 如果没有专门的秘境处理器，可以使用类似挑战的逻辑
-        result = []
         # 检查CombatHandler是否支持秘境功能，否则提供默认响应
         try:
-            async for msg in self.combat_handler.handle_challenge(event):
-                result.append(msg)
+            return await self._run_serialized(event, self.combat_handler.handle_challenge)
         except AttributeError:
-            result.append("秘境功能正在开发中，敬请期待！")
-        return "\n".join(result)
+            return "秘境功能正在开发中，敬请期待！"
     
     # 切磋相关命令处理
     async def handle_qiecuo(self, event: AstrMessageEvent) -> str:
         # 切磋功能可能也需要特定的处理逻辑
-        result = []
         try:
-            async for msg in self.combat_handler.handle_arena(event):
-                result.append(msg)
+            return await self._run_serialized(event, self.combat_handler.handle_arena)
         except AttributeError:
-            result.append("切磋功能正在开发中，敬请期待！")
-        return "\n".join(result)
+            return "切磋功能正在开发中，敬请期待！"
+    
+    async def handle_replay(self, event: AstrMessageEvent) -> str:
+        return await self._run_serialized(event, self.combat_handler.handle_replay)
+    
+    # 世界Boss相关命令处理
+    async def handle_world_boss(self, event: AstrMessageEvent) -> str:
+        return await self._run_serialized(event, self.boss_handler.handle_world_boss)
+    
+    async def handle_attack_boss(self, event: AstrMessageEvent) -> str:
+        return await self._run_serialized(event, self.boss_handler.handle_attack_boss)
     
     # 境界相关命令处理
     async def handle_breakthrough(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.realm_handler.handle_breakthrough(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.realm_handler.handle_breakthrough)
     
     # 宗门相关命令处理
     async def handle_sect(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.sect_handler.handle_sect(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.sect_handler.handle_sect)
     
     async def handle_join_sect(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.sect_handler.handle_join_sect(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.sect_handler.handle_join_sect)
     
     # 装备相关命令处理
     async def handle_equipment(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.equipment_handler.handle_equipment(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.equipment_handler.handle_equipment)
     
     async def handle_wear_equipment(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.equipment_handler.handle_wear_equipment(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.equipment_handler.handle_wear_equipment)
     
     # 功法相关命令处理
     async def handle_gongfa(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.gongfa_handler.handle_gongfa(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.gongfa_handler.handle_gongfa)
     
     async def handle_learn_gongfa(self, event: AstrMessageEvent) -> str:
-        result = []
-        async for msg in self.gongfa_handler.handle_learn_gongfa(event):
-            result.append(msg)
-        return "\n".join(result)
+        return await self._run_serialized(event, self.gongfa_handler.handle_learn_gongfa)
 
     async def handle_help(self, event: AstrMessageEvent) -> str:
         """处理修仙帮助指令"""
@@ -265,6 +279,12 @@ class XiuXianZhuangPlugin(Star):
 【秘境相关命令】
 - 秘境：探索神秘的修仙秘境
 - 切磋：与其他修仙者切磋技艺
+- 秘境/切磋 详细：查看逐回合战报
+- 战斗回放 [战斗编号]：重现最近一场（或指定）战斗的逐回合战报
+
+【世界Boss相关命令】
+- 世界boss：查看世界Boss状态和伤害排行
+- 攻击boss：与全服道友一起攻击世界Boss，击败后按伤害排行发放奖励
 
 【境界相关命令】
 - 突破：尝试突破境界限制
@@ -10,6 +10,8 @@ from quart import (
 )
 from astrbot.api import logger
 
+from ..core.replay import Replay
+
 
 admin_bp = Blueprint(
     "admin_bp",
@@ -112,14 +114,14 @@ async def index():
 @login_required
 async def manage_players():
     db = current_app.config["DATABASE"]
-    players = db.get_all_players()
+    players = await db.get_all_players()
     return await render_template("players.html", players=players)
 
 @admin_bp.route("/player/<int:player_id>")
 @login_required
 async def view_player(player_id):
     db = current_app.config["DATABASE"]
-    player = db.get_player_by_id(player_id)
+    player = await db.get_player_by_id(str(player_id))
     if not player:
         await flash("玩家不存在", "danger")
         return redirect(url_for("admin_bp.manage_players"))
@@ -130,7 +132,7 @@ async def view_player(player_id):
 @login_required
 async def manage_items():
     db = current_app.config["DATABASE"]
-    items = db.get_all_items()
+    items = await db.get_all_items()
     return await render_template("items.html", items=items)
 
 # --- 功法管理 ---
@@ -138,7 +140,7 @@ async def manage_items():
 @login_required
 async def manage_gongfas():
     db = current_app.config["DATABASE"]
-    gongfas = db.get_all_gongfas()
+    gongfas = await db.get_all_gongfas()
     return await render_template("gongfas.html", gongfas=gongfas)
 
 # --- 装备管理 ---
@@ -154,5 +156,48 @@ async def manage_equipments():
 @login_required
 async def manage_sects():
     db = current_app.config["DATABASE"]
-    sects = db.get_all_sects()
-    return await render_template("sects.html", sects=sects)
\ No newline at end of file
+    sects = await db.get_all_sects()
+    return await render_template("sects.html", sects=sects)
+
+# --- 运行统计 ---
+@admin_bp.route("/stats/db")
+@login_required
+async def db_stats():
+    db = current_app.config["DATABASE"]
+    return jsonify(db.get_stats())
+
+
+@admin_bp.route("/stats/locks")
+@login_required
+async def lock_stats():
+    user_locks = current_app.config["USER_LOCKS"]
+    return jsonify(user_locks.stats())
+
+
+# --- 战斗回放 ---
+@admin_bp.route("/combat_logs/<log_id>/replay")
+@login_required
+async def combat_replay(log_id):
+    """根据回放记录重新生成逐回合战报"""
+    db = current_app.config["DATABASE"]
+    log = await db.get_combat_log(log_id)
+    if not log or not log.replay:
+        return jsonify({"error": "战斗不存在或没有回放记录"}), 404
+    try:
+        replay = Replay.unpack(log.replay)
+        transcript = replay.transcript(log.defender_id)
+    except Exception as e:
+        return jsonify({"error": f"回放记录无法解析: {e}"}), 400
+    return jsonify({
+        "log_id": log.log_id,
+        "attacker_id": log.attacker_id,
+        "defender_id": log.defender_id,
+        "result": log.result,
+        "engine_version": replay.engine_version,
+        "seed": replay.seed,
+        "a_hp": replay.a_hp,
+        "a_stats": replay.a_stats,
+        "b_hp": replay.b_hp,
+        "b_stats": replay.b_stats,
+        "transcript": transcript
+    })
\ No newline at end of file
@@ -1,9 +1,10 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Dict, List, Optional
 import json
 
 
-@dataclass
+# slots=True：不创建实例__dict__，大量加载玩家时更省内存、构造更快
+@dataclass(slots=True)
 class Player:
     user_id: str
     name: str = "修仙者"
@@ -35,6 +36,14 @@ class Player:
         if self.gongfa_ids is None:
             self.gongfa_ids = []
     
+    def clone(self) -> "Player":
+        """复制玩家对象（列表和字典字段独立复制）"""
+        return replace(
+            self,
+            gongfa_ids=list(self.gongfa_ids),
+            equipment_ids=dict(self.equipment_ids)
+        )
+    
     def get_level(self, level_config: List[Dict]) -> Dict:
         """获取当前境界信息"""
         if self.level_index < len(level_config):
@@ -73,6 +82,24 @@ class Player:
         return stats
 
 
+@dataclass
+class PlayerProfile:
+    """玩家完整档案：玩家信息及其装备、功法记录"""
+    player: Player
+    equipments: Dict[str, Dict] = None  # 装备ID: 装备信息
+    gongfas: List[Dict] = None
+    
+    def __post_init__(self):
+        if self.equipments is None:
+            self.equipments = {}
+        if self.gongfas is None:
+            self.gongfas = []
+    
+    def get_combat_stats(self) -> Dict:
+        """获取包含装备和功法加成的战斗属性"""
+        return self.player.get_combat_stats(self.equipments, self.gongfas)
+
+
 @dataclass
 class Item:
     item_id: str
@@ -146,6 +173,7 @@ class CombatLog:
     spirit_stone_gained: int
     timestamp: str
     drop_items: List[Dict] = None
+    replay: Optional[bytes] = None  # 回放记录（core.replay.Replay.pack() 的结果）
     
     def __post_init__(self):
         if self.drop_items is None:
@@ -0,0 +1,32 @@
+# conftest.py
+"""测试公共设置
+
+插件目录本身就是一个包（模块之间使用相对导入），这里按插件名注册为顶层包，
+测试中统一通过 astrbot_plugin_xiuxianzhuan.xxx 导入。
+"""
+
+import importlib.util
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+PACKAGE = "astrbot_plugin_xiuxianzhuan"
+
+if PACKAGE not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        PACKAGE, PLUGIN_DIR / "__init__.py", submodule_search_locations=[str(PLUGIN_DIR)]
+    )
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules[PACKAGE] = _module
+    _spec.loader.exec_module(_module)
+
+
+@pytest.fixture
+def plugin_dir(tmp_path) -> Path:
+    """临时插件目录：复制插件自带的配置文件（不含编译缓存），数据库放在 data/ 下"""
+    shutil.copytree(PLUGIN_DIR / "config", tmp_path / "config", ignore=shutil.ignore_patterns("__cache__"))
+    (tmp_path / "data").mkdir()
+    return tmp_path
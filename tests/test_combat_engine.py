@@ -0,0 +1,147 @@
+# test_combat_engine.py
+"""战斗引擎的性质测试
+
+用固定种子生成大量随机对局，把 O(1) 结算 resolve() 与原先逐回合循环的
+参考实现逐项比对（回合数、胜负、剩余血量、造成伤害、逐回合战报），
+并检查回放记录打包/解包后重算的结果不变。
+"""
+
+import random
+import struct
+
+import pytest
+
+from astrbot_plugin_xiuxianzhuan.core.combat_engine import iter_rounds, resolve, summarize
+from astrbot_plugin_xiuxianzhuan.core.replay import (
+    ENGINE_VERSION, Replay, battle_rng, new_seed, record
+)
+
+CASES = 20000
+SEED = 20240611
+
+
+def _loop_battle(a_hp, a_stats, b_hp, b_stats, b_name="对手"):
+    """原先秘境战斗的逐回合循环（参考实现）"""
+    lines = []
+    a_hits = b_hits = rounds = 0
+    a_first = a_stats["speed"] >= b_stats["speed"]
+    a_damage = max(1, a_stats["attack"] - b_stats["defense"])
+    b_damage = max(1, b_stats["attack"] - a_stats["defense"])
+    round_num = 1
+    while a_hp > 0 and b_hp > 0:
+        rounds = round_num
+        lines.append(f"\n第{round_num}回合：")
+        if a_first:
+            b_hp -= a_damage
+            a_hits += 1
+            lines.append(f"你对{b_name}造成了{a_damage}点伤害！")
+            if b_hp <= 0:
+                lines.append(f"{b_name}被击败了！")
+                break
+            a_hp -= b_damage
+            b_hits += 1
+            lines.append(f"{b_name}对你造成了{b_damage}点伤害！")
+            if a_hp <= 0:
+                lines.append("你被击败了！")
+                break
+        else:
+            a_hp -= b_damage
+            b_hits += 1
+            lines.append(f"{b_name}对你造成了{b_damage}点伤害！")
+            if a_hp <= 0:
+                lines.append("你被击败了！")
+                break
+            b_hp -= a_damage
+            a_hits += 1
+            lines.append(f"你对{b_name}造成了{a_damage}点伤害！")
+            if b_hp <= 0:
+                lines.append(f"{b_name}被击败了！")
+                break
+        round_num += 1
+    return {
+        "a_first": a_first, "rounds": rounds, "a_hp": a_hp, "b_hp": b_hp,
+        "a_hits": a_hits, "b_hits": b_hits, "lines": lines
+    }
+
+
+def _random_stats(rng: random.Random) -> dict:
+    # 攻防区间重叠较多，覆盖 攻击 <= 防御 时保底1点伤害的情况；速度范围小，常出现相同速度
+    return {"attack": rng.randint(0, 60), "defense": rng.randint(0, 60), "speed": rng.randint(0, 5)}
+
+
+def _random_hp(rng: random.Random) -> int:
+    # 偶尔以0或负血量开战
+    return rng.randint(-5, 400) if rng.random() < 0.05 else rng.randint(1, 400)
+
+
+def _random_battles(count: int = CASES):
+    rng = random.Random(SEED)
+    for _ in range(count):
+        yield _random_hp(rng), _random_stats(rng), _random_hp(rng), _random_stats(rng)
+
+
+def test_resolve_matches_round_loop():
+    for a_hp, a_stats, b_hp, b_stats in _random_battles():
+        expected = _loop_battle(a_hp, a_stats, b_hp, b_stats)
+        result = resolve(a_hp, a_stats, b_hp, b_stats)
+        case = (a_hp, a_stats, b_hp, b_stats)
+
+        assert result.a_first == expected["a_first"], case
+        assert result.rounds == expected["rounds"], case
+        assert (result.a_hp, result.b_hp) == (expected["a_hp"], expected["b_hp"]), case
+        assert (result.a_hits, result.b_hits) == (expected["a_hits"], expected["b_hits"]), case
+        assert result.a_damage_dealt == b_hp - expected["b_hp"], case
+        assert result.b_damage_dealt == a_hp - expected["a_hp"], case
+        if a_hp > 0 and b_hp > 0:
+            # 恰好一方倒下
+            assert result.a_won == (expected["b_hp"] <= 0), case
+            assert (result.a_hp > 0) != (result.b_hp > 0), case
+
+
+def test_round_text_matches_round_loop():
+    for a_hp, a_stats, b_hp, b_stats in _random_battles(CASES // 10):
+        expected = _loop_battle(a_hp, a_stats, b_hp, b_stats, "妖兽")
+        result = resolve(a_hp, a_stats, b_hp, b_stats)
+        assert list(iter_rounds(result, "妖兽")) == expected["lines"], (a_hp, a_stats, b_hp, b_stats)
+
+
+def test_speed_tie_goes_to_challenger():
+    stats = {"attack": 10, "defense": 0, "speed": 3}
+    result = resolve(10, stats, 10, dict(stats))
+    assert result.a_first and result.a_won
+    assert result.rounds == 1 and result.b_hits == 0
+
+
+def test_replay_round_trip():
+    for a_hp, a_stats, b_hp, b_stats in _random_battles(CASES // 10):
+        seed = new_seed()
+        replay = record(seed, a_hp, dict(a_stats, hp=a_hp), b_hp, b_stats)
+        data = replay.pack()
+        assert len(data) == 41
+        restored = Replay.unpack(data)
+        assert restored == replay
+        assert restored.resolve() == resolve(a_hp, a_stats, b_hp, b_stats)
+        assert restored.transcript("妖兽") == replay.transcript("妖兽")
+        assert restored.transcript("妖兽")[-1] == summarize(restored.resolve(), "妖兽")
+
+
+def test_replay_keeps_extreme_values():
+    stats = {"attack": 2**31 - 1, "defense": -2**31, "speed": 0}
+    replay = record(2**64 - 1, 2**31 - 1, stats, 1, stats)
+    assert Replay.unpack(replay.pack()) == replay
+    with pytest.raises(struct.error):
+        record(0, 2**31, stats, 1, stats).pack()
+
+
+def test_replay_rejects_other_engine_versions():
+    stats = {"attack": 1, "defense": 1, "speed": 1}
+    data = bytearray(record(1, 10, stats, 10, stats).pack())
+    data[0] = ENGINE_VERSION + 1
+    with pytest.raises(ValueError):
+        Replay.unpack(bytes(data)).resolve()
+
+
+def test_battle_rng_is_deterministic():
+    seed = new_seed()
+    first, second = battle_rng(seed), battle_rng(seed)
+    assert [first.random() for _ in range(5)] == [second.random() for _ in range(5)]
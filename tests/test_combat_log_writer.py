@@ -0,0 +1,51 @@
+# test_combat_log_writer.py
+"""战斗日志后台写入器：关闭后队列的未完成计数归零，join() 不会挂起"""
+
+import asyncio
+
+from astrbot_plugin_xiuxianzhuan.data.combat_log_writer import CombatLogWriter
+from astrbot_plugin_xiuxianzhuan.models import CombatLog
+
+
+def _log(i: int) -> CombatLog:
+    return CombatLog(
+        log_id=str(i), attacker_id="a", defender_id="b", result="win",
+        damage=i, spirit_stone_gained=0, timestamp="2024-01-01 00:00:00"
+    )
+
+
+def test_close_marks_stop_sentinel_done():
+    async def scenario():
+        written = []
+
+        async def write_batch(batch):
+            written.extend(batch)
+
+        writer = CombatLogWriter(write_batch, batch_size=3, flush_interval=60)
+        writer.start()
+        for i in range(10):
+            assert await writer.submit(_log(i))
+        await writer.close()
+        await asyncio.wait_for(writer._queue.join(), 1)
+        return written
+
+    written = asyncio.run(scenario())
+    assert [log.log_id for log in written] == [str(i) for i in range(10)]
+
+
+def test_close_drains_items_left_behind_stop():
+    async def scenario():
+        written = []
+
+        async def write_batch(batch):
+            written.extend(batch)
+
+        writer = CombatLogWriter(write_batch, batch_size=2)
+        # 后台任务未启动：日志留在队列中，由 close() 写完
+        writer._queue.put_nowait(_log(0))
+        writer._queue.put_nowait(_log(1))
+        await writer.close()
+        await asyncio.wait_for(writer._queue.join(), 1)
+        return written
+
+    assert len(asyncio.run(scenario())) == 2
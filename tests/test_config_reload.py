@@ -0,0 +1,83 @@
+# test_config_reload.py
+"""配置加载与热重载
+
+新的物品配置和由数据库构建的物品目录随同一个快照发布：同步物品配置
+（写数据库、重建目录）期间，命令读到的仍是旧配置和旧目录，发布后两者同时是新的。
+编译缓存在编译代码变化后作废，校验失败时也不会回退到旧代码编译的快照。
+"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("astrbot")
+
+from astrbot_plugin_xiuxianzhuan.core import config_manager as config_module
+from astrbot_plugin_xiuxianzhuan.core.config_manager import ConfigManager
+from astrbot_plugin_xiuxianzhuan.core.config_models import ConfigError
+from astrbot_plugin_xiuxianzhuan.data.data_manager import DataBase
+
+
+def test_catalog_is_published_with_snapshot(plugin_dir):
+    async def scenario():
+        config_manager = ConfigManager(str(plugin_dir), use_cache=False)
+        db = DataBase(str(plugin_dir / "data"))
+        await db.init(config_manager)
+        try:
+            config_manager.add_preparer(lambda old, new: db.prepare_snapshot(new))
+            seen = []
+            sync = db._sync_items
+
+            async def observed_sync(*args):
+                seen.append(("before", "copper_sword" in config_manager.items, db.catalog.get_item("copper_sword") is not None))
+                report = await sync(*args)
+                seen.append(("after", "copper_sword" in config_manager.items, db.catalog.get_item("copper_sword") is not None))
+                return report
+
+            db._sync_items = observed_sync
+            items_path = plugin_dir / "config" / "items.json"
+            items = json.loads(items_path.read_text(encoding="utf-8"))
+            items["copper_sword"] = {"name": "铜剑", "description": "铜剑", "type": "equipment", "price": 50}
+            items_path.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+
+            old_catalog = db.catalog
+            assert await config_manager.reload_async()
+            published = (
+                "copper_sword" in config_manager.items,
+                db.catalog.get_item("copper_sword") is not None,
+                config_manager.snapshot.catalog is db.catalog,
+                db.catalog.version > old_catalog.version
+            )
+
+            # 只改了与物品无关的配置：沿用当前目录
+            catalog = db.catalog
+            monsters_path = plugin_dir / "config" / "monsters.json"
+            monsters_path.write_text(monsters_path.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+            assert await config_manager.reload_async()
+            return seen, published, db.catalog is catalog
+        finally:
+            await db.close()
+
+    seen, published, kept = asyncio.run(scenario())
+    # 同步期间（包括写入数据库之后）命令仍读到旧配置和旧目录
+    assert seen[:2] == [("before", False, False), ("after", False, False)]
+    assert published == (True, True, True, True)
+    assert kept
+
+
+def test_compiled_cache_is_keyed_on_compiler_code(plugin_dir, monkeypatch):
+    assert ConfigManager(str(plugin_dir)).load_stats["source"] == "compiled"
+    assert ConfigManager(str(plugin_dir)).load_stats["source"] == "cache"
+
+    # 编译代码（如 realm_rules 中的常量）变化后，配置文件未变也重新编译
+    monkeypatch.setattr(config_module, "compiler_fingerprint", lambda: "changed")
+    assert ConfigManager(str(plugin_dir)).load_stats["source"] == "compiled"
+    assert ConfigManager(str(plugin_dir)).load_stats["source"] == "cache"
+
+    # 配置校验失败时，旧代码编译的缓存不能作为回退
+    monkeypatch.setattr(config_module, "compiler_fingerprint", lambda: "changed again")
+    (plugin_dir / "config" / "level_config.json").write_text("[]", encoding="utf-8")
+    with pytest.raises(ConfigError):
+        ConfigManager(str(plugin_dir))
@@ -0,0 +1,64 @@
+# test_player_cache.py
+"""玩家写回缓存：关闭数据库时不丢失尚未写入的玩家数据"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("astrbot")
+
+from astrbot_plugin_xiuxianzhuan.core.config_manager import ConfigManager
+from astrbot_plugin_xiuxianzhuan.data.data_manager import DataBase
+from astrbot_plugin_xiuxianzhuan.models import Player
+
+
+def _spirit_stones(plugin_dir):
+    conn = sqlite3.connect(plugin_dir / "data" / "xiuxianzhuan_data.db")
+    try:
+        return dict(conn.execute("SELECT user_id, spirit_stone FROM players"))
+    finally:
+        conn.close()
+
+
+def test_close_writes_back_dirty_players(plugin_dir):
+    async def scenario():
+        db = DataBase(str(plugin_dir / "data"))
+        await db.init(ConfigManager(str(plugin_dir), use_cache=False))
+        for i in range(3):
+            await db.create_player(Player(user_id=f"u{i}", spirit_stone=0))
+        for i in range(3):
+            await db.adjust_currency(f"u{i}", spirit_stone=10 * (i + 1))
+        assert db.player_cache.dirty_count == 3
+        await db.close()
+
+    asyncio.run(scenario())
+    assert _spirit_stones(plugin_dir) == {"u0": 10, "u1": 20, "u2": 30}
+
+
+def test_cancelled_flush_keeps_players_dirty(plugin_dir):
+    async def scenario():
+        db = DataBase(str(plugin_dir / "data"))
+        await db.init(ConfigManager(str(plugin_dir), use_cache=False))
+        await db.create_player(Player(user_id="u1", spirit_stone=0))
+        await db.adjust_currency("u1", spirit_stone=50)
+
+        write_players = db._write_players
+
+        async def slow_write(players):
+            await asyncio.sleep(0.1)
+            await write_players(players)
+
+        db._write_players = slow_write
+        # 模拟关闭时定时写回正在写入就被取消
+        flush = asyncio.create_task(db.flush_players())
+        await asyncio.sleep(0.05)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        db._write_players = write_players
+        await db.close()
+
+    asyncio.run(scenario())
+    assert _spirit_stones(plugin_dir) == {"u1": 50}
@@ -0,0 +1,138 @@
+# test_query_plans.py
+"""查询计划回归检查：DataBase 执行的每条带条件的语句都必须走索引
+
+执行一遍覆盖各个 DataBase 方法的场景，从查询统计中取出实际执行过的SQL，
+逐条 EXPLAIN QUERY PLAN；出现不带索引的全表扫描即失败（有意的全量读取除外）。
+"""
+
+import asyncio
+import re
+import sqlite3
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("astrbot")
+
+from astrbot_plugin_xiuxianzhuan.core.config_manager import ConfigManager
+from astrbot_plugin_xiuxianzhuan.data.data_manager import DataBase
+from astrbot_plugin_xiuxianzhuan.models import CombatLog, Player
+
+# 有意的全量读取（后台列表、启动时构建物品目录和匹配索引、同步物品配置）
+FULL_SCANS = {
+    "SELECT * FROM players",
+    "SELECT user_id, level_index FROM players",
+    "SELECT * FROM players WHERE combat_power = 0",
+    "SELECT * FROM items",
+    "SELECT * FROM equipments",
+    "SELECT * FROM gongfas",
+    "SELECT id, name, effect FROM danyao",
+    "SELECT key, hash FROM config_hashes WHERE scope = ?",
+}
+
+# 列表查询：语句开头 -> 允许全表扫描的驱动表（关联的其他表仍须走索引）
+LIST_QUERIES = {
+    "SELECT s.id, s.name, s.leader_id AS master_id,": "s",     # get_all_sects
+}
+
+# 不带索引的表扫描，如 "SCAN players"（旧版SQLite为 "SCAN TABLE players"）
+_TABLE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$")
+
+
+async def _exercise(db: DataBase):
+    """调用 DataBase 的各个读写方法"""
+    for i in range(20):
+        await db.create_player(Player(user_id=f"u{i}", name=f"玩家{i}", level_index=i % 5))
+    player = await db.get_player_by_id("u1")
+    player.spirit_stone += 10
+    await db.update_player(player)
+    await db.adjust_currency("u2", spirit_stone=5)
+    await db.flush_players()
+
+    await db.add_item_to_inventory("u1", "hp_potion", 2)
+    await db.remove_item_from_inventory("u1", "hp_potion", 1)
+    await db.get_player_inventory("u1")
+
+    await db.add_combat_log(CombatLog("log1", "u1", "u2", "win", 10, 5, "t"))
+    await db.get_latest_combat_log("u1")
+    await db.get_combat_log("log1")
+
+    db.matchmaking.ready = False
+    await db.find_arena_opponent(player)
+    await db.get_power_ranking()
+
+    sect_id = await db.create_sect("青云门", "u1")
+    await db.get_sect_by_name("青云门")
+    await db.get_sect_by_id(sect_id)
+    await db.get_sect_members(sect_id)
+    await db.get_all_sects()
+    await db.delete_sect(sect_id)
+
+    await db.create_world_boss("b1", "demon", 100, "2026-01-01 00:00:00")
+    await db.get_active_world_boss()
+    await db.save_world_boss_progress("b1", 50, {"u1": (50, 1)})
+    await db.get_world_boss_damage("b1")
+    await db.begin_world_boss_settlement("b1", "2026-01-01 00:01:00", {"u1": (100, ["hp_potion"])})
+    await db.get_unsettled_world_bosses()
+    await db.get_world_boss_rewards("b1")
+    await db.pay_world_boss_reward("b1", "u1")
+    await db.finish_world_boss("b1", "2026-01-01 00:01:00")
+    await db.get_last_world_boss_defeat_time()
+
+    await db.get_all_players()
+    await db.get_all_items()
+
+
+def _plan(conn: sqlite3.Connection, sql: str):
+    params = [None] * sql.count("?")
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def test_every_filtered_query_uses_an_index(plugin_dir):
+    async def scenario():
+        db = DataBase(str(plugin_dir / "data"))
+        await db.init(ConfigManager(str(plugin_dir), use_cache=False))
+        try:
+            db.instrumentation.reset()
+            await _exercise(db)
+            return list(db.instrumentation.statements)
+        finally:
+            await db.close()
+
+    statements = asyncio.run(scenario())
+    queries = [sql for sql in statements if sql.split(" ", 1)[0] in ("SELECT", "UPDATE", "DELETE")]
+    assert len(queries) >= 20, queries
+
+    conn = sqlite3.connect(plugin_dir / "data" / "xiuxianzhuan_data.db")
+    try:
+        failures = {}
+        for sql in queries:
+            if sql in FULL_SCANS:
+                continue
+            allowed = {table for prefix, table in LIST_QUERIES.items() if sql.startswith(prefix)}
+            scans = [
+                detail for detail in _plan(conn, sql)
+                if (match := _TABLE_SCAN.match(detail)) and not allowed & set(match.groups())
+            ]
+            if scans:
+                failures[sql] = scans
+    finally:
+        conn.close()
+    assert not failures, failures
+
+
+def test_secondary_indexes_exist_after_fresh_install(plugin_dir):
+    from astrbot_plugin_xiuxianzhuan.data.migration import SECONDARY_INDEXES
+
+    async def scenario():
+        db = DataBase(str(plugin_dir / "data"))
+        await db.init(ConfigManager(str(plugin_dir), use_cache=False))
+        await db.close()
+
+    asyncio.run(scenario())
+    conn = sqlite3.connect(plugin_dir / "data" / "xiuxianzhuan_data.db")
+    try:
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+    assert {name for name, _, _ in SECONDARY_INDEXES} <= names
@@ -0,0 +1,39 @@
+# test_realm_table.py
+"""境界表编译：中境界（天道惩罚、更重的灵气损失）从炼虚的第一个小境界开始，随配置的境界列表变化"""
+
+import json
+from pathlib import Path
+
+from astrbot_plugin_xiuxianzhuan.core.config_models import LevelConfig, load_list
+from astrbot_plugin_xiuxianzhuan.core.realm_rules import HEAVENLY_PUNISHMENT_CHANCE
+from astrbot_plugin_xiuxianzhuan.core.realm_table import RealmTable
+
+LEVEL_CONFIG = Path(__file__).resolve().parent.parent / "config" / "level_config.json"
+
+
+def _compile(levels) -> RealmTable:
+    return RealmTable.compile(load_list(LevelConfig, "level_config.json", levels))
+
+
+def _first_middle(table: RealmTable):
+    return next((realm.name for realm in table.realms if realm.punishment_chance > 0), None)
+
+
+def test_middle_realms_start_at_first_lianxu_stage():
+    levels = json.loads(LEVEL_CONFIG.read_text(encoding="utf-8"))
+    table = _compile(levels)
+    assert _first_middle(table) == "炼虚初期"
+    later = [realm for realm in table.realms if realm.major in ("炼虚", "合体", "大乘")]
+    assert later and all(realm.punishment_chance == HEAVENLY_PUNISHMENT_CHANCE for realm in later)
+
+    # 前面多配几个小境界，起点跟着炼虚走，而不是固定的下标
+    extra = [{"name": f"练气{n}层", "spirit": 0} for n in ("十一", "十二")]
+    shifted = _compile(levels[:10] + extra + levels[10:])
+    assert _first_middle(shifted) == "炼虚初期"
+    assert shifted.by_name("炼虚初期").index == table.by_name("炼虚初期").index + 2
+    assert shifted.by_name("化神后期").punishment_chance == 0.0
+
+
+def test_no_middle_realms_without_lianxu():
+    table = _compile([{"name": "练气一层"}, {"name": "筑基初期", "spirit": 10}])
+    assert _first_middle(table) is None
@@ -0,0 +1,164 @@
+# test_rows_benchmark.py
+"""玩家行解码的微基准
+
+对比 PLAYER_CODEC + slots=True 的 Player 与改动前的做法（普通 dataclass、
+每行都 json.loads）：解码结果一致，内存占用更少，耗时不退化。
+行数可通过环境变量 XIUXIAN_BENCH_ROWS 调整，默认值保证在CI中几秒内完成。
+"""
+
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import asdict, fields, make_dataclass
+
+import pytest
+
+aiosqlite = pytest.importorskip("aiosqlite")
+
+from astrbot_plugin_xiuxianzhuan.data.rows import PLAYER_CODEC, fetch_all
+from astrbot_plugin_xiuxianzhuan.models import Player
+
+ROWS = int(os.environ.get("XIUXIAN_BENCH_ROWS", "20000"))
+
+# 与 migration 中 players 表的列顺序一致（与 Player 字段顺序不同）
+_PLAYERS_DDL = """
+CREATE TABLE players (
+    user_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    level_index INTEGER NOT NULL,
+    spirit INTEGER NOT NULL,
+    spiritual_root TEXT NOT NULL,
+    max_hp INTEGER NOT NULL,
+    current_hp INTEGER NOT NULL,
+    attack INTEGER NOT NULL,
+    defense INTEGER NOT NULL,
+    speed INTEGER NOT NULL,
+    spirit_stone INTEGER NOT NULL,
+    last_sign_in TEXT NOT NULL,
+    create_time TEXT NOT NULL,
+    update_time TEXT NOT NULL,
+    sect_id TEXT,
+    sect_position TEXT NOT NULL,
+    gongfa_ids TEXT NOT NULL,
+    equipment_ids TEXT NOT NULL,
+    combat_power INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+_DEFAULT_EQUIPMENT = json.dumps({"weapon": "", "armor": "", "shoes": "", "accessory": ""})
+
+# 改动前的玩家模型：同样的字段，但每个实例带 __dict__
+LegacyPlayer = make_dataclass(
+    "LegacyPlayer", [(f.name, f.type, f.default) for f in fields(Player)]
+)
+
+
+def _legacy_decode(columns, rows):
+    """改动前的解码方式：每行都重新解析JSON字段"""
+    names = {f.name for f in fields(Player)}
+    players = []
+    for row in rows:
+        kwargs = {column: value for column, value in zip(columns, row) if column in names}
+        kwargs["gongfa_ids"] = json.loads(kwargs["gongfa_ids"])
+        kwargs["equipment_ids"] = json.loads(kwargs["equipment_ids"])
+        players.append(LegacyPlayer(**kwargs))
+    return players
+
+
+async def _open_players_db(rows: int):
+    conn = await aiosqlite.connect(":memory:")
+    await conn.execute(_PLAYERS_DDL)
+    await conn.executemany(
+        "INSERT INTO players VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                f"user{i}", f"道友{i}", i % 30, i * 7, "金灵根", 100 + i, 100 + i, 10 + i % 50, 5 + i % 20,
+                i % 15, 100 + i, "", "2026-01-01 00:00:00", "2026-01-01 00:00:00",
+                "sect1" if i % 3 == 0 else None, "弟子" if i % 3 == 0 else "",
+                '["gongfa_1"]' if i % 2 else "[]", _DEFAULT_EQUIPMENT, 0
+            )
+            for i in range(rows)
+        ]
+    )
+    await conn.commit()
+    return conn
+
+
+async def _fetch_raw(conn):
+    async with conn.execute("SELECT * FROM players") as cursor:
+        columns = [column[0] for column in cursor.description]
+        return columns, await cursor.fetchall()
+
+
+def _best_of(repeat: int, run) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _allocated(build) -> int:
+    tracemalloc.start()
+    try:
+        result = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def test_codec_matches_legacy_decode_in_any_column_order():
+    async def run():
+        conn = await _open_players_db(50)
+        try:
+            columns, rows = await _fetch_raw(conn)
+            decoded = await fetch_all(conn, "SELECT * FROM players", codec=PLAYER_CODEC)
+            # 列顺序打乱后按列名解码，结果不变
+            shuffled = await fetch_all(
+                conn, f"SELECT {', '.join(reversed(columns))} FROM players", codec=PLAYER_CODEC
+            )
+        finally:
+            await conn.close()
+        return _legacy_decode(columns, rows), decoded, shuffled
+
+    legacy, decoded, shuffled = asyncio.run(run())
+    assert [asdict(p) for p in decoded] == [asdict(p) for p in legacy]
+    assert [asdict(p) for p in shuffled] == [asdict(p) for p in legacy]
+    # JSON解析结果有缓存，但每个玩家拿到的是独立副本
+    decoded[0].equipment_ids["weapon"] = "sword"
+    decoded[0].gongfa_ids.append("gongfa_2")
+    assert decoded[2].equipment_ids["weapon"] == ""
+    assert decoded[2].gongfa_ids == []
+
+
+def test_slotted_player_decode_is_smaller_and_not_slower():
+    async def run():
+        conn = await _open_players_db(ROWS)
+        try:
+            return await _fetch_raw(conn)
+        finally:
+            await conn.close()
+
+    columns, rows = asyncio.run(run())
+    description = [(column,) * 7 for column in columns]
+    decode = PLAYER_CODEC.compile(description)
+
+    assert not hasattr(Player(user_id="x"), "__dict__")
+
+    codec_bytes = _allocated(lambda: [decode(row) for row in rows])
+    legacy_bytes = _allocated(lambda: _legacy_decode(columns, rows))
+    codec_seconds = _best_of(3, lambda: [decode(row) for row in rows])
+    legacy_seconds = _best_of(3, lambda: _legacy_decode(columns, rows))
+
+    print(
+        f"\n{ROWS} 行: codec {codec_seconds * 1000:.1f}ms / {codec_bytes / 2**20:.1f}MB，"
+        f"改动前 {legacy_seconds * 1000:.1f}ms / {legacy_bytes / 2**20:.1f}MB"
+    )
+    assert codec_bytes < legacy_bytes * 0.85
+    # 计时只防止明显退化，阈值留足余量以免CI机器抖动误报
+    assert codec_seconds < legacy_seconds * 1.5
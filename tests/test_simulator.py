@@ -0,0 +1,65 @@
+# test_simulator.py
+"""离线平衡模拟器
+
+向量化结算与 combat_engine.resolve 逐场一致；装备/功法加成与插件运行时
+（物品同步 -> 物品目录 -> get_combat_stats）得到的结果一致。
+"""
+
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from astrbot_plugin_xiuxianzhuan.core import simulator
+from astrbot_plugin_xiuxianzhuan.models import Player
+
+
+def test_resolve_batch_matches_engine():
+    assert simulator.self_check(5000) == 0
+
+
+def test_bonuses_match_runtime_catalog(plugin_dir):
+    pytest.importorskip("aiosqlite")
+    pytest.importorskip("astrbot")
+    from astrbot_plugin_xiuxianzhuan.core.config_manager import ConfigManager
+    from astrbot_plugin_xiuxianzhuan.data.data_manager import DataBase
+
+    config = simulator.load_config(plugin_dir / "config")
+    catalog = simulator.synced_catalog(config)
+    assert catalog.by_type("equipment") and catalog.all_gongfas()
+
+    async def scenario():
+        db = DataBase(str(plugin_dir / "data"))
+        await db.init(ConfigManager(str(plugin_dir)))
+        try:
+            runtime = {}
+            for record in catalog.by_type("equipment"):
+                player = Player(user_id="u1")
+                player.equipment_ids = {record.get("slot", "unknown"): record["item_id"]}
+                runtime[record["item_id"]] = db.get_combat_stats(player)
+            for record in catalog.all_gongfas():
+                runtime[record["id"]] = db.get_combat_stats(Player(user_id="u1", gongfa_ids=[record["id"]]))
+            return dict(db.catalog.records), runtime
+        finally:
+            await db.close()
+
+    records, runtime = asyncio.run(scenario())
+    assert {key: dict(value) for key, value in records.items()} == {
+        key: dict(value) for key, value in catalog.records.items()
+    }
+
+    base = Player(user_id="")
+    base_stats = (base.max_hp, base.attack, base.defense, base.speed)
+    for record in catalog.by_type("equipment"):
+        bonus = simulator._bonus(equipment=record)
+        stats = runtime[record["item_id"]]
+        assert tuple(stats[stat] for stat in ("hp", "attack", "defense", "speed")) == tuple(
+            value + extra for value, extra in zip(base_stats, bonus)
+        )
+    for record in catalog.all_gongfas():
+        bonus = simulator._bonus(gongfa=record)
+        stats = runtime[record["id"]]
+        assert tuple(stats[stat] for stat in ("hp", "attack", "defense", "speed")) == tuple(
+            value + extra for value, extra in zip(base_stats, bonus)
+        )
@@ -0,0 +1,304 @@
+# test_world_boss_load.py
+"""世界Boss并发压测
+
+数百名玩家同时通过 BossHandler 反复攻击同一个Boss直到击败：
+伤害统计与Boss血量一致，伤害按批写入而不是每次攻击一次，结算后奖励全部到账；
+结算时玩家正在执行的旧命令不会覆盖奖励，也不会拖住其他玩家的发放；
+结算中断（发放失败或重启）后由 start() 继续发放，刷新间隔在重启后继续计算。
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("astrbot")
+
+from astrbot_plugin_xiuxianzhuan.core.config_manager import ConfigManager
+from astrbot_plugin_xiuxianzhuan.core.user_lock import UserLocks
+from astrbot_plugin_xiuxianzhuan.core.world_boss import WorldBossManager
+from astrbot_plugin_xiuxianzhuan.data.data_manager import DataBase
+from astrbot_plugin_xiuxianzhuan.handlers.boss_handler import BossHandler
+from astrbot_plugin_xiuxianzhuan.models import Player
+
+PLAYERS = 300
+
+
+class _Event:
+    """只提供处理器用到的接口的消息事件"""
+
+    def __init__(self, user_id: str, message: str):
+        self.user_id = user_id
+        self.message = message
+
+    def get_author_id(self):
+        return self.user_id
+
+    def get_event_message(self):
+        return self.message
+
+
+async def _open(plugin_dir):
+    config_manager = ConfigManager(str(plugin_dir))
+    db = DataBase(str(plugin_dir / "data"))
+    await db.init(config_manager)
+    return db, config_manager
+
+
+def _chip(world_boss: WorldBossManager, db: DataBase, player: Player):
+    """只造成少量伤害、不会击败Boss的一次攻击"""
+    stats = dict(db.get_combat_stats(player), attack=world_boss.boss.defense + 1)
+    assert not world_boss.attack(player, stats).killed
+
+
+def _query(plugin_dir, sql: str):
+    conn = sqlite3.connect(plugin_dir / "data" / "xiuxianzhuan_data.db")
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_concurrent_attacks_until_defeat(plugin_dir):
+    async def scenario():
+        db, config_manager = await _open(plugin_dir)
+        try:
+            for i in range(PLAYERS):
+                await db.create_player(Player(
+                    user_id=f"u{i}", name=f"玩家{i}", attack=40 + i % 30,
+                    max_hp=10**6, current_hp=10**6, spirit_stone=0
+                ))
+            world_boss = WorldBossManager(db, config_manager, {"WORLD_BOSS": {
+                "ATTACK_COOLDOWN": 0, "FLUSH_INTERVAL": 0.1, "HP_MULTIPLIER": 5000, "RESPAWN_INTERVAL": 3600
+            }})
+            await world_boss.start()
+            handler = BossHandler(db, {}, config_manager, world_boss)
+            boss = await world_boss.ensure_boss()
+            assert boss is not None
+            db.instrumentation.reset()
+
+            hits = 0
+
+            async def attacker(user_id: str):
+                nonlocal hits
+                while True:
+                    replies = [reply async for reply in handler.handle_attack_boss(_Event(user_id, "攻击boss"))]
+                    if not replies[0].startswith("你对"):
+                        return
+                    hits += 1
+                    if any("被击败了" in reply for reply in replies):
+                        return
+                    await asyncio.sleep(0)
+
+            await asyncio.gather(*(attacker(f"u{i}") for i in range(PLAYERS)))
+            await world_boss.stop()
+            writes = sum(
+                stat.calls for sql, stat in db.instrumentation.statements.items()
+                if sql.startswith("INSERT INTO world_boss_damage")
+            )
+            return boss, hits, writes, world_boss.last_settlement
+        finally:
+            await db.close()
+
+    boss, hits, writes, settlement = asyncio.run(scenario())
+
+    assert hits > PLAYERS
+    # 伤害增量按批写入：写入次数远少于攻击次数
+    assert 0 < writes < hits // 10, (writes, hits)
+
+    assert _query(plugin_dir, "SELECT hp, status FROM world_bosses") == [(0, "defeated")]
+    damage, recorded_hits, participants = _query(
+        plugin_dir, "SELECT SUM(damage), SUM(hits), COUNT(*) FROM world_boss_damage"
+    )[0]
+    assert damage == boss.max_hp
+    assert recorded_hits == hits
+    assert participants == PLAYERS
+
+    assert settlement is not None and len(settlement.spirit_stones) == PLAYERS
+    paid = dict(_query(plugin_dir, "SELECT user_id, spirit_stone FROM players"))
+    assert paid == settlement.spirit_stones
+    inventory = _query(plugin_dir, "SELECT user_id, item_id, quantity FROM inventory")
+    assert sorted((user_id, item_id) for user_id, item_id, _ in inventory) == sorted(settlement.drops)
+
+
+def test_stop_waits_for_in_flight_flush(plugin_dir):
+    async def scenario():
+        db, config_manager = await _open(plugin_dir)
+        try:
+            await db.create_player(Player(user_id="u1", attack=100, max_hp=10**6, current_hp=10**6))
+            world_boss = WorldBossManager(
+                db, config_manager, {"WORLD_BOSS": {"ATTACK_COOLDOWN": 0, "FLUSH_INTERVAL": 0.1}}
+            )
+            save = db.save_world_boss_progress
+            writing, release = asyncio.Event(), asyncio.Event()
+
+            async def blocked_save(*args):
+                writing.set()
+                await release.wait()
+                return await save(*args)
+
+            db.save_world_boss_progress = blocked_save
+            await world_boss.start()
+            await world_boss.ensure_boss()
+            player = await db.get_player_by_id("u1")
+            result = world_boss.attack(player, db.get_combat_stats(player))
+
+            # 定时写回已取出增量、正在写入时停止
+            await writing.wait()
+            stopping = asyncio.create_task(world_boss.stop())
+            await asyncio.sleep(0)
+            release.set()
+            await stopping
+            return result.damage
+        finally:
+            await db.close()
+
+    damage = asyncio.run(asyncio.wait_for(scenario(), 20))
+    assert damage > 0
+    assert _query(plugin_dir, "SELECT user_id, damage, hits FROM world_boss_damage") == [("u1", damage, 1)]
+
+
+def test_reward_survives_concurrent_command(plugin_dir):
+    async def scenario():
+        db, config_manager = await _open(plugin_dir)
+        locks = UserLocks()
+        try:
+            for user_id in ("u1", "u2"):
+                await db.create_player(Player(
+                    user_id=user_id, attack=10**6, max_hp=10**6, current_hp=10**6, spirit_stone=0
+                ))
+            world_boss = WorldBossManager(
+                db, config_manager, {"WORLD_BOSS": {"ATTACK_COOLDOWN": 0, "HP_MULTIPLIER": 1}}, user_locks=locks
+            )
+            await world_boss.start()
+            await world_boss.ensure_boss()
+            loaded, settling, finish = asyncio.Event(), asyncio.Event(), asyncio.Event()
+            paid = {"u1": asyncio.Event(), "u2": asyncio.Event()}
+            pay = db.pay_world_boss_reward
+
+            async def tracked_pay(instance_id, user_id):
+                result = await pay(instance_id, user_id)
+                paid[user_id].set()
+                return result
+
+            db.pay_world_boss_reward = tracked_pay
+
+            async def slow_command():
+                # u1 的命令读出玩家后还在执行（如逐条发送战报），期间Boss被击败
+                async with locks.hold("u1"):
+                    player = await db.get_player_by_id("u1")
+                    loaded.set()
+                    await finish.wait()
+                    player.spirit = 123
+                    await db.update_player(player)
+
+            def hold(user_id, wait=False):
+                # 结算开始等待获奖玩家的锁
+                if wait:
+                    settling.set()
+                return UserLocks.hold(locks, user_id, wait=wait)
+
+            _chip(world_boss, db, await db.get_player_by_id("u2"))
+            command = asyncio.create_task(slow_command())
+            await loaded.wait()
+            locks.hold = hold
+            async with locks.hold("u2"):
+                player = await db.get_player_by_id("u1")
+                assert world_boss.attack(player, db.get_combat_stats(player)).killed
+            # 结算已在等待 u1 的锁（未加锁时则已发放完毕）后，旧命令才写回
+            waiting = asyncio.ensure_future(settling.wait())
+            await asyncio.wait([waiting, *world_boss._settle_tasks], return_when=asyncio.FIRST_COMPLETED)
+            waiting.cancel()
+            # u1 的命令仍在执行时，u2 的奖励照常发放
+            await paid["u2"].wait()
+            assert not paid["u1"].is_set()
+            finish.set()
+            await command
+            await world_boss.stop()
+            return world_boss.last_settlement, await db.get_player_by_id("u1")
+        finally:
+            await db.close()
+
+    settlement, player = asyncio.run(asyncio.wait_for(scenario(), 20))
+    assert settlement.spirit_stones["u1"] > 0
+    assert player.spirit_stone == settlement.spirit_stones["u1"]
+    assert player.spirit == 123
+
+
+def _boss_config(**overrides):
+    return {"WORLD_BOSS": dict({"ATTACK_COOLDOWN": 0, "HP_MULTIPLIER": 1, "RESPAWN_INTERVAL": 3600}, **overrides)}
+
+
+def test_settlement_resumes_after_restart(plugin_dir):
+    async def scenario():
+        db, config_manager = await _open(plugin_dir)
+        try:
+            for user_id in ("u1", "u2"):
+                await db.create_player(Player(
+                    user_id=user_id, attack=10**6, max_hp=10**6, current_hp=10**6, spirit_stone=0
+                ))
+            world_boss = WorldBossManager(db, config_manager, _boss_config())
+            await world_boss.start()
+            await world_boss.ensure_boss()
+            pay = db.pay_world_boss_reward
+
+            async def failing_pay(instance_id, user_id):
+                if user_id == "u1":
+                    raise RuntimeError("磁盘已满")
+                return await pay(instance_id, user_id)
+
+            # 向 u1 发放时出错：u2 照常到账，Boss保持结算中
+            db.pay_world_boss_reward = failing_pay
+            _chip(world_boss, db, await db.get_player_by_id("u1"))
+            player = await db.get_player_by_id("u2")
+            assert world_boss.attack(player, db.get_combat_stats(player)).killed
+            await world_boss.stop()
+            assert world_boss.last_settlement is None
+            interrupted = _query(plugin_dir, "SELECT status, hp, defeat_time IS NOT NULL FROM world_bosses")
+            first_paid = {user_id: (await db.get_player_by_id(user_id)).spirit_stone for user_id in ("u1", "u2")}
+
+            # 重启：继续发放 u1 的奖励，u2 不会重复到账；刷新间隔未到，不刷新新的Boss
+            db.pay_world_boss_reward = pay
+            restarted = WorldBossManager(db, config_manager, _boss_config())
+            await restarted.start()
+            assert await restarted.ensure_boss() is None
+            await restarted.stop()
+            final_paid = {user_id: (await db.get_player_by_id(user_id)).spirit_stone for user_id in ("u1", "u2")}
+            return interrupted, first_paid, final_paid, restarted.last_settlement
+        finally:
+            await db.close()
+
+    interrupted, first_paid, final_paid, settlement = asyncio.run(asyncio.wait_for(scenario(), 20))
+    assert interrupted == [("settling", 0, 1)]
+    assert first_paid["u1"] == 0 and first_paid["u2"] > 0
+    assert settlement is not None
+    assert final_paid == settlement.spirit_stones
+    assert final_paid["u2"] == first_paid["u2"]
+    assert _query(plugin_dir, "SELECT status FROM world_bosses") == [("defeated",)]
+    assert _query(plugin_dir, "SELECT COUNT(*) FROM world_boss_rewards WHERE paid = 0") == [(0,)]
+
+
+def test_defeated_boss_without_rewards_is_settled_on_start(plugin_dir):
+    async def scenario():
+        db, config_manager = await _open(plugin_dir)
+        try:
+            await db.create_player(Player(user_id="u1", spirit_stone=0))
+            # 伤害和血量已写回，但在保存奖励之前进程退出
+            boss_id = next(iter(config_manager.boss_configs))
+            await db.create_world_boss("b1", boss_id, 100, "2026-01-01 00:00:00")
+            await db.save_world_boss_progress("b1", 0, {"u1": (100, 3)})
+
+            world_boss = WorldBossManager(db, config_manager, _boss_config())
+            await world_boss.start()
+            assert world_boss.boss is None
+            assert await world_boss.ensure_boss() is None
+            await world_boss.stop()
+            return world_boss.last_settlement, (await db.get_player_by_id("u1")).spirit_stone
+        finally:
+            await db.close()
+
+    settlement, spirit_stone = asyncio.run(asyncio.wait_for(scenario(), 20))
+    assert settlement.ranking == [("u1", 100)]
+    assert spirit_stone == settlement.spirit_stones["u1"] > 0
+    assert _query(plugin_dir, "SELECT status, defeat_time IS NOT NULL FROM world_bosses") == [("defeated", 1)]